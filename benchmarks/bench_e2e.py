@@ -0,0 +1,194 @@
+"""Offline end-to-end benchmark of the threaded mention flow.
+
+Runs the real fetch_and_reply_to_mentions loop, MemeService and
+TwitterService against the stand-ins in benchmarks.fakes, replaying a
+synthetic (or recorded) mention stream, and reports mentions/sec,
+end-to-end reply latency, per-operation p50/p95/p99 and peak RSS:
+
+    python -m benchmarks.bench_e2e [--mentions N] [--rate R] [--json]
+
+State files (job queue, mention log, caches) go to a temporary directory.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+# State files use relative paths, so move to a scratch directory before the
+# services are imported; keep the repo importable for render workers
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def peak_rss_mb():
+    """Peak RSS of this process and of the largest exited child, in MB.
+
+    Render workers still running at the end aren't counted as children.
+    """
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return own, children
+
+
+def build_services(args, stream, media_server):
+    from benchmarks.fakes import FakeTwitterClient, FakeTwitterAPI, FakeGroq
+    from services.twitter_service import TwitterService
+    from services.groq_service import GroqService
+    from services.meme_service import MemeService
+
+    client = FakeTwitterClient(stream, args.twitter_latency, args.reply_error_rate, args.mentions_rate_limit)
+    api = FakeTwitterAPI(client, args.upload_latency)
+
+    class BenchTwitterService(TwitterService):
+        def initialize_twitter(self):
+            self.client = client
+            self.api = api
+            self.bot_id = 1
+            self.bot_username = "memebot"
+
+    twitter_service = BenchTwitterService()
+    groq_service = GroqService()
+    groq_service.client = FakeGroq(args.groq_latency, args.groq_error_rate)
+    meme_service = MemeService(twitter_service, groq_service)
+    meme_service.tenor_service.base_url = f"{media_server.url}/tenor"
+    meme_service.unsplash_service.base_url = f"{media_server.url}/unsplash"
+    return client, twitter_service, meme_service
+
+
+def run(args):
+    from benchmarks.fakes import MentionStream, FakeMediaServer
+    from utils import rate_limiting
+    from utils.logging_utils import configure_logging
+    from utils.metrics import histograms
+    import main as bot
+
+    configure_logging(level="DEBUG" if args.verbose else "WARNING")
+    # Local budgets as large as the fakes allow; the mentions budget comes from
+    # the fake x-rate-limit headers like in production
+    rate_limiting.rate_limiter = rate_limiting.RateLimiter(
+        dict(rate_limiting.DEFAULT_LIMITS, tweet_api=(10 ** 6, 1), media_api=(10 ** 6, 1),
+             groq_api=(10 ** 6, 1), tenor_api=(10 ** 6, 1), unsplash_api=(10 ** 6, 1)),
+        rate_limiting.RATE_LIMIT_FILE
+    )
+
+    random.seed(args.seed)
+    if args.replay:
+        stream = MentionStream.from_file(args.replay)
+    else:
+        stream = MentionStream.synthetic(args.mentions, args.rate, args.seed)
+    media_server = FakeMediaServer(args.search_latency, args.search_error_rate, args.download_latency).start()
+    client, twitter_service, meme_service = build_services(args, stream, media_server)
+    job_queue = bot.create_job_queue()
+
+    stream.start()
+    started = time.time()
+    threading.Thread(target=bot.fetch_and_reply_to_mentions, args=(twitter_service, meme_service, job_queue),
+                     name="bench-mentions", daemon=True).start()
+
+    total = len(stream.mentions)
+    while len(client.replies) < total and time.time() - started < args.timeout:
+        time.sleep(0.2)
+    elapsed = time.time() - started
+    media_server.stop()
+
+    replies = dict(client.replies)
+    latencies = [reply_at - stream.arrival_time(tweet_id) for tweet_id, reply_at in replies.items()]
+    last_reply = max(replies.values()) if replies else started
+    own_rss, children_rss = peak_rss_mb()
+
+    operations = {}
+    for name, histogram in sorted(histograms.items()):
+        _, count, _, outcomes = histogram.snapshot()
+        quantiles = histogram.quantiles()
+        operations[name] = {
+            "count": count,
+            "p50": quantiles[0.5],
+            "p95": quantiles[0.95],
+            "p99": quantiles[0.99],
+            "outcomes": outcomes
+        }
+
+    return {
+        "mentions": total,
+        "replied": len(replies),
+        "elapsed": elapsed,
+        "timed_out": len(replies) < total,
+        "mentions_per_sec": len(replies) / max(last_reply - started, 1e-9),
+        "latency": {
+            "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": max(latencies, default=0.0)
+        },
+        "operations": operations,
+        "jobs": job_queue.counts(),
+        "peak_rss_mb": {"self": own_rss, "children": children_rss}
+    }
+
+
+def print_report(result):
+    print(f"replied {result['replied']}/{result['mentions']} mentions in {result['elapsed']:.1f}s"
+          f"{' (timed out)' if result['timed_out'] else ''}")
+    print(f"throughput: {result['mentions_per_sec']:.2f} mentions/sec")
+    latency = result["latency"]
+    print(f"reply latency: p50={latency['p50']:.2f}s p95={latency['p95']:.2f}s "
+          f"p99={latency['p99']:.2f}s max={latency['max']:.2f}s")
+    print(f"jobs: {result['jobs']}")
+    print(f"peak RSS: {result['peak_rss_mb']['self']:.0f} MB (largest exited child {result['peak_rss_mb']['children']:.0f} MB)")
+    print()
+    print(f"{'operation':26}{'count':>7}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}  outcomes")
+    for name, op in result["operations"].items():
+        outcomes = " ".join(f"{k}={v}" for k, v in sorted(op["outcomes"].items()))
+        print(f"{name:26}{op['count']:7}{op['p50']:9.3f}{op['p95']:9.3f}{op['p99']:9.3f}  {outcomes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mentions", type=int, default=100, help="synthetic mentions to replay")
+    parser.add_argument("--rate", type=float, default=5.0, help="synthetic mentions arriving per second")
+    parser.add_argument("--replay", help="JSON lines file of recorded mentions ({\"text\", \"at\"})")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=300, help="seconds to wait for every reply")
+    parser.add_argument("--groq-latency", type=float, default=0.5)
+    parser.add_argument("--groq-error-rate", type=float, default=0.0)
+    parser.add_argument("--search-latency", type=float, default=0.3, help="Tenor and Unsplash searches")
+    parser.add_argument("--search-error-rate", type=float, default=0.0)
+    parser.add_argument("--download-latency", type=float, default=0.1, help="image and GIF downloads")
+    parser.add_argument("--twitter-latency", type=float, default=0.1, help="mention polls and replies")
+    parser.add_argument("--upload-latency", type=float, default=0.3)
+    parser.add_argument("--reply-error-rate", type=float, default=0.0)
+    parser.add_argument("--mentions-rate-limit", type=int, default=450,
+                        help="mentions calls per 15 minutes reported in x-rate-limit headers")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show the bot's own log output")
+    args = parser.parse_args()
+
+    if args.replay:
+        args.replay = os.path.abspath(args.replay)
+    with tempfile.TemporaryDirectory(prefix="bench_e2e_") as workdir:
+        os.chdir(workdir)
+        result = run(args)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+
+if __name__ == "__main__":
+    main()
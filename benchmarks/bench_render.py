@@ -0,0 +1,109 @@
+"""Micro-benchmark for meme text rendering.
+
+Compares ms/meme for the old per-call font probing plus 7x7 outline grid
+against services.meme_renderer on a fixed, generated image set:
+
+    python -m benchmarks.bench_render [--rounds N]
+"""
+import argparse
+import random
+import time
+from io import BytesIO
+from PIL import Image, ImageDraw, ImageFont
+from services.meme_renderer import prepare_image, draw_meme_text
+
+IMAGE_SIZES = [(640, 480), (1080, 1080), (1920, 1080), (3000, 2000)]
+MEME_TEXTS = [
+    "pov: monday again",
+    "me rn: coffee\nmy brain: sleep",
+    "nobody:\nliterally nobody:\nme: refreshing the timeline",
+    "it's giving main character energy",
+    "no cap fr fr deadline 💀",
+]
+WATERMARK = "🔥"
+
+
+def make_images():
+    """Deterministic source images as encoded JPEG bytes"""
+    images = []
+    for width, height in IMAGE_SIZES:
+        gradient = Image.linear_gradient("L").resize((width, height))
+        img = Image.merge("RGB", (gradient, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT), gradient))
+        buffer = BytesIO()
+        img.save(buffer, format="JPEG", quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+def legacy_draw(img, meme_text):
+    """The create_meme drawing code before the renderer was introduced"""
+    draw = ImageDraw.Draw(img)
+    font = None
+    for path in ["C:/Windows/Fonts/Impact.ttf", "C:/Windows/Fonts/Arial.ttf",
+                 "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", "arial.ttf"]:
+        try:
+            font = ImageFont.truetype(path, 60)
+            break
+        except OSError:
+            continue
+    if not font:
+        font = ImageFont.load_default()
+
+    lines = meme_text.split('\n')
+    start_y = img.height - 70 * len(lines) - 20
+    for i, line in enumerate(lines):
+        x = (img.width - draw.textlength(line, font=font)) / 2
+        y = start_y + i * 70
+        for dx in range(-3, 4):
+            for dy in range(-3, 4):
+                draw.text((x + dx, y + dy), line, (0, 0, 0), font=font)
+        draw.text((x, y), line, (255, 255, 255), font=font)
+    # The old code opened arial.ttf here, which fails outside Windows
+    draw.text((10, 10), WATERMARK, (255, 255, 255), font=font)
+    return img
+
+
+def new_draw(img, meme_text):
+    return draw_meme_text(img, meme_text, WATERMARK)
+
+
+def run(draw_func, images, rounds):
+    """Return (text-only ms/meme, full decode+draw+encode ms/meme)"""
+    draw_time = 0.0
+    total_time = 0.0
+    count = 0
+    for _ in range(rounds):
+        for data in images:
+            for text in MEME_TEXTS:
+                started = time.perf_counter()
+                img = prepare_image(Image.open(BytesIO(data)))
+                draw_started = time.perf_counter()
+                draw_func(img, text)
+                draw_time += time.perf_counter() - draw_started
+                img.save(BytesIO(), format="JPEG", quality=95)
+                total_time += time.perf_counter() - started
+                count += 1
+    return draw_time / count * 1000, total_time / count * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    random.seed(0)
+    images = make_images()
+    # Warm up font and layer caches so steady state is measured
+    run(new_draw, images, 1)
+
+    legacy_text, legacy_total = run(legacy_draw, images, args.rounds)
+    new_text, new_total = run(new_draw, images, args.rounds)
+
+    print(f"{'':10}{'text ms/meme':>14}{'total ms/meme':>15}")
+    print(f"{'legacy':10}{legacy_text:14.2f}{legacy_total:15.2f}")
+    print(f"{'renderer':10}{new_text:14.2f}{new_total:15.2f}")
+    print(f"speedup: text x{legacy_text / new_text:.1f}, total x{legacy_total / new_total:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""Local stand-ins for Twitter, Groq, Tenor and Unsplash used by bench_e2e.
+
+Each fake has a configurable latency (seconds, jittered +/-50%) and error
+rate. Tenor, Unsplash and the image/GIF downloads are served over real HTTP
+from a local server, so the pooled session, asset cache and breakers are
+exercised; Twitter and Groq are injected client objects.
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from types import SimpleNamespace
+from urllib.parse import urlparse, parse_qs
+import tweepy
+from PIL import Image
+from utils.rate_limiting import update_rate_limits
+
+# Distinct image/GIF URLs the fake search APIs hand out
+ASSET_COUNT = 50
+
+
+def sleep_jittered(latency):
+    if latency > 0:
+        time.sleep(latency * random.uniform(0.5, 1.5))
+
+
+class FakeHTTPResponse:
+    """Enough of a requests.Response for tweepy's HTTPException"""
+
+    def __init__(self, status_code, reason):
+        self.status_code = status_code
+        self.reason = reason
+        self.text = ""
+        self.headers = {}
+
+    def json(self):
+        return {}
+
+
+class MentionStream:
+    """Mentions arriving at fixed offsets from start(), with increasing IDs"""
+
+    def __init__(self, mentions):
+        # mentions: list of (arrival offset in seconds, text)
+        self.mentions = [
+            SimpleNamespace(id=1000 + i, text=text, at=at)
+            for i, (at, text) in enumerate(sorted(mentions, key=lambda m: m[0]))
+        ]
+        self.started = None
+
+    @classmethod
+    def synthetic(cls, count, rate, seed=0):
+        rng = random.Random(seed)
+        topics = ["monday", "coffee", "deadline", "weekend", "pizza", "gym", "exam", "rain",
+                  "traffic", "bugs", "deploy", "cats", "football", "vacation", "wifi"]
+        templates = ["@memebot {} is ruining my life", "@memebot when the {} hits different",
+                     "@memebot make a meme about {} pls", "@memebot {} again?? 💀",
+                     "@memebot nobody talks about {} enough"]
+        mentions = []
+        for i in range(count):
+            text = rng.choice(templates).format(rng.choice(topics))
+            mentions.append((i / rate, text))
+        return cls(mentions)
+
+    @classmethod
+    def from_file(cls, path):
+        """JSON lines with "text" and an optional "at" offset in seconds"""
+        mentions = []
+        with open(path, "r", encoding="utf-8") as f:
+            for i, line in enumerate(f):
+                if line.strip():
+                    record = json.loads(line)
+                    mentions.append((float(record.get("at", i)), record["text"]))
+        return cls(mentions)
+
+    def start(self):
+        self.started = time.time()
+
+    def arrived(self, since_id=None):
+        """Mentions that have arrived, newest first like the v2 API"""
+        now = time.time() - self.started
+        found = [m for m in self.mentions if m.at <= now and (since_id is None or m.id > int(since_id))]
+        return sorted(found, key=lambda m: m.id, reverse=True)
+
+    def arrival_time(self, tweet_id):
+        return self.started + self.mentions[int(tweet_id) - 1000].at
+
+
+class FakeTwitterClient:
+    """tweepy.Client stand-in: mention timeline from a MentionStream, replies recorded"""
+
+    def __init__(self, stream, latency=0.1, error_rate=0.0, rate_limit=450, window=900):
+        self.stream = stream
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.window = window
+        self.window_started = time.time()
+        self.remaining = rate_limit
+        self.lock = threading.Lock()
+        self.replies = {}  # tweet id -> time of the first reply
+
+    def _spend_mentions_call(self):
+        """Count a mentions call and report the budget like x-rate-limit-* headers"""
+        with self.lock:
+            if time.time() - self.window_started >= self.window:
+                self.window_started = time.time()
+                self.remaining = self.rate_limit
+            if self.remaining <= 0:
+                raise tweepy.TooManyRequests(FakeHTTPResponse(429, "Too Many Requests"))
+            self.remaining -= 1
+            headers = {
+                "x-rate-limit-limit": str(self.rate_limit),
+                "x-rate-limit-remaining": str(self.remaining),
+                "x-rate-limit-reset": str(int(self.window_started + self.window))
+            }
+        update_rate_limits("mentions_api", SimpleNamespace(headers=headers))
+
+    def get_users_mentions(self, id, max_results=10, since_id=None, pagination_token=None, **kwargs):
+        sleep_jittered(self.latency)
+        self._spend_mentions_call()
+        arrived = self.stream.arrived(since_id)
+        offset = int(pagination_token or 0)
+        page = arrived[offset:offset + max_results]
+        meta = {"result_count": len(page)}
+        if offset + max_results < len(arrived):
+            meta["next_token"] = str(offset + max_results)
+        return SimpleNamespace(data=page or None, meta=meta)
+
+    def create_tweet(self, text=None, media_ids=None, in_reply_to_tweet_id=None, **kwargs):
+        sleep_jittered(self.latency)
+        if random.random() < self.error_rate:
+            raise tweepy.TwitterServerError(FakeHTTPResponse(503, "Service Unavailable"))
+        with self.lock:
+            self.replies.setdefault(str(in_reply_to_tweet_id), time.time())
+        return SimpleNamespace(data={"id": str(random.getrandbits(48))})
+
+
+class FakeTwitterAPI:
+    """tweepy.API stand-in for media upload and the v1.1 reply"""
+
+    def __init__(self, client, upload_latency=0.3, error_rate=0.0):
+        self.client = client
+        self.upload_latency = upload_latency
+        self.error_rate = error_rate
+        self.media_ids = iter(range(1, 10 ** 9))
+        self.lock = threading.Lock()
+
+    def media_upload(self, filename, file=None, chunked=False, media_category=None, **kwargs):
+        size = len(file.read()) if file else 0
+        # Uploads take longer for bigger files, roughly 10 MB/s on top of the fixed cost
+        sleep_jittered(self.upload_latency + size / (10 * 1024 * 1024))
+        if random.random() < self.error_rate:
+            raise tweepy.TwitterServerError(FakeHTTPResponse(503, "Service Unavailable"))
+        with self.lock:
+            return SimpleNamespace(media_id=next(self.media_ids))
+
+    def update_status(self, status=None, in_reply_to_status_id=None, media_ids=None, **kwargs):
+        return self.client.create_tweet(text=status, media_ids=media_ids,
+                                        in_reply_to_tweet_id=in_reply_to_status_id)
+
+
+class FakeGroq:
+    """Groq client stand-in answering single and numbered batch prompts"""
+
+    def __init__(self, latency=0.5, error_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    @staticmethod
+    def analysis_block(text):
+        words = [w for w in re.findall(r"[a-z]+", text.lower()) if len(w) > 3 and w != "memebot"]
+        keywords = ", ".join(words[:3] or ["meme", "reaction"])
+        sentiment = random.choice(["positive", "negative", "neutral"])
+        style = random.choice(["reaction", "relatable", "sarcastic", "funny"])
+        return (f"KEYWORDS: {keywords}\nSENTIMENT: {sentiment}\nCONTEXT: {text[:40]}\n"
+                f"STYLE: {style}\nEMOJIS: 😂, 💀")
+
+    def create(self, model=None, messages=None, **kwargs):
+        prompt = messages[-1]["content"]
+        batch = re.findall(r'^\[(\d+)\] "(.*)"$', prompt, flags=re.MULTILINE)
+        # Batch calls cost more than one tweet but less than one call per tweet
+        sleep_jittered(self.latency * (1 + 0.2 * max(0, len(batch) - 1)))
+        if random.random() < self.error_rate:
+            raise RuntimeError("fake Groq error")
+        if batch:
+            content = "\n".join(f"[{number}]\n{self.analysis_block(text)}" for number, text in batch)
+        else:
+            match = re.search(r'Tweet: "(.*)"', prompt)
+            content = self.analysis_block(match.group(1) if match else "")
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def make_jpeg(width, height, seed):
+    rng = random.Random(seed)
+    img = Image.new("RGB", (width, height), tuple(rng.randrange(256) for _ in range(3)))
+    buffer = BytesIO()
+    img.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+def make_gif(seed, frames=8):
+    rng = random.Random(seed)
+    images = [Image.new("P", (320, 240), rng.randrange(256)) for _ in range(frames)]
+    buffer = BytesIO()
+    images[0].save(buffer, format="GIF", save_all=True, append_images=images[1:], duration=100, loop=0)
+    return buffer.getvalue()
+
+
+class FakeMediaServer:
+    """Local HTTP server for Tenor search, Unsplash search and asset downloads.
+
+    /tenor/search, /unsplash/search/photos, /img/<n>.jpg and /gif/<n>.gif.
+    search_latency/search_error_rate apply to the searches, download_latency
+    to the assets.
+    """
+
+    def __init__(self, search_latency=0.3, search_error_rate=0.0, download_latency=0.1):
+        self.search_latency = search_latency
+        self.search_error_rate = search_error_rate
+        self.download_latency = download_latency
+        self.images = [make_jpeg(1600, 1067, seed) for seed in range(5)]
+        self.gifs = [make_gif(seed) for seed in range(5)]
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="fake-media", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                query = parse_qs(parsed.query)
+                if parsed.path in ("/tenor/search", "/unsplash/search/photos"):
+                    sleep_jittered(fake.search_latency)
+                    if random.random() < fake.search_error_rate:
+                        self.send_error(503)
+                        return
+                    ids = [random.randrange(ASSET_COUNT) for _ in range(10)]
+                    if parsed.path == "/tenor/search":
+                        body = {"results": [{"media_formats": {"gif": {"url": f"{fake.url}/gif/{i}.gif"}}}
+                                            for i in ids],
+                                "next": str(int(query.get("pos", ["0"])[0]) + 10)}
+                    else:
+                        body = {"results": [{"urls": {"regular": f"{fake.url}/img/{i}.jpg"}} for i in ids],
+                                "total_pages": 5}
+                    self._send(json.dumps(body).encode("utf-8"), "application/json")
+                elif parsed.path.startswith(("/img/", "/gif/")):
+                    sleep_jittered(fake.download_latency)
+                    number = int(re.sub(r"\D", "", parsed.path) or 0)
+                    if parsed.path.startswith("/img/"):
+                        self._send(fake.images[number % len(fake.images)], "image/jpeg", f'"img{number}"')
+                    else:
+                        self._send(fake.gifs[number % len(fake.gifs)], "image/gif", f'"gif{number}"')
+                else:
+                    self.send_error(404)
+
+            def _send(self, body, content_type, etag=None):
+                if etag and self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
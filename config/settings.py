@@ -3,9 +3,140 @@ from dotenv import load_dotenv
 
 # File paths
 RATE_LIMIT_FILE = "rate_limits.json"
-LAST_MENTION_FILE = "last_mention.json"
+RATE_LIMIT_PERSIST_INTERVAL = 30  # seconds between rate limit snapshots
+LAST_MENTION_FILE = "last_mention.json"  # legacy format, imported once into PROCESSED_MENTIONS_FILE
+PROCESSED_MENTIONS_FILE = "processed_mentions.log"
 LAST_DM_FILE = "last_dm.json"
 
+# Logging (LOG_LEVEL and LOG_FORMAT can also be set in the environment)
+LOG_FILE = "bot.log"
+LOG_LEVEL = "INFO"  # DEBUG adds full Groq responses and analysis dicts
+LOG_FORMAT = "text"  # or "json"
+LOG_MAX_BYTES = 10 * 1024 * 1024  # rotate bot.log at this size
+LOG_BACKUP_COUNT = 5
+LOG_QUEUE_SIZE = 10000  # records waiting for the writer thread before new ones are dropped
+
+# Metrics
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108  # Prometheus endpoint at /metrics; None disables it
+METRICS_SUMMARY_INTERVAL = 60  # seconds between metrics summary log lines
+
+# Processed mention log
+MENTION_RETENTION = 7 * 24 * 60 * 60  # forget processed mentions after this many seconds
+MENTION_COMPACT_EVERY = 1000  # rewrite the log after this many appended records
+
+# Mention polling
+MENTIONS_PAGE_SIZE = 10  # first page of each poll
+MENTIONS_BACKLOG_PAGE_SIZE = 100  # following pages when more mentions are waiting
+MENTIONS_MAX_PAGES = 20  # cap on pages fetched in one poll; the rest are fetched by the next poll
+
+# Adaptive poll scheduling, within the budget from x-rate-limit-* headers
+POLL_MIN_INTERVAL = 2  # seconds between checks while mentions keep arriving
+POLL_MAX_INTERVAL = 60  # longest wait between checks when idle
+POLL_IDLE_BACKOFF = 1.5  # interval multiplier after each empty poll
+
+# Mention pipeline
+PIPELINE_QUEUE_SIZE = 20
+PIPELINE_WORKERS = {
+    "analyze": 2,
+    "source": 4,
+    "render": 2,
+    "upload": 2,
+    "reply": 1
+}
+PIPELINE_ANALYZE_BATCH_SIZE = 10  # mentions analyzed per Groq completion
+PIPELINE_STATS_INTERVAL = 60  # seconds between pipeline stats log lines
+
+# Outbound HTTP (Tenor, Unsplash, image and GIF downloads)
+HTTP_POOL_CONNECTIONS = 10  # number of hosts to keep pools for
+HTTP_POOL_SIZE = 10  # keep-alive connections per host
+HTTP_CONNECT_TIMEOUT = 5  # seconds
+HTTP_READ_TIMEOUT = 20  # seconds
+HTTP_MAX_RETRIES = 3  # retries on 429/5xx and connection errors
+HTTP_BACKOFF_FACTOR = 0.5  # 0.5s, 1s, 2s between retries
+
+# Groq analysis cache
+ANALYSIS_CACHE_SIZE = 1000  # entries kept in memory
+ANALYSIS_CACHE_TTL = 6 * 3600  # seconds
+ANALYSIS_CACHE_FILE = "analysis_cache.db"  # set to None to keep the cache in memory only
+ANALYSIS_CACHE_DISK_SIZE = 50000  # rows kept in ANALYSIS_CACHE_FILE, oldest dropped first
+
+# Tenor/Unsplash search result pools
+SEARCH_POOL_TTL = 1800  # seconds a page of results is served from memory
+SEARCH_POOL_REFILL_THRESHOLD = 3  # fetch the next page when fewer unseen results are left
+SEARCH_POOL_SIZE = 500  # keyword pools kept per provider
+
+# Downloaded source images and GIFs
+ASSET_CACHE_DIR = "asset_cache"
+ASSET_CACHE_MAX_BYTES = 200 * 1024 * 1024
+ASSET_CACHE_REVALIDATE_AFTER = 3600  # seconds before checking ETag/Last-Modified again
+ASSET_CACHE_INDEX_SAVE_INTERVAL = 30  # seconds between writes of the cache index when it changed
+
+# Replies
+REPLY_ENDPOINT_ORDER = ["v2", "v1.1"]  # tried in this order until one is known to work
+REPLY_REPROBE_INTERVAL = 6 * 60 * 60  # seconds before retrying an endpoint our credentials can't use
+
+# Circuit breakers per external provider (see utils/circuit_breaker.py)
+CIRCUIT_BREAKER_DEFAULTS = {
+    "window": 60,  # seconds of outcomes kept
+    "min_calls": 5,  # calls in the window before the breaker may open
+    "error_threshold": 0.5,  # error rate that opens the breaker
+    "slow_call_duration": 10,  # seconds after which a call counts as slow
+    "slow_threshold": 0.8,  # share of slow calls that opens the breaker
+    "open_duration": 30,  # seconds before a half-open probe is let through
+    "half_open_calls": 1
+}
+CIRCUIT_BREAKERS = {
+    "groq": {"slow_call_duration": 15},
+    "tenor": {"slow_call_duration": 4},
+    "unsplash": {"slow_call_duration": 4},
+    "twitter_v2_reply": {"min_calls": 3, "open_duration": 300},
+    "twitter_v1_reply": {"min_calls": 3, "open_duration": 300}
+}
+
+# Durable mention job queue
+JOB_QUEUE_FILE = "jobs.db"
+JOB_MAX_ATTEMPTS = 5  # attempts before a job is dead-lettered
+JOB_BACKOFF_BASE = 30  # seconds before the first retry, doubled on each further failure
+JOB_BACKOFF_MAX = 3600
+JOB_LEASE_TIMEOUT = 900  # seconds before an unfinished in-progress job is handed out again
+JOB_DRAIN_INTERVAL = 1  # seconds between checks when no job is due
+JOB_DONE_RETENTION = 7 * 24 * 60 * 60  # seconds to keep finished jobs
+
+# Meme sourcing
+SOURCING_MODE = "race"  # "race" searches Tenor and Unsplash at once, "sequential" tries them in turn
+SOURCE_BUDGETS = {"gif": 4, "image": 4}  # seconds each provider's search may take in race mode
+SOURCE_PREFERENCE_GRACE = 0.5  # seconds to wait for the preferred kind after the other one arrives
+SOURCE_RACE_WORKERS = 8  # threads running raced searches, per provider
+
+# Prefetched meme warm pool
+WARM_POOL_PER_BUCKET = 3  # ready memes per style x sentiment bucket; 0 disables the pool
+WARM_POOL_REFILL_INTERVAL = 5  # seconds between refill checks when full, busy or failing
+WARM_POOL_MAX_AGE = 6 * 60 * 60  # seconds before a prefetched meme is discarded
+WARM_POOL_LIVE_BUDGET = 8  # seconds live sourcing/rendering may take before a prefetched meme is used
+WARM_POOL_LIVE_WORKERS = 8  # threads running budgeted live work
+
+# Meme rendering
+RENDER_PROCESS_WORKERS = 2  # worker processes for rendering; 0 renders in the calling thread
+RENDER_JOB_TIMEOUT = 30  # seconds before a render job is abandoned and its pool replaced
+
+# Media upload
+CHUNKED_UPLOAD_THRESHOLD = 5 * 1024 * 1024  # GIFs larger than this use chunked upload
+MEDIA_UPLOAD_WAIT = 60  # longest wait in seconds for media upload budget
+GROQ_RATE_LIMIT_WAIT = 5  # longest wait in seconds for Groq budget before using fallback extraction
+
+# Multi-account mode (main.py --accounts accounts.json)
+ACCOUNT_STATE_DIR = "accounts"  # each account's state files go in accounts/<name>/
+ACCOUNT_POLL_WORKERS = 4  # threads polling mentions for all accounts
+
+# Coordination between worker processes (main.py --coordination, see utils/coordination.py)
+COORDINATION_URL = None  # "coordination.db" (SQLite, one machine) or "redis://host:6379/0"; None runs standalone
+COORDINATION_LEADER_TTL = 30  # seconds a poller's leadership lasts without renewal
+COORDINATION_SHARED_BUDGETS = ["mentions_api", "tweet_api", "media_api", "groq_api", "tenor_api", "unsplash_api"]
+
+# asyncio mode (main.py --async)
+ASYNC_MAX_IN_FLIGHT = 200  # mentions processed concurrently
+
 def load_environment():
     # Try to load from the script directory first
     script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -1,70 +1,538 @@
+import argparse
+import asyncio
+import heapq
+import os
 import threading
 import time
-from config.settings import load_environment
-from utils.logging_utils import log_message
-from utils.rate_limiting import reset_rate_limits, log_rate_limits
-from services.twitter_service import TwitterService
-from services.groq_service import GroqService
-from services.meme_service import MemeService
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
+from config.settings import (
+    load_environment, POLL_MIN_INTERVAL, POLL_MAX_INTERVAL, POLL_IDLE_BACKOFF, PIPELINE_QUEUE_SIZE, PIPELINE_WORKERS, PIPELINE_STATS_INTERVAL,
+    PIPELINE_ANALYZE_BATCH_SIZE, ASYNC_MAX_IN_FLIGHT, JOB_QUEUE_FILE, JOB_MAX_ATTEMPTS, JOB_BACKOFF_BASE,
+    JOB_BACKOFF_MAX, JOB_LEASE_TIMEOUT, JOB_DRAIN_INTERVAL, JOB_DONE_RETENTION,
+    METRICS_HOST, METRICS_PORT, METRICS_SUMMARY_INTERVAL, ACCOUNT_STATE_DIR, ACCOUNT_POLL_WORKERS,
+    COORDINATION_URL, COORDINATION_LEADER_TTL, COORDINATION_SHARED_BUDGETS
+)
+from utils.logging_utils import log_message, log_debug, configure_logging, dropped_log_records
+from utils.pipeline import Pipeline
+from utils.job_queue import JobQueue, SharedJobQueue
+from utils.coordination import create_coordination, LeaderLease, WORKER_ID
+from utils.circuit_breaker import log_breakers
+from utils.metrics import start_metrics_server, start_metrics_reporter
+from utils.http import log_connection_stats
+from utils.rate_limiting import (
+    reset_rate_limits, load_rate_limits, save_rate_limits, log_rate_limits, acquire_rate_limit, acquire_rate_limit_async, start_rate_limit_persistence,
+    share_rate_limits
+)
+from utils.scheduler import PollScheduler
+from services.accounts import load_accounts
+from services.twitter_service import TwitterService, AsyncTwitterService
+from services.groq_service import GroqService, AsyncGroqService
+from services.meme_service import MemeService, AsyncMemeService, describe_meme
 import datetime
 
-def fetch_and_reply_to_mentions(twitter_service, meme_service):
+def analyze_stage(meme_service, jobs):
+    # One completion covers the whole batch of mentions
+    analyses = meme_service.analyze_tweets_with_groq([job["tweet_text"] for job in jobs])
+    for job, analysis in zip(jobs, analyses):
+        job["analysis"] = analysis
+        log_debug(f"Enhanced analysis for {job['tweet_id']}: {analysis}")
+    return jobs
+
+def source_stage(meme_service, job):
+    source_url, media_type = meme_service.within_budget(meme_service.find_meme_source, job["analysis"]) or (None, None)
+    if not source_url:
+        # Slow or failed search: reply with a prefetched meme instead
+        job["meme_source"], job["media_type"] = meme_service.take_prefetched(job["analysis"])
+        if not job["meme_source"]:
+            log_message(f"Failed to get meme source for {job['tweet_id']}")
+            return None
+        return job
+    job["source_url"] = source_url
+    job["media_type"] = media_type
+    log_message(f"Got meme source for {job['tweet_id']}: {source_url}, type: {media_type}")
+    return job
+
+def render_stage(meme_service, job):
+    if "meme_source" in job:
+        return job
+    if job["media_type"] == "gif":
+        job["meme_source"] = job["source_url"]
+        return job
+    meme_source = meme_service.within_budget(
+        meme_service.render_meme, job["source_url"], job["analysis"], job["tweet_text"]
+    )
+    if not meme_source:
+        meme_source, job["media_type"] = meme_service.take_prefetched(job["analysis"])
+    if not meme_source:
+        log_message(f"Failed to render meme for {job['tweet_id']}")
+        return None
+    job["meme_source"] = meme_source
+    return job
+
+def upload_stage(meme_service, job, twitter_service=None):
+    media_id = meme_service.download_and_upload_meme(job["meme_source"], job["media_type"], twitter_service)
+    if not media_id:
+        log_message(f"Failed to upload media for {job['tweet_id']}")
+        return None
+    job["media_id"] = media_id
+    return job
+
+def reply_stage(twitter_service, job, job_queue=None):
+    # With several workers, a mention whose lease ran out may have been taken over
+    if job_queue is not None and not job_queue.renew(job["tweet_id"], job["claim_id"]):
+        log_message(f"Lease on mention {job['tweet_id']} was lost, leaving the reply to its new owner")
+        return None
+    result = twitter_service.reply_to_tweet(job["tweet_id"], job["media_id"])
+    if not result:
+        log_message(f"❌ Failed to reply to mention {job['tweet_id']}")
+        return None
+    log_message(f"✅ Successfully replied to mention {job['tweet_id']}")
+    return job
+
+def create_job_queue(path=JOB_QUEUE_FILE, coordination=None, scope="default"):
+    """Local SQLite job queue, or scope's shared queue when workers coordinate"""
+    if coordination is not None:
+        return SharedJobQueue(coordination, scope, WORKER_ID, JOB_MAX_ATTEMPTS, JOB_BACKOFF_BASE,
+                              JOB_BACKOFF_MAX, JOB_LEASE_TIMEOUT)
+    return JobQueue(path, JOB_MAX_ATTEMPTS, JOB_BACKOFF_BASE, JOB_BACKOFF_MAX, JOB_LEASE_TIMEOUT)
+
+def create_mention_leader(coordination, twitter_service, scope="default"):
+    """Lease on polling scope's mentions, or None when running standalone.
+
+    Only the leader polls; the other workers just process queued mentions.
+    A worker that takes over continues from the cursor the last leader shared.
+    """
+    if coordination is None:
+        return None
+    leader = LeaderLease(coordination, f"poller:{scope}", WORKER_ID, COORDINATION_LEADER_TTL)
+    leader.on_elected = partial(adopt_shared_cursor, leader, twitter_service)
+    # Poll loops can sleep past the TTL (idle backoff, rate limit resets), so renew in the background
+    leader.start()
+    return leader
+
+def adopt_shared_cursor(leader, twitter_service):
+    shared_id = leader.backend.get_value(f"{leader.role}:cursor")
+    if shared_id and (not twitter_service.last_mention_id or int(shared_id) > int(twitter_service.last_mention_id)):
+        log_message(f"Continuing {leader.role} from shared mention cursor {shared_id}")
+        twitter_service.last_mention_id = shared_id
+        twitter_service.save_last_mention_id(shared_id)
+
+def share_cursor(leader, twitter_service):
+    if leader is not None and twitter_service.last_mention_id:
+        try:
+            leader.backend.set_value(f"{leader.role}:cursor", twitter_service.last_mention_id)
+        except Exception as e:
+            log_message(f"Error sharing mention cursor: {e}")
+
+def queue_mentions(twitter_service, job_queue, mentions, label):
+    """Durably queue mentions and mark them processed; returns how many were queued.
+
+    get_mentions has already moved the cursor past the batch, so a mention
+    that fails to queue rewinds it and is fetched again on the next poll
+    instead of being lost along with the rest of the batch.
+    """
+    queued = 0
+    failed = []
+    for mention in mentions:
+        tweet_text = mention.text if hasattr(mention, 'text') else mention.full_text
+        try:
+            job_queue.enqueue(mention.id, tweet_text)
+        except Exception as e:
+            log_message(f"[{label}] Error queueing mention {mention.id}: {e}")
+            failed.append(int(mention.id))
+            continue
+        log_debug(f"[{label}] Queued mention {mention.id}: {tweet_text}")
+        # Durably queued, so the next poll doesn't need to see it again
+        twitter_service.mark_mention_processed(mention.id)
+        queued += 1
+    if failed:
+        twitter_service.rewind_mention_cursor(min(failed))
+    return queued
+
+def build_mention_pipeline(twitter_service, meme_service, job_queue):
+    """Wire the analyze -> source -> render -> upload -> reply stages.
+
+    Jobs that reach the end are completed in job_queue; failed or dropped
+    ones are scheduled for a retry.
+    """
+    pipeline = Pipeline(
+        "mentions", queue_size=PIPELINE_QUEUE_SIZE,
+        on_complete=lambda job: job_queue.complete(job["tweet_id"], job["claim_id"]),
+        on_failure=lambda job, reason: job_queue.fail(job["tweet_id"], reason, job["claim_id"])
+    )
+    pipeline.add_stage("analyze", partial(analyze_stage, meme_service), PIPELINE_WORKERS["analyze"],
+                       batch_size=PIPELINE_ANALYZE_BATCH_SIZE)
+    pipeline.add_stage("source", partial(source_stage, meme_service), PIPELINE_WORKERS["source"])
+    pipeline.add_stage("render", partial(render_stage, meme_service), PIPELINE_WORKERS["render"])
+    pipeline.add_stage("upload", partial(upload_stage, meme_service), PIPELINE_WORKERS["upload"])
+    # Only replies are paced, by the tweet budget rather than a fixed sleep
+    pipeline.add_stage("reply", partial(reply_stage, twitter_service, job_queue=job_queue), PIPELINE_WORKERS["reply"],
+                       pacer=partial(acquire_rate_limit, "tweet_api"))
+    return pipeline
+
+def account_upload_stage(meme_service, accounts, job):
+    return upload_stage(meme_service, job, accounts[job["account"]].twitter_service)
+
+def account_reply_stage(accounts, job):
+    # Paced here rather than by a stage pacer, since each account has its own tweet budget
+    account = accounts[job["account"]]
+    acquire_rate_limit("tweet_api", limiter=account.twitter_service.rate_limiter)
+    return reply_stage(account.twitter_service, job, account.job_queue)
+
+def finish_account_job(accounts, job, failure=None):
+    """Report a job leaving the pipeline to its account's queue and free its pipeline slot"""
+    account = accounts[job["account"]]
+    try:
+        if failure:
+            account.job_queue.fail(job["tweet_id"], failure, job["claim_id"])
+        else:
+            account.job_queue.complete(job["tweet_id"], job["claim_id"])
+    finally:
+        account.pipeline_slots.release()
+
+def build_account_pipeline(accounts, meme_service):
+    """build_mention_pipeline for several accounts sharing one set of workers.
+
+    Jobs carry the account name; uploads and replies use that account's
+    credentials and budgets, and the result goes back to its job queue.
+    Each account may have at most PIPELINE_QUEUE_SIZE jobs in the pipeline,
+    which its reply queue can always take. An account stuck waiting on its
+    tweet budget therefore never blocks uploads for the others.
+    """
+    by_name = {account.name: account for account in accounts}
+    for account in accounts:
+        account.pipeline_slots = threading.BoundedSemaphore(PIPELINE_QUEUE_SIZE)
+    pipeline = Pipeline(
+        "mentions", queue_size=PIPELINE_QUEUE_SIZE,
+        on_complete=partial(finish_account_job, by_name),
+        on_failure=partial(finish_account_job, by_name)
+    )
+    pipeline.add_stage("analyze", partial(analyze_stage, meme_service), PIPELINE_WORKERS["analyze"],
+                       batch_size=PIPELINE_ANALYZE_BATCH_SIZE)
+    pipeline.add_stage("source", partial(source_stage, meme_service), PIPELINE_WORKERS["source"])
+    pipeline.add_stage("render", partial(render_stage, meme_service), PIPELINE_WORKERS["render"])
+    pipeline.add_stage("upload", partial(account_upload_stage, meme_service, by_name), PIPELINE_WORKERS["upload"])
+    # A reply queue and worker per account, so one account waiting on its budget doesn't hold up the rest
+    pipeline.add_stage("reply", partial(account_reply_stage, by_name), PIPELINE_WORKERS["reply"],
+                       partition_by=lambda job: job["account"], partitions=list(by_name))
+    return pipeline
+
+def create_poll_scheduler(limiter=None):
+    return PollScheduler("mentions_api", POLL_MIN_INTERVAL, POLL_MAX_INTERVAL, POLL_IDLE_BACKOFF, limiter)
+
+def drain_job_queue(job_queue, pipeline):
+    """Feed due jobs from the durable queue into the pipeline"""
+    last_recover_time = time.time()
     while True:
         try:
-            current_time = datetime.datetime.now().strftime("%H:%M:%S")
+            if time.time() - last_recover_time >= JOB_LEASE_TIMEOUT:
+                job_queue.recover(expired_only=True)
+                job_queue.purge_done(JOB_DONE_RETENTION)
+                last_recover_time = time.time()
+
+            first_stage = pipeline.stages[0].queue
+            jobs = job_queue.claim(max(1, first_stage.maxsize - first_stage.qsize()))
+            for job in jobs:
+                # Blocks while the pipeline is backed up
+                pipeline.submit(job)
+            if not jobs:
+                time.sleep(JOB_DRAIN_INTERVAL)
+        except Exception as e:
+            log_message(f"Error draining job queue: {e}")
+            time.sleep(JOB_DRAIN_INTERVAL)
+
+def drain_account_queues(accounts, pipeline):
+    """drain_job_queue over every account's queue, taking turns so one
+    account's backlog can't starve the others"""
+    last_recover_time = time.time()
+    while True:
+        try:
+            if time.time() - last_recover_time >= JOB_LEASE_TIMEOUT:
+                for account in accounts:
+                    account.job_queue.recover(expired_only=True)
+                    account.job_queue.purge_done(JOB_DONE_RETENTION)
+                last_recover_time = time.time()
+
+            first_stage = pipeline.stages[0].queue
+            share = max(1, (first_stage.maxsize - first_stage.qsize()) // len(accounts))
+            claimed = 0
+            for account in accounts:
+                slots = 0
+                while slots < share and account.pipeline_slots.acquire(blocking=False):
+                    slots += 1
+                jobs = account.job_queue.claim(slots) if slots else []
+                for _ in range(slots - len(jobs)):
+                    account.pipeline_slots.release()
+                for job in jobs:
+                    job["account"] = account.name
+                    pipeline.submit(job)
+                    claimed += 1
+            if not claimed:
+                time.sleep(JOB_DRAIN_INTERVAL)
+        except Exception as e:
+            log_message(f"Error draining job queues: {e}")
+            time.sleep(JOB_DRAIN_INTERVAL)
+
+def log_pipeline_stats(pipeline, meme_service, job_queues):
+    """Periodic stats line per component; job_queues maps a label to each queue"""
+    pipeline.log_stats()
+    log_connection_stats()
+    meme_service.groq_service.cache.log_stats()
+    log_message(f"[search-pools] tenor: {meme_service.tenor_service.pool.summary()}, "
+                f"unsplash: {meme_service.unsplash_service.pool.summary()}")
+    log_message(f"[asset-cache] {meme_service.asset_cache.summary()}")
+    for label, job_queue in job_queues.items():
+        log_message(f"[{label}] {job_queue.counts()}")
+    if meme_service.warm_pool:
+        log_message(f"[warm-pool] {meme_service.warm_pool.summary()}")
+    log_breakers()
+    if dropped_log_records():
+        log_message(f"[logging] {dropped_log_records()} log records dropped, writer fell behind")
+
+def fetch_and_reply_to_mentions(twitter_service, meme_service, job_queue, started_at=None, cold_reset=False,
+                                leader=None):
+    pipeline = build_mention_pipeline(twitter_service, meme_service, job_queue)
+    pipeline.start()
+    drain_thread = threading.Thread(target=drain_job_queue, args=(job_queue, pipeline),
+                                    name="job-queue-drain", daemon=True)
+    drain_thread.start()
+    if meme_service.warm_pool:
+        meme_service.warm_pool.start(idle_check=pipeline.is_idle)
+    scheduler = create_poll_scheduler()
+    last_stats_time = time.time()
+
+    while True:
+        if time.time() - last_stats_time >= PIPELINE_STATS_INTERVAL:
+            log_pipeline_stats(pipeline, meme_service, {"job-queue": job_queue})
+            last_stats_time = time.time()
+
+        if leader is not None and not leader.is_leader():
+            # Another worker polls; this one only processes queued mentions
+            time.sleep(leader.ttl / 3)
+            continue
+
+        current_time = datetime.datetime.now().strftime("%H:%M:%S")
+        mentions = []
+        try:
             log_message(f"[{current_time}] Checking for mentions...")
+            fetch_started = time.time()
             mentions = twitter_service.get_mentions()
+            pipeline.record("fetch", time.time() - fetch_started)
             
             if mentions:
-                log_message(f"[{current_time}] Processing {len(mentions)} new mentions")
-                
-                for mention in mentions:
-                    try:
-                        # Get the tweet text
-                        tweet_text = mention.text if hasattr(mention, 'text') else mention.full_text
-                        tweet_id = mention.id
-                        log_message(f"[{current_time}] Processing mention: {tweet_text}")
-                        
-                        # Process the mention with enhanced analysis
-                        analysis = meme_service.analyze_tweet_with_groq(tweet_text)
-                        log_message(f"[{current_time}] Enhanced analysis: {analysis}")
-                        
-                        meme_source, media_type = meme_service.get_meme_for_keywords(analysis, tweet_text)
-                        log_message(f"[{current_time}] Got meme source: {meme_source}, type: {media_type}")
-                        
-                        if meme_source:
-                            media_id = meme_service.download_and_upload_meme(meme_source, media_type)
-                            if media_id:
-                                result = twitter_service.reply_to_tweet(tweet_id, media_id)
-                                if result:
-                                    log_message(f"[{current_time}] ✅ Successfully replied to mention {tweet_id}")
-                                else:
-                                    log_message(f"[{current_time}] ❌ Failed to reply to mention {tweet_id}")
-                            else:
-                                log_message(f"[{current_time}] Failed to upload media")
-                        else:
-                            log_message(f"[{current_time}] Failed to get meme source")
-                        
-                        # Mark as processed
-                        twitter_service.mark_mention_processed(tweet_id)
-                        
-                        # Wait between processing mentions to respect rate limits
-                        time.sleep(5)  # Wait 5 seconds between replies
-                    
-                    except Exception as mention_e:
-                        log_message(f"[{current_time}] Error processing mention: {mention_e}")
-                
-                # After processing all mentions, wait before next check
-                log_message(f"[{current_time}] Waiting 5 seconds before next mention check...")
-                time.sleep(5)
-                continue
+                log_message(f"[{current_time}] Queueing {len(mentions)} new mentions")
+                queue_mentions(twitter_service, job_queue, mentions, current_time)
             
         except Exception as e:
             log_message(f"[{current_time}] Error in mention processing: {e}")
-        
-        # Check every 5 seconds to stay within rate limits
-        log_message(f"[{current_time}] Waiting 5 seconds before checking for new mentions...")
-        time.sleep(5)
+
+        share_cursor(leader, twitter_service)
+        if started_at is not None:
+            log_first_poll(started_at, "cold" if cold_reset else "warm")
+            started_at = None
+
+        scheduler.record_poll(len(mentions))
+        delay = scheduler.next_delay()
+        log_message(f"[{current_time}] Next mention check in {delay:.1f}s")
+        time.sleep(delay)
+
+def poll_account(account):
+    """One mention poll for account; returns seconds until its next poll"""
+    if account.leader is not None and not account.leader.is_leader():
+        # Another worker polls this account
+        return account.leader.ttl / 3
+    mentions = []
+    try:
+        mentions = account.twitter_service.get_mentions()
+        if mentions:
+            queued = queue_mentions(account.twitter_service, account.job_queue, mentions, account.name)
+            log_message(f"[{account.name}] Queued {queued}/{len(mentions)} new mentions")
+    except Exception as e:
+        log_message(f"[{account.name}] Error in mention processing: {e}")
+
+    share_cursor(account.leader, account.twitter_service)
+    account.scheduler.record_poll(len(mentions))
+    delay = account.scheduler.next_delay()
+    log_message(f"[{account.name}] Next mention check in {delay:.1f}s")
+    return delay
+
+def poll_accounts(accounts, meme_service, started_at=None, cold_reset=False):
+    """fetch_and_reply_to_mentions for several accounts.
+
+    Polls run on a pool of ACCOUNT_POLL_WORKERS threads, each account when
+    its own scheduler says it is due, and feed per-account job queues that
+    one shared pipeline drains.
+    """
+    pipeline = build_account_pipeline(accounts, meme_service)
+    pipeline.start()
+    threading.Thread(target=drain_account_queues, args=(accounts, pipeline),
+                     name="job-queue-drain", daemon=True).start()
+    if meme_service.warm_pool:
+        meme_service.warm_pool.start(idle_check=pipeline.is_idle)
+
+    executor = ThreadPoolExecutor(ACCOUNT_POLL_WORKERS, thread_name_prefix="account-poll")
+    # (time the account is due, its index); an account is out of the heap while its poll runs
+    due = [(time.time(), index) for index in range(len(accounts))]
+    heapq.heapify(due)
+    running = {}
+    polled = set()
+    last_stats_time = time.time()
+
+    while True:
+        while due and due[0][0] <= time.time():
+            _, index = heapq.heappop(due)
+            running[executor.submit(poll_account, accounts[index])] = index
+
+        timeout = max(0.0, due[0][0] - time.time()) if due else None
+        if running:
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+        else:
+            time.sleep(timeout)
+            done = set()
+        for future in done:
+            index = running.pop(future)
+            try:
+                delay = future.result()
+            except Exception as e:
+                log_message(f"[{accounts[index].name}] Mention poll failed: {e}")
+                delay = POLL_MAX_INTERVAL
+            heapq.heappush(due, (time.time() + delay, index))
+            polled.add(index)
+
+        if started_at is not None and len(polled) == len(accounts):
+            log_first_poll(started_at, "cold" if cold_reset else "warm")
+            started_at = None
+
+        if time.time() - last_stats_time >= PIPELINE_STATS_INTERVAL:
+            log_pipeline_stats(pipeline, meme_service,
+                               {f"job-queue:{account.name}": account.job_queue for account in accounts})
+            last_stats_time = time.time()
+
+async def process_mention_async(async_twitter_service, async_meme_service, tweet_id, tweet_text, reply_lock,
+                                job_queue=None, claim_id=None):
+    """Process one mention; returns None on success or the reason it failed.
+
+    With a job_queue, the reply is only posted while claim_id still holds the job.
+    """
+    try:
+        analysis = await async_meme_service.analyze_tweet_with_groq(tweet_text)
+        log_debug(f"Enhanced analysis for {tweet_id}: {analysis}")
+
+        meme_source, media_type = await async_meme_service.get_meme_for_keywords(analysis, tweet_text)
+        log_message(f"Got meme source for {tweet_id}: {describe_meme(meme_source, media_type)}")
+        if not meme_source:
+            log_message(f"Failed to get meme source for {tweet_id}")
+            return "no meme source"
+
+        media_id = await async_meme_service.download_and_upload_meme(meme_source, media_type)
+        if not media_id:
+            log_message(f"Failed to upload media for {tweet_id}")
+            return "upload failed"
+
+        # Replies go out one at a time, paced by the tweet budget
+        async with reply_lock:
+            await acquire_rate_limit_async("tweet_api")
+            # Checked after the wait, which can outlast the lease
+            if job_queue is not None and not job_queue.renew(tweet_id, claim_id):
+                log_message(f"Lease on mention {tweet_id} was lost, leaving the reply to its new owner")
+                return "lease lost"
+            result = await async_twitter_service.reply_to_tweet(tweet_id, media_id)
+
+        if not result:
+            log_message(f"❌ Failed to reply to mention {tweet_id}")
+            return "reply failed"
+        log_message(f"✅ Successfully replied to mention {tweet_id}")
+        return None
+
+    except Exception as e:
+        log_message(f"Error processing mention {tweet_id}: {e}")
+        return f"error: {e}"
+
+async def drain_job_queue_async(async_twitter_service, async_meme_service, job_queue):
+    """Run due jobs from the durable queue as tasks, ASYNC_MAX_IN_FLIGHT at a time"""
+    in_flight = asyncio.Semaphore(ASYNC_MAX_IN_FLIGHT)
+    reply_lock = asyncio.Lock()
+    tasks = set()
+
+    async def run(job):
+        try:
+            failure = await process_mention_async(async_twitter_service, async_meme_service,
+                                                  job["tweet_id"], job["tweet_text"], reply_lock,
+                                                  job_queue, job["claim_id"])
+            if failure:
+                job_queue.fail(job["tweet_id"], failure, job["claim_id"])
+            else:
+                job_queue.complete(job["tweet_id"], job["claim_id"])
+        finally:
+            in_flight.release()
+
+    last_recover_time = time.time()
+    try:
+        while True:
+            try:
+                if time.time() - last_recover_time >= JOB_LEASE_TIMEOUT:
+                    job_queue.recover(expired_only=True)
+                    job_queue.purge_done(JOB_DONE_RETENTION)
+                    last_recover_time = time.time()
+
+                await in_flight.acquire()
+                jobs = job_queue.claim(1)
+                if not jobs:
+                    in_flight.release()
+                    await asyncio.sleep(JOB_DRAIN_INTERVAL)
+                    continue
+                task = asyncio.create_task(run(jobs[0]))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            except Exception as e:
+                log_message(f"Error draining job queue: {e}")
+                await asyncio.sleep(JOB_DRAIN_INTERVAL)
+    finally:
+        # Interrupted jobs stay in_progress and are requeued on the next start
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def fetch_and_reply_to_mentions_async(async_twitter_service, async_meme_service, job_queue,
+                                            started_at=None, cold_reset=False, leader=None):
+    """Poll for mentions into the job queue while a drain task processes it"""
+    scheduler = create_poll_scheduler()
+    warm_pool = async_meme_service.meme_service.warm_pool
+    if warm_pool:
+        warm_pool.start(idle_check=lambda: job_queue.backlog() == 0)
+    drain_task = asyncio.create_task(
+        drain_job_queue_async(async_twitter_service, async_meme_service, job_queue)
+    )
+
+    try:
+        while True:
+            if leader is not None and not leader.is_leader():
+                await asyncio.sleep(leader.ttl / 3)
+                continue
+
+            current_time = datetime.datetime.now().strftime("%H:%M:%S")
+            mentions = []
+            try:
+                mentions = await async_twitter_service.get_mentions()
+                if mentions:
+                    log_message(f"[{current_time}] Queueing {len(mentions)} new mentions "
+                                f"({job_queue.backlog()} in backlog)")
+                    queue_mentions(async_twitter_service.twitter_service, job_queue, mentions, current_time)
+
+            except Exception as e:
+                log_message(f"[{current_time}] Error in mention processing: {e}")
+
+            share_cursor(leader, async_twitter_service.twitter_service)
+            if started_at is not None:
+                log_first_poll(started_at, "cold" if cold_reset else "warm")
+                started_at = None
+
+            scheduler.record_poll(len(mentions))
+            await asyncio.sleep(scheduler.next_delay())
+    finally:
+        drain_task.cancel()
+        await asyncio.gather(drain_task, return_exceptions=True)
 
 def fetch_and_process_dms(twitter_service, meme_service):
     while True:
@@ -76,11 +544,74 @@ def fetch_and_process_dms(twitter_service, meme_service):
             log_message(f"Error in DM processing: {e}")
             time.sleep(60)
 
-def main():
+def restore_rate_limits(limiter=None, cold_reset=False):
+    """Load a rate limit snapshot (or reset it with cold_reset) and keep it persisted"""
+    if cold_reset:
+        log_message("Resetting rate limits to defaults...")
+        reset_rate_limits(limiter)
+    else:
+        load_rate_limits(limiter)
+    log_rate_limits(limiter)
+    start_rate_limit_persistence(limiter)
+
+def prepare_startup_state(twitter_service, job_queue, cold_reset=False):
+    """Resume mention, job and rate limit state from disk, or wipe it with cold_reset"""
+    # Nothing is running yet, so every in-progress job was interrupted
+    job_queue.recover()
+    if cold_reset:
+        twitter_service.reset_mention_tracking()
+        # Let finished mentions be queued again; unfinished ones stay queued
+        job_queue.purge_done(0)
+        log_message("Cold reset: mention tracking cleared - bot will detect all mentions")
+    else:
+        # TwitterService already reloaded the mention log when it was created
+        log_message(f"Warm start: resuming after mention {twitter_service.last_mention_id} "
+                    f"with {len(twitter_service.mention_store)} processed mentions")
+    log_message(f"Job queue: {job_queue.counts()}")
+    # The account's own Twitter budgets in multi-account mode, otherwise the shared ones
+    restore_rate_limits(twitter_service.rate_limiter, cold_reset)
+
+def shutdown_state(twitter_service, job_queue):
+    """Flush state so the next warm start resumes from here"""
+    try:
+        save_rate_limits(twitter_service.rate_limiter)
+    except Exception as e:
+        log_message(f"Error saving rate limits on shutdown: {e}")
+    twitter_service.mention_store.close()
+    job_queue.close()
+
+def connect_coordination(url=None):
+    """Backend shared with other workers (url, then COORDINATION_URL), or None to run standalone"""
+    url = url or os.getenv("COORDINATION_URL") or COORDINATION_URL
+    if not url:
+        return None
+    coordination = create_coordination(url)
+    log_message(f"Coordinating with other workers through {type(coordination).__name__} as {WORKER_ID}")
+    return coordination
+
+def release_coordination(coordination, leaders):
+    """Hand over leadership straight away instead of letting the leases expire"""
+    for leader in leaders:
+        if leader is not None:
+            leader.release()
+    if coordination is not None:
+        coordination.close()
+
+def start_metrics():
+    if METRICS_PORT:
+        start_metrics_server(METRICS_HOST, METRICS_PORT)
+    start_metrics_reporter(METRICS_SUMMARY_INTERVAL)
+
+def log_first_poll(started_at, mode):
+    log_message(f"First mention poll finished {time.time() - started_at:.2f}s after start ({mode} start)")
+
+def main(cold_reset=False, coordination_url=None):
+    started_at = time.time()
     print("Starting meme bot setup...")
     
     # Load environment variables
     load_environment()
+    configure_logging()
     
     # Initialize services
     twitter_service = TwitterService()
@@ -91,18 +622,22 @@ def main():
         log_message("Error: Bot ID not available. Authentication failed.")
         return
     
-    # Reset mention tracking on startup
-    twitter_service.reset_mention_tracking()
-    log_message("Mention tracking reset - bot will detect all mentions")
-    
-    # Reset rate limits
-    log_message("Resetting rate limits to defaults...")
-    reset_rate_limits()
-    log_rate_limits()
+    try:
+        coordination = connect_coordination(coordination_url)
+    except Exception as e:
+        log_message(f"Error connecting to the coordination backend: {e}")
+        return
+    job_queue = create_job_queue(coordination=coordination)
+    leader = create_mention_leader(coordination, twitter_service)
+    prepare_startup_state(twitter_service, job_queue, cold_reset)
+    if coordination is not None:
+        share_rate_limits(coordination, COORDINATION_SHARED_BUDGETS)
+    start_metrics()
     
     # Start monitoring threads
     mention_thread = threading.Thread(target=fetch_and_reply_to_mentions, 
-                                    args=(twitter_service, meme_service))
+                                    args=(twitter_service, meme_service, job_queue),
+                                    kwargs={"started_at": started_at, "cold_reset": cold_reset, "leader": leader})
     dm_thread = threading.Thread(target=fetch_and_process_dms, 
                                args=(twitter_service, meme_service))
     
@@ -119,6 +654,145 @@ def main():
             time.sleep(60)
     except KeyboardInterrupt:
         log_message("Bot is shutting down...")
+        shutdown_state(twitter_service, job_queue)
+        release_coordination(coordination, [leader])
+
+def main_accounts(accounts_path, cold_reset=False, coordination_url=None):
+    """Run every account listed in accounts_path from this process.
+
+    Each account keeps its own mention log, job queue and Twitter budgets
+    under ACCOUNT_STATE_DIR/<name>/. The analysis cache, search pools, asset
+    cache, render workers and warm pool are shared. Each account's job for a
+    mention still goes through every stage, but a mention several accounts
+    see mostly hits warm caches after the first one.
+    """
+    started_at = time.time()
+    print("Starting multi-account meme bot setup...")
+
+    load_environment()
+    configure_logging()
+
+    try:
+        accounts = load_accounts(accounts_path, ACCOUNT_STATE_DIR)
+    except (OSError, ValueError) as e:
+        log_message(f"Error loading accounts from {accounts_path}: {e}")
+        return
+    try:
+        coordination = connect_coordination(coordination_url)
+    except Exception as e:
+        log_message(f"Error connecting to the coordination backend: {e}")
+        return
+
+    # Uploads name their account explicitly, so the shared service has no default one
+    meme_service = MemeService(None, GroqService())
+    ready = []
+    for account in accounts:
+        account.twitter_service = TwitterService(account)
+        if not account.twitter_service.bot_id:
+            log_message(f"[{account.name}] Authentication failed, skipping this account")
+            account.twitter_service.mention_store.close()
+            continue
+        account.job_queue = create_job_queue(account.state_path(JOB_QUEUE_FILE), coordination, account.name)
+        account.leader = create_mention_leader(coordination, account.twitter_service, account.name)
+        account.scheduler = create_poll_scheduler(account.twitter_service.rate_limiter)
+        log_message(f"[{account.name}] Restoring state from {account.state_dir}")
+        prepare_startup_state(account.twitter_service, account.job_queue, cold_reset)
+        if coordination is not None:
+            share_rate_limits(coordination, COORDINATION_SHARED_BUDGETS, account.name,
+                              account.twitter_service.rate_limiter)
+        ready.append(account)
+
+    if not ready:
+        log_message("Error: no account could authenticate.")
+        return
+
+    # Groq, Tenor and Unsplash budgets are shared by every account
+    restore_rate_limits(cold_reset=cold_reset)
+    if coordination is not None:
+        share_rate_limits(coordination, COORDINATION_SHARED_BUDGETS)
+    start_metrics()
+
+    poll_thread = threading.Thread(target=poll_accounts, args=(ready, meme_service),
+                                   kwargs={"started_at": started_at, "cold_reset": cold_reset},
+                                   name="account-polls", daemon=True)
+    poll_thread.start()
+
+    log_message(f"Bot is now running for {', '.join(account.name for account in ready)}. Press Ctrl+C to stop.")
+
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        log_message("Bot is shutting down...")
+        for account in ready:
+            shutdown_state(account.twitter_service, account.job_queue)
+        try:
+            save_rate_limits()
+        except Exception as e:
+            log_message(f"Error saving rate limits on shutdown: {e}")
+        release_coordination(coordination, [account.leader for account in ready])
+
+async def async_main(cold_reset=False, coordination_url=None):
+    started_at = time.time()
+    print("Starting meme bot setup (asyncio)...")
+
+    load_environment()
+    configure_logging()
+
+    twitter_service = TwitterService()
+    meme_service = MemeService(twitter_service, GroqService())
+
+    if not twitter_service.bot_id:
+        log_message("Error: Bot ID not available. Authentication failed.")
+        return
+
+    try:
+        coordination = connect_coordination(coordination_url)
+    except Exception as e:
+        log_message(f"Error connecting to the coordination backend: {e}")
+        return
+    job_queue = create_job_queue(coordination=coordination)
+    leader = create_mention_leader(coordination, twitter_service)
+    prepare_startup_state(twitter_service, job_queue, cold_reset)
+    if coordination is not None:
+        share_rate_limits(coordination, COORDINATION_SHARED_BUDGETS)
+    start_metrics()
+
+    async_twitter_service = AsyncTwitterService(twitter_service)
+    async_meme_service = AsyncMemeService(meme_service, AsyncGroqService(cache=meme_service.groq_service.cache))
+
+    log_message("Bot is now running on asyncio and will respond to all mentions. Press Ctrl+C to stop.")
+    try:
+        await fetch_and_reply_to_mentions_async(async_twitter_service, async_meme_service, job_queue,
+                                                started_at=started_at, cold_reset=cold_reset, leader=leader)
+    finally:
+        await async_meme_service.close()
+        await async_twitter_service.close()
+        shutdown_state(twitter_service, job_queue)
+        release_coordination(coordination, [leader])
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Twitter meme reply bot")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="process mentions on a single asyncio event loop instead of worker threads")
+    parser.add_argument("--cold-reset", action="store_true",
+                        help="forget processed mentions and spent rate limit budget instead of resuming")
+    parser.add_argument("--accounts", metavar="FILE",
+                        help="JSON list of accounts to run from this process (see services/accounts.py)")
+    parser.add_argument("--coordination", metavar="URL",
+                        help="share mentions, polling and rate budgets with other workers through a SQLite "
+                             "file or redis:// URL (defaults to COORDINATION_URL)")
+    args = parser.parse_args()
+
+    if args.accounts and args.use_async:
+        parser.error("--accounts runs on worker threads and can't be combined with --async")
+
+    if args.accounts:
+        main_accounts(args.accounts, args.cold_reset, args.coordination)
+    elif args.use_async:
+        try:
+            asyncio.run(async_main(args.cold_reset, args.coordination))
+        except KeyboardInterrupt:
+            log_message("Bot is shutting down...")
+    else:
+        main(args.cold_reset, args.coordination) 
\ No newline at end of file
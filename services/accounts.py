@@ -0,0 +1,68 @@
+import json
+import os
+import re
+
+# Credentials every account needs, as named in .env for the single-account bot
+CREDENTIAL_KEYS = ["API_KEY", "API_SECRET", "ACCESS_TOKEN", "ACCESS_SECRET", "BEARER_TOKEN"]
+
+# Account names become directory names
+NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+class Account:
+    """One bot identity in multi-account mode.
+
+    Holds the account's credentials and the directory its state files
+    (mention log, job queue, rate limits) live in. main.py attaches the
+    running services: twitter_service, job_queue, scheduler, the
+    pipeline_slots that cap its jobs in the shared pipeline and, when
+    workers coordinate, the poller leader lease.
+    """
+
+    def __init__(self, name, credentials, state_dir):
+        self.name = name
+        self.credentials = credentials
+        self.state_dir = state_dir
+        self.twitter_service = None
+        self.job_queue = None
+        self.scheduler = None
+        self.pipeline_slots = None
+        self.leader = None
+
+    def credential(self, key):
+        return self.credentials.get(key)
+
+    def state_path(self, filename):
+        """Namespaced path for one of the account's state files"""
+        os.makedirs(self.state_dir, exist_ok=True)
+        return os.path.join(self.state_dir, filename)
+
+
+def load_accounts(path, state_root):
+    """Read account configs from a JSON list.
+
+    Each entry has a "name" and either "credentials" (a dict keyed like
+    CREDENTIAL_KEYS) or an "env_prefix" naming environment variables, e.g.
+    {"name": "alice", "env_prefix": "ALICE_"} reads ALICE_API_KEY and so on.
+    State for each account goes in state_root/<name>/. Raises ValueError
+    for a malformed file.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"{path} must contain a non-empty list of accounts")
+
+    accounts = []
+    for entry in entries:
+        name = entry.get("name", "")
+        if not NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid account name {name!r}: use letters, digits, '-' and '_'")
+        if any(account.name == name for account in accounts):
+            raise ValueError(f"Account {name!r} is listed twice")
+        if "credentials" in entry:
+            credentials = {key: entry["credentials"].get(key) for key in CREDENTIAL_KEYS}
+        else:
+            prefix = entry.get("env_prefix", f"{name.upper()}_")
+            credentials = {key: os.getenv(prefix + key) for key in CREDENTIAL_KEYS}
+        accounts.append(Account(name, credentials, os.path.join(state_root, name)))
+    return accounts
@@ -1,24 +1,22 @@
 import os
-from utils.logging_utils import log_message
-from groq import Groq
+import re
+import time
+from utils.logging_utils import log_message, log_debug
+from utils.metrics import timed
+from utils.cache import AnalysisCache
+from utils.rate_limiting import acquire_rate_limit, acquire_rate_limit_async
+from utils.circuit_breaker import get_breaker
+from config.settings import (
+    ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_TTL, ANALYSIS_CACHE_FILE, ANALYSIS_CACHE_DISK_SIZE, GROQ_RATE_LIMIT_WAIT
+)
+from groq import Groq, AsyncGroq
 
-class GroqService:
-    def __init__(self):
-        try:
-            self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-            log_message("Groq client initialized successfully")
-        except Exception as e:
-            log_message(f"Error initializing Groq client: {e}")
-            self.client = None
-            log_message("Using fallback keyword extraction")
+MODEL = "mixtral-8x7b-32768"
+SYSTEM_PROMPT = "You are a meme analysis expert. Analyze tweets to extract the best elements for meme generation."
 
-    def analyze_text(self, text):
-        """Analyze text to extract keywords, sentiment, and context"""
-        try:
-            if not self.client:
-                return self._fallback_keyword_extraction(text)
-            
-            prompt = f"""Analyze this tweet and provide a detailed breakdown for meme generation:
+def build_analysis_messages(text):
+    """Chat messages asking the model to analyze a single tweet"""
+    prompt = f"""Analyze this tweet and provide a detailed breakdown for meme generation:
 
 Tweet: "{text}"
 
@@ -35,68 +33,277 @@ SENTIMENT: positive/negative/neutral
 CONTEXT: brief description
 STYLE: style1, style2
 EMOJIS: emoji1, emoji2, emoji3"""
-            
-            completion = self.client.chat.completions.create(
-                model="mixtral-8x7b-32768",
-                messages=[
-                    {"role": "system", "content": "You are a meme analysis expert. Analyze tweets to extract the best elements for meme generation."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=200
-            )
-            
+
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+def parse_analysis(response):
+    """Parse a KEYWORDS/SENTIMENT/... formatted reply into an analysis dict"""
+    analysis = {}
+    for line in response.split('\n'):
+        if ':' in line:
+            key, value = line.split(':', 1)
+            analysis[key.strip()] = value.strip()
+
+    # Extract keywords and additional context
+    keywords = [k.strip() for k in analysis.get('KEYWORDS', '').split(',')]
+    sentiment = analysis.get('SENTIMENT', 'neutral')
+    context = analysis.get('CONTEXT', '')
+    style = [s.strip() for s in analysis.get('STYLE', '').split(',')]
+    emojis = [e.strip() for e in analysis.get('EMOJIS', '').split(',')]
+
+    # Combine all information
+    return {
+        'keywords': keywords,
+        'sentiment': sentiment,
+        'context': context,
+        'style': style,
+        'emojis': emojis
+    }
+
+def build_batch_messages(texts):
+    """Chat messages asking the model to analyze several numbered tweets at once"""
+    tweets = "\n".join(f'[{i}] "{text}"' for i, text in enumerate(texts, 1))
+    prompt = f"""Analyze each of these tweets and provide a breakdown for meme generation:
+
+{tweets}
+
+For each tweet provide:
+1. Main keywords (3-5 words that capture the core meaning)
+2. Sentiment (positive/negative/neutral)
+3. Context (what's happening in the tweet)
+4. Meme style (reaction/relatable/sarcastic/funny)
+5. Emoji suggestions (2-3 relevant emojis)
+
+Answer every tweet in order, starting each block with its number in brackets on its own line:
+[1]
+KEYWORDS: word1, word2, word3
+SENTIMENT: positive/negative/neutral
+CONTEXT: brief description
+STYLE: style1, style2
+EMOJIS: emoji1, emoji2, emoji3
+[2]
+..."""
+
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+def parse_batch_analysis(response, count):
+    """Split a numbered batch reply into per-tweet analysis dicts.
+
+    Entries that are missing or have no KEYWORDS line come back as None so
+    the caller can retry them individually.
+    """
+    results = [None] * count
+    blocks = re.split(r"^\s*\[(\d+)\]\s*$", response, flags=re.MULTILINE)
+    # re.split yields [preamble, number, block, number, block, ...]
+    for number, block in zip(blocks[1::2], blocks[2::2]):
+        index = int(number) - 1
+        if 0 <= index < count and "KEYWORDS:" in block:
+            results[index] = parse_analysis(block.strip())
+    return results
+
+def fallback_keyword_extraction(text):
+    """Simple keyword extraction when Groq is unavailable"""
+    log_message("Using fallback keyword extraction")
+    # Remove mentions and URLs
+    words = text.split()
+    keywords = [word for word in words
+               if not word.startswith('@')
+               and not word.startswith('http')
+               and not word.startswith('#')
+               and len(word) > 3]
+
+    # Take up to 3 words as keywords
+    selected = keywords[:3] if keywords else ["meme", "reaction"]
+    log_message(f"Fallback keywords: {selected}")
+    return {
+        'keywords': selected,
+        'sentiment': 'neutral',
+        'context': 'general',
+        'style': ['reaction'],
+        'emojis': ['😂', '💀']
+    }
+
+def create_analysis_cache():
+    return AnalysisCache(ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_TTL, ANALYSIS_CACHE_FILE, ANALYSIS_CACHE_DISK_SIZE)
+
+class GroqService:
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else create_analysis_cache()
+        try:
+            self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+            log_message("Groq client initialized successfully")
+        except Exception as e:
+            log_message(f"Error initializing Groq client: {e}")
+            self.client = None
+            log_message("Using fallback keyword extraction")
+
+    def analyze_text(self, text):
+        """Analyze text to extract keywords, sentiment, and context"""
+        cached = self.cache.get(text)
+        if cached:
+            return cached
+        return self._analyze_uncached(text)
+
+    @timed("analyze_text")
+    def _analyze_uncached(self, text):
+        """analyze_text for a text already looked up in the cache"""
+        try:
+            # An open breaker skips straight to the fallback instead of waiting on Groq
+            breaker = get_breaker("groq")
+            if not self.client or not breaker.allow():
+                return self._fallback_keyword_extraction(text)
+            if not acquire_rate_limit("groq_api", timeout=GROQ_RATE_LIMIT_WAIT):
+                breaker.cancel()
+                return self._fallback_keyword_extraction(text)
+
+            started = time.time()
+            try:
+                completion = self.client.chat.completions.create(
+                    model=MODEL,
+                    messages=build_analysis_messages(text),
+                    temperature=0.7,
+                    max_tokens=200
+                )
+            except Exception:
+                breaker.record_failure(time.time() - started)
+                raise
+            breaker.record_success(time.time() - started)
+
             response = completion.choices[0].message.content.strip()
-            log_message(f"Groq analysis response: {response}")
-            
-            # Parse the response
-            analysis = {}
-            for line in response.split('\n'):
-                if ':' in line:
-                    key, value = line.split(':', 1)
-                    analysis[key.strip()] = value.strip()
-            
-            # Extract keywords and additional context
-            keywords = [k.strip() for k in analysis.get('KEYWORDS', '').split(',')]
-            sentiment = analysis.get('SENTIMENT', 'neutral')
-            context = analysis.get('CONTEXT', '')
-            style = [s.strip() for s in analysis.get('STYLE', '').split(',')]
-            emojis = [e.strip() for e in analysis.get('EMOJIS', '').split(',')]
-            
-            # Combine all information
-            result = {
-                'keywords': keywords,
-                'sentiment': sentiment,
-                'context': context,
-                'style': style,
-                'emojis': emojis
-            }
-            
-            log_message(f"Enhanced analysis result: {result}")
+            log_debug(f"Groq analysis response: {response}")
+
+            result = parse_analysis(response)
+            self.cache.set(text, result, time.time() - started)
+            log_debug(f"Enhanced analysis result: {result}")
             return result
-            
+
         except Exception as e:
             log_message(f"Error in Groq analysis: {e}")
             return self._fallback_keyword_extraction(text)
 
+    @timed("analyze_batch")
+    def analyze_batch(self, texts):
+        """Analyze several tweets with a single completion.
+
+        Cached and duplicate texts are left out of the request; anything the
+        batch reply doesn't cover is analyzed with its own analyze_text call.
+        """
+        results = [None] * len(texts)
+        pending = {}
+        for i, text in enumerate(texts):
+            cached = self.cache.get(text)
+            if cached:
+                results[i] = cached
+            else:
+                pending.setdefault(self.cache.key(text), []).append(i)
+
+        breaker = get_breaker("groq")
+        use_batch = len(pending) > 1 and self.client and breaker.allow()
+        if use_batch and not acquire_rate_limit("groq_api", timeout=GROQ_RATE_LIMIT_WAIT):
+            breaker.cancel()
+            use_batch = False
+        if use_batch:
+            batch = [texts[indices[0]] for indices in pending.values()]
+            try:
+                started = time.time()
+                try:
+                    completion = self.client.chat.completions.create(
+                        model=MODEL,
+                        messages=build_batch_messages(batch),
+                        temperature=0.7,
+                        max_tokens=200 * len(batch)
+                    )
+                except Exception:
+                    breaker.record_failure(time.time() - started)
+                    raise
+                # Judge the batch by its per-tweet latency, like single calls
+                breaker.record_success((time.time() - started) / len(batch))
+                response = completion.choices[0].message.content.strip()
+                log_debug(f"Groq batch analysis response: {response}")
+
+                parsed = parse_batch_analysis(response, len(batch))
+                latency = (time.time() - started) / len(batch)
+                for indices, text, analysis in zip(pending.values(), batch, parsed):
+                    if analysis:
+                        self.cache.set(text, analysis, latency)
+                        for i in indices:
+                            results[i] = dict(analysis)
+                log_message(f"Batch analysis parsed {sum(1 for a in parsed if a)}/{len(batch)} tweets")
+            except Exception as e:
+                log_message(f"Error in Groq batch analysis: {e}")
+
+        for indices in pending.values():
+            if results[indices[0]] is None:
+                analysis = self._analyze_uncached(texts[indices[0]])
+                for i in indices:
+                    results[i] = dict(analysis)
+        return results
+
     def _fallback_keyword_extraction(self, text):
         """Simple keyword extraction when Groq is unavailable"""
-        log_message("Using fallback keyword extraction")
-        # Remove mentions and URLs
-        words = text.split()
-        keywords = [word for word in words 
-                   if not word.startswith('@') 
-                   and not word.startswith('http') 
-                   and not word.startswith('#')
-                   and len(word) > 3]
-        
-        # Take up to 3 words as keywords
-        selected = keywords[:3] if keywords else ["meme", "reaction"]
-        log_message(f"Fallback keywords: {selected}")
-        return {
-            'keywords': selected,
-            'sentiment': 'neutral',
-            'context': 'general',
-            'style': ['reaction'],
-            'emojis': ['😂', '💀']
-        } 
\ No newline at end of file
+        return fallback_keyword_extraction(text)
+
+class AsyncGroqService:
+    """asyncio variant of GroqService sharing its prompt and parsing"""
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else create_analysis_cache()
+        try:
+            self.client = AsyncGroq(api_key=os.getenv("GROQ_API_KEY"))
+            log_message("Async Groq client initialized successfully")
+        except Exception as e:
+            log_message(f"Error initializing async Groq client: {e}")
+            self.client = None
+            log_message("Using fallback keyword extraction")
+
+    async def analyze_text(self, text):
+        """Analyze text to extract keywords, sentiment, and context"""
+        cached = self.cache.get(text)
+        if cached:
+            return cached
+        return await self._analyze_uncached(text)
+
+    @timed("analyze_text")
+    async def _analyze_uncached(self, text):
+        try:
+            breaker = get_breaker("groq")
+            if not self.client or not breaker.allow():
+                return fallback_keyword_extraction(text)
+            if not await acquire_rate_limit_async("groq_api", timeout=GROQ_RATE_LIMIT_WAIT):
+                breaker.cancel()
+                return fallback_keyword_extraction(text)
+
+            started = time.time()
+            try:
+                completion = await self.client.chat.completions.create(
+                    model=MODEL,
+                    messages=build_analysis_messages(text),
+                    temperature=0.7,
+                    max_tokens=200
+                )
+            except Exception:
+                breaker.record_failure(time.time() - started)
+                raise
+            breaker.record_success(time.time() - started)
+
+            response = completion.choices[0].message.content.strip()
+            log_debug(f"Groq analysis response: {response}")
+
+            result = parse_analysis(response)
+            self.cache.set(text, result, time.time() - started)
+            log_debug(f"Enhanced analysis result: {result}")
+            return result
+
+        except Exception as e:
+            log_message(f"Error in async Groq analysis: {e}")
+            return fallback_keyword_extraction(text)
+
+    async def close(self):
+        if self.client:
+            await self.client.close()
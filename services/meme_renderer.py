@@ -0,0 +1,105 @@
+from functools import lru_cache
+from io import BytesIO
+from PIL import Image, ImageDraw, ImageFont
+
+# Tried in order; the first one that loads is used for every size
+FONT_PATHS = [
+    "C:/Windows/Fonts/Impact.ttf",
+    "C:/Windows/Fonts/Arial.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "arial.ttf"
+]
+
+TEXT_SIZE = 60
+LINE_HEIGHT = 70
+PADDING = 20
+OUTLINE_WIDTH = 3
+WATERMARK_SIZE = 40
+WATERMARK_PADDING = 10
+MAX_SIZE = (1200, 1200)
+
+TEXT_COLOR = (255, 255, 255)  # White
+OUTLINE_COLOR = (0, 0, 0)  # Black
+
+
+@lru_cache(maxsize=None)
+def load_font(size):
+    """Load the meme font once per size instead of probing paths on every render"""
+    for path in FONT_PATHS:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:
+        # Pillow < 10.1 has no sized default font
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=512)
+def render_line_layer(text, size, stroke_width=OUTLINE_WIDTH):
+    """Rasterize one outlined line into an RGBA layer.
+
+    Returns (layer, offset) where offset is the layer's position relative to
+    the text origin. Layers are cached, so repeated template lines are only
+    rasterized once; callers must not modify the returned image.
+    """
+    font = load_font(size)
+    draw = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    left, top, right, bottom = draw.textbbox((0, 0), text, font=font, stroke_width=stroke_width)
+    layer = Image.new("RGBA", (max(1, right - left), max(1, bottom - top)), (0, 0, 0, 0))
+    ImageDraw.Draw(layer).text(
+        (-left, -top), text, TEXT_COLOR, font=font,
+        stroke_width=stroke_width, stroke_fill=OUTLINE_COLOR
+    )
+    return layer, (left, top)
+
+
+def text_width(text, size):
+    font = load_font(size)
+    try:
+        return font.getlength(text)
+    except AttributeError:
+        # Fallback for older Pillow versions
+        return font.getsize(text)[0]
+
+
+def prepare_image(img):
+    """Convert to RGB and shrink to the upload size"""
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img.thumbnail(MAX_SIZE, Image.Resampling.LANCZOS)
+    return img
+
+
+def draw_meme_text(img, meme_text, watermark=None):
+    """Draw bottom-aligned outlined meme text (and an optional watermark) onto img"""
+    lines = meme_text.split('\n')
+    start_y = img.height - LINE_HEIGHT * len(lines) - PADDING
+
+    for i, line in enumerate(lines):
+        if not line:
+            continue
+        layer, (left, top) = render_line_layer(line, TEXT_SIZE)
+        x = int((img.width - text_width(line, TEXT_SIZE)) / 2)
+        y = start_y + i * LINE_HEIGHT
+        img.paste(layer, (x + left, y + top), layer)
+
+    if watermark:
+        layer, (left, top) = render_line_layer(watermark, WATERMARK_SIZE, 0)
+        img.paste(layer, (WATERMARK_PADDING + left, WATERMARK_PADDING + top), layer)
+
+    return img
+
+
+def render_meme_bytes(image_bytes, meme_text, watermark=None, quality=95):
+    """Decode, resize, draw and JPEG-encode a meme entirely in memory.
+
+    Module-level so RenderPool can send it to a worker process.
+    """
+    img = prepare_image(Image.open(BytesIO(image_bytes)))
+    draw_meme_text(img, meme_text, watermark)
+    output = BytesIO()
+    img.save(output, format="JPEG", quality=quality)
+    return output.getvalue()
@@ -1,19 +1,59 @@
+import asyncio
 import random
-import requests
-import tempfile
 import os
-from PIL import Image, ImageDraw, ImageFont
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait, FIRST_COMPLETED
 from io import BytesIO
 from utils.logging_utils import log_message
-from services.unsplash_service import UnsplashService
-from services.tenor_service import TenorService
+from utils.metrics import timed
+from utils.asset_cache import AssetCache
+from utils.rate_limiting import acquire_rate_limit
+from config.settings import (
+    ASSET_CACHE_DIR, ASSET_CACHE_MAX_BYTES, ASSET_CACHE_REVALIDATE_AFTER, ASSET_CACHE_INDEX_SAVE_INTERVAL,
+    RENDER_PROCESS_WORKERS, RENDER_JOB_TIMEOUT, CHUNKED_UPLOAD_THRESHOLD, MEDIA_UPLOAD_WAIT,
+    WARM_POOL_PER_BUCKET, WARM_POOL_REFILL_INTERVAL, WARM_POOL_MAX_AGE, WARM_POOL_LIVE_BUDGET,
+    WARM_POOL_LIVE_WORKERS, SOURCING_MODE, SOURCE_BUDGETS, SOURCE_PREFERENCE_GRACE, SOURCE_RACE_WORKERS
+)
+from services.meme_renderer import render_meme_bytes
+from services.render_pool import RenderPool
+from services.warm_pool import WarmPool
+from services.unsplash_service import UnsplashService, AsyncUnsplashService
+from services.tenor_service import TenorService, AsyncTenorService
+
+# Keywords used when the tweet's own keywords find nothing
+BACKUP_KEYWORDS = ["funny", "meme", "reaction"]
+
+WATERMARK_EMOJIS = ["💀", "😭", "💅", "✨", "🔥", "💯", "🤌", "😤"]
+
+def describe_meme(meme_source, media_type):
+    """Log-friendly description; rendered memes are raw JPEG bytes"""
+    if isinstance(meme_source, (bytes, bytearray)):
+        return f"rendered {media_type} ({len(meme_source) // 1024} KB)"
+    return f"{meme_source}, type: {media_type}"
 
 class MemeService:
-    def __init__(self, twitter_service, groq_service):
+    def __init__(self, twitter_service, groq_service, asset_cache=None, render_pool=None, warm_pool=None):
         self.twitter_service = twitter_service
         self.groq_service = groq_service
         self.unsplash_service = UnsplashService()
         self.tenor_service = TenorService()
+        self.asset_cache = asset_cache or AssetCache(
+            ASSET_CACHE_DIR, ASSET_CACHE_MAX_BYTES, ASSET_CACHE_REVALIDATE_AFTER
+        )
+        self.asset_cache.start_persistence(ASSET_CACHE_INDEX_SAVE_INTERVAL)
+        self.render_pool = render_pool
+        if self.render_pool is None and RENDER_PROCESS_WORKERS > 0:
+            self.render_pool = RenderPool(RENDER_PROCESS_WORKERS, RENDER_JOB_TIMEOUT)
+        # Prefetched memes served when live sourcing is slow or fails; refilled once started
+        self.warm_pool = warm_pool
+        if self.warm_pool is None and WARM_POOL_PER_BUCKET > 0:
+            self.warm_pool = WarmPool(self, WARM_POOL_PER_BUCKET, WARM_POOL_REFILL_INTERVAL, WARM_POOL_MAX_AGE)
+        self.live_executor = ThreadPoolExecutor(WARM_POOL_LIVE_WORKERS, thread_name_prefix="live-meme")
+        # A pool per provider, so a stalled Tenor can't keep Unsplash searches queued behind it
+        self.source_executors = {
+            kind: ThreadPoolExecutor(SOURCE_RACE_WORKERS, thread_name_prefix=f"meme-source-{kind}")
+            for kind in ("gif", "image")
+        }
         
         # Enhanced meme templates with more Gen-Z humor
         self.meme_templates = {
@@ -59,91 +99,32 @@ class MemeService:
         # Use Groq service's analyze_text method
         return self.groq_service.analyze_text(tweet_text)
 
+    def analyze_tweets_with_groq(self, tweet_texts):
+        """Analyze a batch of tweets with one Groq completion"""
+        return self.groq_service.analyze_batch(tweet_texts)
+
+    @timed("create_meme")
     def create_meme(self, image_url, meme_text):
         try:
-            # Download the image
-            response = requests.get(image_url)
-            img = Image.open(BytesIO(response.content))
-            
-            # Convert to RGB if necessary
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Resize if needed
-            max_size = (1200, 1200)
-            img.thumbnail(max_size, Image.Resampling.LANCZOS)
-            
-            # Create drawing object
-            draw = ImageDraw.Draw(img)
-            
-            # Try to load a fun font, fallback to default if not available
-            try:
-                # Try different font paths
-                font_paths = [
-                    "C:/Windows/Fonts/Impact.ttf",
-                    "C:/Windows/Fonts/Arial.ttf",
-                    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
-                    "arial.ttf"
-                ]
-                font = None
-                for path in font_paths:
-                    try:
-                        font = ImageFont.truetype(path, 60)
-                        break
-                    except:
-                        continue
-                if not font:
-                    font = ImageFont.load_default()
-            except:
-                font = ImageFont.load_default()
-            
-            # Add text with better positioning and style
-            text_color = (255, 255, 255)  # White
-            outline_color = (0, 0, 0)      # Black
-            
-            # Split text into lines
-            lines = meme_text.split('\n')
-            
-            # Calculate total text height
-            line_height = 70
-            total_height = line_height * len(lines)
-            
-            # Position text at bottom with padding
-            padding = 20
-            start_y = img.height - total_height - padding
-            
-            # Draw each line
-            for i, line in enumerate(lines):
-                # Calculate line width for centering
-                try:
-                    text_width = draw.textlength(line, font=font)
-                except:
-                    # Fallback for older Pillow versions
-                    text_width = font.getsize(line)[0]
-                
-                x = (img.width - text_width) / 2
-                y = start_y + (i * line_height)
-                
-                # Draw outline
-                outline_width = 3
-                for dx in range(-outline_width, outline_width + 1):
-                    for dy in range(-outline_width, outline_width + 1):
-                        draw.text((x + dx, y + dy), line, outline_color, font=font)
-                
-                # Draw main text
-                draw.text((x, y), line, text_color, font=font)
+            # Download the image (or reuse the cached copy)
+            with self.asset_cache.use(image_url) as image_path:
+                if not image_path:
+                    log_message(f"Failed to download image: {image_url}")
+                    return None
+                with open(image_path, "rb") as f:
+                    image_bytes = f.read()
             
-            # Add random emoji watermark
-            emojis = ["💀", "😭", "💅", "✨", "🔥", "💯", "🤌", "😤"]
-            watermark = random.choice(emojis)
-            watermark_size = 40
-            watermark_padding = 10
-            draw.text((watermark_padding, watermark_padding), watermark, text_color, font=ImageFont.truetype("arial.ttf", watermark_size))
+            # Outlined text plus a random emoji watermark, in a worker process if enabled
+            watermark = random.choice(WATERMARK_EMOJIS)
+            if self.render_pool:
+                meme_bytes = self.render_pool.render(image_bytes, meme_text, watermark)
+            else:
+                meme_bytes = render_meme_bytes(image_bytes, meme_text, watermark)
+            if not meme_bytes:
+                return None
             
-            # Save to temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as temp_file:
-                img.save(temp_file, format="JPEG", quality=95)
-                return temp_file.name
+            # Kept in memory and uploaded as a file object, no temp file
+            return meme_bytes
                 
         except Exception as e:
             log_message(f"Error creating meme: {e}")
@@ -212,43 +193,151 @@ class MemeService:
             log_message(f"Error generating meme text: {e}")
             return "vibing rn fr fr"
 
-    def get_meme_for_keywords(self, analysis, tweet_text):
-        """Get meme based on enhanced analysis"""
+    def _gif_probability(self, style):
+        """Adjust GIF probability based on context and style"""
+        if 'reaction' in style:
+            return 0.7  # higher chance for reaction memes
+        elif 'funny' in style:
+            return 0.6  # slightly higher for funny content
+        return 0.5
+
+    def find_meme_source(self, analysis):
+        """Pick a GIF or a source image for the analysis without rendering it"""
         try:
             keywords = analysis['keywords']
-            sentiment = analysis['sentiment']
-            context = analysis['context']
-            style = analysis['style']
-            
-            # Adjust GIF probability based on context and style
-            gif_probability = 0.5  # default
-            if 'reaction' in style:
-                gif_probability = 0.7  # higher chance for reaction memes
-            elif 'funny' in style:
-                gif_probability = 0.6  # slightly higher for funny content
-            
-            # Try GIF first if probability check passes
-            if random.random() < gif_probability:
-                gif_url = self.tenor_service.search_gif(keywords)
-                if gif_url:
-                    return gif_url, "gif"
-            
-            # Try Unsplash for static memes
-            image_url = self.unsplash_service.search_image(keywords)
+            prefer_gif = random.random() < self._gif_probability(analysis['style'])
+
+            if SOURCING_MODE == "race":
+                source_url, media_type = self._race_sources(keywords, prefer_gif)
+                if source_url:
+                    return source_url, media_type
+            else:
+                if prefer_gif:
+                    gif_url = self.tenor_service.search_gif(keywords)
+                    if gif_url:
+                        return gif_url, "gif"
+                image_url = self.unsplash_service.search_image(keywords)
+                if image_url:
+                    return image_url, "image"
+
+            image_url = self.unsplash_service.search_image(BACKUP_KEYWORDS)
             if image_url:
-                meme_text = self.generate_meme_text(analysis, tweet_text)
-                meme_path = self.create_meme(image_url, meme_text)
-                if meme_path:
-                    return meme_path, "image"
+                return image_url, "image"
+
+            return None, None
+
+        except Exception as e:
+            log_message(f"Error finding meme source: {e}")
+            return None, None
+
+    def _race_sources(self, keywords, prefer_gif):
+        """Search Tenor and Unsplash at once and return the first usable result.
+
+        A result of the preferred kind wins straight away; one of the other
+        kind is used if the preferred search fails, runs past its budget, or
+        hasn't answered SOURCE_PREFERENCE_GRACE seconds later. Searches still
+        running are cancelled (or, once started, left to fill the result pools).
+        """
+        started = time.time()
+        preferred = "gif" if prefer_gif else "image"
+        searches = {
+            self.source_executors["gif"].submit(self.tenor_service.search_gif, keywords): "gif",
+            self.source_executors["image"].submit(self.unsplash_service.search_image, keywords): "image"
+        }
+        deadlines = {kind: started + SOURCE_BUDGETS[kind] for kind in searches.values()}
+        pending = set(searches)
+        fallback = None
+        grace_deadline = None
+
+        while pending:
+            now = time.time()
+            for future in [f for f in pending if now >= deadlines[searches[f]]]:
+                log_message(f"{searches[future]} search ran past its {SOURCE_BUDGETS[searches[future]]}s budget")
+                future.cancel()
+                pending.discard(future)
+            if not pending or (fallback and now >= grace_deadline):
+                break
+
+            wait_until = min(deadlines[searches[f]] for f in pending)
+            if grace_deadline:
+                wait_until = min(wait_until, grace_deadline)
+            done, _ = wait(pending, timeout=max(0, wait_until - now), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                pending.discard(future)
+                kind = searches[future]
+                url = None if future.exception() else future.result()
+                if not url:
+                    continue
+                fallback = (url, kind)
+                if kind == preferred:
+                    pending.clear()
+                    break
+                grace_deadline = time.time() + SOURCE_PREFERENCE_GRACE
+
+        for future in pending:
+            future.cancel()
+        if fallback:
+            log_message(f"Raced sourcing picked {fallback[1]} in {time.time() - started:.2f}s "
+                        f"(preferred {preferred})")
+            return fallback
+        return None, None
+
+    def render_meme(self, image_url, analysis, tweet_text):
+        """Generate meme text for the analysis and draw it onto the image"""
+        meme_text = self.generate_meme_text(analysis, tweet_text)
+        return self.create_meme(image_url, meme_text)
+
+    def within_budget(self, func, *args):
+        """Run live sourcing work, giving up after WARM_POOL_LIVE_BUDGET seconds.
+
+        The budget only applies while the warm pool has something to serve
+        instead; otherwise func runs to completion. Abandoned work finishes in
+        the background and still fills the search and asset caches.
+        """
+        if not self.warm_pool or not self.warm_pool.has_entries():
+            return func(*args)
+        future = self.live_executor.submit(func, *args)
+        try:
+            return future.result(timeout=WARM_POOL_LIVE_BUDGET)
+        except FutureTimeoutError:
+            log_message(f"Live {func.__name__} took over {WARM_POOL_LIVE_BUDGET}s, using the warm pool")
+            return None
+
+    def take_prefetched(self, analysis):
+        """(meme_source, media_type) from the warm pool, or (None, None)"""
+        if self.warm_pool:
+            prefetched = self.warm_pool.take(analysis)
+            if prefetched:
+                return prefetched
+        return None, None
+
+    def get_meme_for_keywords(self, analysis, tweet_text):
+        """Get meme based on enhanced analysis, falling back to the warm pool"""
+        live = self.within_budget(self._live_meme_for_keywords, analysis, tweet_text)
+        meme_source, media_type = live or (None, None)
+        if meme_source:
+            return meme_source, media_type
+        return self.take_prefetched(analysis)
+
+    def _live_meme_for_keywords(self, analysis, tweet_text):
+        """Search and render a meme for this analysis"""
+        try:
+            source_url, media_type = self.find_meme_source(analysis)
+            if media_type == "gif":
+                return source_url, "gif"
+            
+            if source_url:
+                meme_bytes = self.render_meme(source_url, analysis, tweet_text)
+                if meme_bytes:
+                    return meme_bytes, "image"
             
             # If all else fails, try one more time with different keywords
-            backup_keywords = ["funny", "meme", "reaction"]
-            image_url = self.unsplash_service.search_image(backup_keywords)
+            image_url = self.unsplash_service.search_image(BACKUP_KEYWORDS)
             if image_url:
-                meme_text = self.generate_meme_text(analysis, tweet_text)
-                meme_path = self.create_meme(image_url, meme_text)
-                if meme_path:
-                    return meme_path, "image"
+                meme_bytes = self.render_meme(image_url, analysis, tweet_text)
+                if meme_bytes:
+                    return meme_bytes, "image"
             
             return None, None
             
@@ -256,34 +345,43 @@ class MemeService:
             log_message(f"Error getting meme for keywords: {e}")
             return None, None
 
-    def download_and_upload_meme(self, meme_source, media_type):
+    @timed("download_and_upload_meme")
+    def download_and_upload_meme(self, meme_source, media_type, twitter_service=None):
+        """Upload a GIF URL or rendered meme bytes; returns the media ID.
+
+        twitter_service picks the account to upload as in multi-account mode.
+        """
+        twitter_service = twitter_service or self.twitter_service
         try:
+            if not acquire_rate_limit("media_api", timeout=MEDIA_UPLOAD_WAIT, limiter=twitter_service.rate_limiter):
+                log_message("Media upload budget used up")
+                return None
+            
             if media_type == "gif":
-                # Download GIF and upload directly
-                response = requests.get(meme_source, stream=True)
-                if response.status_code != 200:
-                    log_message(f"Failed to download GIF: {response.status_code}")
-                    return None
-                
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".gif") as temp_file:
-                    temp_file.write(response.content)
-                    temp_file_path = temp_file.name
-                    log_message(f"Downloaded GIF to {temp_file_path}")
+                # GIFs are streamed into the asset cache and uploaded from there
+                with self.asset_cache.use(meme_source) as gif_path:
+                    if not gif_path:
+                        log_message(f"Failed to download GIF: {meme_source}")
+                        return None
+                    size = os.path.getsize(gif_path)
+                    chunked = size > CHUNKED_UPLOAD_THRESHOLD
+                    log_message(f"Uploading cached GIF {gif_path} ({size // 1024} KB, chunked={chunked})")
+                    with open(gif_path, "rb") as gif_file:
+                        media = twitter_service.api.media_upload(
+                            filename=os.path.basename(gif_path),
+                            file=gif_file,
+                            chunked=chunked,
+                            media_category="tweet_gif" if chunked else None
+                        )
             else:
-                # Use the generated meme image path
-                temp_file_path = meme_source
-                log_message(f"Using meme image at {temp_file_path}")
-            
-            # Upload to Twitter
-            log_message(f"Uploading media to Twitter: {temp_file_path}")
-            media = self.twitter_service.api.media_upload(temp_file_path)
+                log_message(f"Uploading {describe_meme(meme_source, media_type)}")
+                media = twitter_service.api.media_upload(
+                    filename="meme.jpg",
+                    file=BytesIO(meme_source)
+                )
             
             if media and hasattr(media, 'media_id'):
                 log_message(f"Successfully uploaded media, got ID: {media.media_id}")
-                
-                # Clean up
-                os.unlink(temp_file_path)
-                
                 return media.media_id
             else:
                 log_message("Media upload returned unexpected result")
@@ -291,10 +389,155 @@ class MemeService:
             
         except Exception as e:
             log_message(f"Error uploading meme: {e}")
-            # Try to clean up the file even if there was an error
-            try:
-                if 'temp_file_path' in locals() and os.path.exists(temp_file_path):
-                    os.unlink(temp_file_path)
-            except:
-                pass
-            return None 
\ No newline at end of file
+            return None
+
+class AsyncMemeService:
+    """asyncio front end for MemeService.
+
+    Analysis and searches use the async services; CPU-bound rendering and the
+    blocking v1.1 media upload run in worker threads via the wrapped
+    MemeService.
+    """
+
+    def __init__(self, meme_service, async_groq_service):
+        self.meme_service = meme_service
+        self.groq_service = async_groq_service
+        # Share the result pools so both modes draw from the same cached pages
+        self.unsplash_service = AsyncUnsplashService(pool=meme_service.unsplash_service.pool)
+        self.tenor_service = AsyncTenorService(pool=meme_service.tenor_service.pool)
+        # Live sourcing that ran past its budget, left to finish and fill the caches
+        self.abandoned = set()
+
+    async def analyze_tweet_with_groq(self, tweet_text):
+        return await self.groq_service.analyze_text(tweet_text)
+
+    async def find_meme_source(self, analysis):
+        """Pick a GIF or a source image for the analysis without rendering it"""
+        try:
+            keywords = analysis['keywords']
+            prefer_gif = random.random() < self.meme_service._gif_probability(analysis['style'])
+
+            if SOURCING_MODE == "race":
+                source_url, media_type = await self._race_sources(keywords, prefer_gif)
+                if source_url:
+                    return source_url, media_type
+            else:
+                if prefer_gif:
+                    gif_url = await self.tenor_service.search_gif(keywords)
+                    if gif_url:
+                        return gif_url, "gif"
+                image_url = await self.unsplash_service.search_image(keywords)
+                if image_url:
+                    return image_url, "image"
+
+            image_url = await self.unsplash_service.search_image(BACKUP_KEYWORDS)
+            if image_url:
+                return image_url, "image"
+
+            return None, None
+
+        except Exception as e:
+            log_message(f"Error finding meme source: {e}")
+            return None, None
+
+    async def _race_sources(self, keywords, prefer_gif):
+        """asyncio version of MemeService._race_sources; losing searches are cancelled"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        preferred = "gif" if prefer_gif else "image"
+        searches = {
+            asyncio.create_task(self.tenor_service.search_gif(keywords)): "gif",
+            asyncio.create_task(self.unsplash_service.search_image(keywords)): "image"
+        }
+        deadlines = {kind: started + SOURCE_BUDGETS[kind] for kind in searches.values()}
+        pending = set(searches)
+        fallback = None
+        grace_deadline = None
+
+        try:
+            while pending:
+                now = loop.time()
+                for task in [t for t in pending if now >= deadlines[searches[t]]]:
+                    log_message(f"{searches[task]} search ran past its {SOURCE_BUDGETS[searches[task]]}s budget")
+                    task.cancel()
+                    pending.discard(task)
+                if not pending or (fallback and now >= grace_deadline):
+                    break
+
+                wait_until = min(deadlines[searches[t]] for t in pending)
+                if grace_deadline:
+                    wait_until = min(wait_until, grace_deadline)
+                done, _ = await asyncio.wait(pending, timeout=max(0, wait_until - now),
+                                             return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    pending.discard(task)
+                    kind = searches[task]
+                    url = None if task.exception() else task.result()
+                    if not url:
+                        continue
+                    fallback = (url, kind)
+                    if kind == preferred:
+                        pending.clear()
+                        break
+                    grace_deadline = loop.time() + SOURCE_PREFERENCE_GRACE
+        finally:
+            for task in searches:
+                if not task.done():
+                    task.cancel()
+
+        if fallback:
+            log_message(f"Raced sourcing picked {fallback[1]} in {loop.time() - started:.2f}s "
+                        f"(preferred {preferred})")
+            return fallback
+        return None, None
+
+    async def _live_meme_for_keywords(self, analysis, tweet_text):
+        """Search and render a meme for this analysis"""
+        try:
+            source_url, media_type = await self.find_meme_source(analysis)
+            if media_type == "image":
+                meme_bytes = await asyncio.to_thread(self.meme_service.render_meme, source_url, analysis, tweet_text)
+                return (meme_bytes, "image") if meme_bytes else (None, None)
+            return source_url, media_type
+
+        except Exception as e:
+            log_message(f"Error getting meme for keywords: {e}")
+            return None, None
+
+    async def get_meme_for_keywords(self, analysis, tweet_text):
+        """Get meme based on enhanced analysis, falling back to the warm pool"""
+        warm_pool = self.meme_service.warm_pool
+        if not warm_pool or not warm_pool.has_entries():
+            return await self._live_meme_for_keywords(analysis, tweet_text)
+        live = asyncio.create_task(self._live_meme_for_keywords(analysis, tweet_text))
+        try:
+            # Shielded so the work keeps going after the timeout, like MemeService.within_budget
+            meme_source, media_type = await asyncio.wait_for(asyncio.shield(live), WARM_POOL_LIVE_BUDGET)
+        except asyncio.TimeoutError:
+            log_message(f"Live sourcing took over {WARM_POOL_LIVE_BUDGET}s, using the warm pool")
+            self.abandoned.add(live)
+            live.add_done_callback(self._forget_abandoned)
+            meme_source, media_type = None, None
+        except asyncio.CancelledError:
+            live.cancel()
+            raise
+        if meme_source:
+            return meme_source, media_type
+        return self.meme_service.take_prefetched(analysis)
+
+    async def download_and_upload_meme(self, meme_source, media_type):
+        return await asyncio.to_thread(self.meme_service.download_and_upload_meme, meme_source, media_type)
+
+    def _forget_abandoned(self, task):
+        self.abandoned.discard(task)
+        if not task.cancelled() and task.exception():
+            log_message(f"Abandoned live sourcing failed: {task.exception()}")
+
+    async def close(self):
+        for task in self.abandoned:
+            task.cancel()
+        await asyncio.gather(*self.abandoned, return_exceptions=True)
+        await self.tenor_service.close()
+        await self.unsplash_service.close()
+        await self.groq_service.close()
@@ -0,0 +1,74 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from utils.logging_utils import log_message
+from services.meme_renderer import render_meme_bytes
+
+
+class RenderPool:
+    """Renders memes in worker processes so Pillow work doesn't hold our GIL.
+
+    Image bytes go in and JPEG bytes come out. A job that runs past
+    job_timeout gets its pool torn down and replaced, and a crashed worker
+    (BrokenProcessPool) is replaced the same way with the job retried once.
+    """
+
+    def __init__(self, workers=2, job_timeout=30):
+        self.workers = workers
+        self.job_timeout = job_timeout
+        self.lock = threading.Lock()
+        self.executor = None
+        self.restarts = 0
+
+    def _get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                # spawn rather than fork: the parent runs several threads
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                log_message(f"Render pool started with {self.workers} workers")
+            return self.executor
+
+    def _restart(self, executor, reason):
+        with self.lock:
+            if self.executor is not executor:
+                # Another thread already replaced it
+                return
+            self.executor = None
+            self.restarts += 1
+        log_message(f"Restarting render pool ({reason})")
+        # Stuck workers won't exit on their own
+        for process in list(getattr(executor, "_processes", {}).values()):
+            try:
+                process.terminate()
+            except Exception:
+                pass
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def render(self, image_bytes, meme_text, watermark=None):
+        """Return rendered JPEG bytes, or None if the job failed or timed out"""
+        for attempt in range(2):
+            executor = self._get_executor()
+            try:
+                future = executor.submit(render_meme_bytes, image_bytes, meme_text, watermark)
+                return future.result(timeout=self.job_timeout)
+            except TimeoutError:
+                log_message(f"Render job timed out after {self.job_timeout}s")
+                self._restart(executor, "job timeout")
+                return None
+            except BrokenProcessPool:
+                log_message("Render worker crashed")
+                self._restart(executor, "worker crash")
+            except Exception as e:
+                log_message(f"Error rendering meme in worker: {e}")
+                return None
+        return None
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
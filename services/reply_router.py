@@ -0,0 +1,119 @@
+import threading
+import time
+import tweepy
+from utils.logging_utils import log_message
+from utils.circuit_breaker import get_breaker
+
+# Breaker guarding each reply endpoint
+BREAKERS = {
+    "v2": "twitter_v2_reply",
+    "v1.1": "twitter_v1_reply"
+}
+
+# Twitter error codes meaning the endpoint isn't available to these credentials
+CAPABILITY_ERROR_CODES = {
+    261,  # app cannot perform write actions
+    453,  # endpoint needs a different access level
+}
+
+
+def is_capability_error(error):
+    """Whether error says the endpoint can't be used at all, not that this call failed"""
+    if isinstance(error, tweepy.Unauthorized):
+        return True
+    if isinstance(error, tweepy.Forbidden):
+        return bool(CAPABILITY_ERROR_CODES & set(getattr(error, "api_codes", []) or []))
+    return False
+
+
+class ReplyRouter:
+    """Learns which reply endpoints work for the current credentials.
+
+    Endpoints that replied successfully are tried first. One that fails with a
+    capability error (unauthorized, or an access-level error code) is skipped
+    until reprobe_interval has passed, after which it is tried again in its
+    normal position. Transient failures are left to the endpoint's circuit
+    breaker, which is per account when a scope (the account name) is given.
+    """
+
+    def __init__(self, order=("v2", "v1.1"), reprobe_interval=6 * 60 * 60, scope=None):
+        self.order = list(order)
+        self.reprobe_interval = reprobe_interval
+        self.scope = scope
+        self.lock = threading.Lock()
+        self.working = set()
+        self.unavailable = {}  # endpoint -> time it may be probed again
+
+    def plan(self):
+        """Endpoints to try, in order"""
+        now = time.time()
+        with self.lock:
+            for endpoint, retry_at in list(self.unavailable.items()):
+                if now >= retry_at:
+                    log_message(f"Re-probing {endpoint} reply endpoint")
+                    del self.unavailable[endpoint]
+                    # Back to the configured order so the endpoint really gets tried
+                    self.working.clear()
+            usable = [e for e in self.order if e not in self.unavailable]
+            return [e for e in usable if e in self.working] + [e for e in usable if e not in self.working]
+
+    def record(self, endpoint, error=None):
+        with self.lock:
+            if error is None:
+                if endpoint not in self.working:
+                    log_message(f"{endpoint} reply endpoint works for these credentials")
+                self.working.add(endpoint)
+            elif is_capability_error(error):
+                log_message(f"{endpoint} reply endpoint unavailable for these credentials, "
+                            f"skipping it for {self.reprobe_interval}s: {error}")
+                self.working.discard(endpoint)
+                self.unavailable[endpoint] = time.time() + self.reprobe_interval
+
+    def _attempts(self):
+        for endpoint in self.plan():
+            name = BREAKERS[endpoint] if self.scope is None else f"{BREAKERS[endpoint]}:{self.scope}"
+            breaker = get_breaker(name)
+            if not breaker.allow():
+                log_message(f"{endpoint} reply breaker is open, skipping it")
+                continue
+            yield endpoint, breaker
+
+    def _finish(self, endpoint, breaker, started, error=None):
+        # Capability errors are remembered here, so they don't count against the breaker
+        if error is None:
+            breaker.record_success(time.time() - started)
+        elif not is_capability_error(error):
+            breaker.record_failure(time.time() - started)
+        self.record(endpoint, error)
+
+    def send(self, calls):
+        """Post a reply with calls[endpoint](); returns (endpoint, response) or (None, None)"""
+        for endpoint, breaker in self._attempts():
+            started = time.time()
+            try:
+                response = calls[endpoint]()
+            except Exception as e:
+                self._finish(endpoint, breaker, started, e)
+                log_message(f"{endpoint} API reply error: {e}")
+                continue
+            self._finish(endpoint, breaker, started)
+            return endpoint, response
+        return None, None
+
+    async def send_async(self, calls):
+        """send() for coroutine functions"""
+        for endpoint, breaker in self._attempts():
+            started = time.time()
+            try:
+                response = await calls[endpoint]()
+            except Exception as e:
+                self._finish(endpoint, breaker, started, e)
+                log_message(f"{endpoint} API reply error: {e}")
+                continue
+            self._finish(endpoint, breaker, started)
+            return endpoint, response
+        return None, None
+
+    def summary(self):
+        with self.lock:
+            return f"working={sorted(self.working)} unavailable={sorted(self.unavailable)}"
@@ -1,32 +1,173 @@
-import requests
 from utils.logging_utils import log_message
+from utils.metrics import timed
+from utils.http import http_get, create_async_session
+from utils.cache import ResultPool, keywords_key
+from utils.rate_limiting import acquire_rate_limit
+from utils.circuit_breaker import get_breaker
+from config.settings import SEARCH_POOL_TTL, SEARCH_POOL_REFILL_THRESHOLD, SEARCH_POOL_SIZE
+import asyncio
 import os
-import random
+import time
+import threading
+
+BASE_URL = "https://tenor.googleapis.com/v2"
+
+def build_search_params(keywords, api_key, pos=None):
+    params = {
+        "q": " ".join(keywords),
+        "key": api_key,
+        "limit": 10,
+        "media_filter": "gif"
+    }
+    if pos:
+        params["pos"] = pos
+    return params
+
+def extract_gif_urls(data):
+    """GIF URLs and the cursor for the next page of a search response"""
+    urls = [gif["media_formats"]["gif"]["url"] for gif in data["results"]]
+    return urls, data.get("next") or None
+
+def create_result_pool():
+    return ResultPool(SEARCH_POOL_TTL, SEARCH_POOL_REFILL_THRESHOLD, SEARCH_POOL_SIZE)
 
 class TenorService:
-    def __init__(self):
+    def __init__(self, pool=None):
         self.api_key = os.getenv("TENOR_API_KEY")
-        self.base_url = "https://tenor.googleapis.com/v2"
+        self.base_url = BASE_URL
+        self.pool = pool if pool is not None else create_result_pool()
 
     def search_gif(self, keywords):
         try:
-            query = " ".join(keywords)
-            url = f"{self.base_url}/search"
-            params = {
-                "q": query,
-                "key": self.api_key,
-                "limit": 10,
-                "media_filter": "gif"
-            }
-            
-            response = requests.get(url, params=params)
-            if response.status_code == 200:
-                results = response.json()["results"]
-                if results:
-                    # Randomly select one GIF from results
-                    gif = random.choice(results)
-                    return gif["media_formats"]["gif"]["url"]
+            key = keywords_key(keywords)
+            gif_url, needs_refill, cursor = self.pool.pick(key)
+            if gif_url:
+                if needs_refill:
+                    threading.Thread(target=self._refill, args=(keywords, cursor), daemon=True).start()
+                return gif_url
+
+            urls, cursor = self._fetch_page(keywords)
+            if not urls:
+                return None
+            self.pool.store(key, urls, cursor)
+            return self.pool.pick(key)[0]
+        except Exception as e:
+            log_message(f"Error fetching Tenor GIF: {e}")
             return None
+
+    def _fetch_page(self, keywords, pos=None):
+        # Only calls the breaker lets through spend budget
+        breaker = get_breaker("tenor")
+        if not breaker.allow():
+            return [], None
+        if not acquire_rate_limit("tenor_api", block=False):
+            breaker.cancel()
+            log_message("Tenor budget used up, skipping search")
+            return [], None
+        params = build_search_params(keywords, self.api_key, pos)
+
+        started = time.time()
+        try:
+            data = self._search(params)
+        except Exception:
+            breaker.record_failure(time.time() - started)
+            raise
+        breaker.record(data is not None, time.time() - started)
+        if data is not None:
+            return extract_gif_urls(data)
+        return [], None
+
+    # Timed here rather than on search_gif, which mostly answers from the pool
+    @timed("search_gif")
+    def _search(self, params):
+        """One search request; the response JSON, or None on an error status"""
+        response = http_get(f"{self.base_url}/search", params=params)
+        return response.json() if response.status_code == 200 else None
+
+    def _refill(self, keywords, cursor):
+        key = keywords_key(keywords)
+        try:
+            urls, next_cursor = self._fetch_page(keywords, cursor)
+            if urls:
+                self.pool.store(key, urls, next_cursor)
+            else:
+                self.pool.refill_failed(key)
+        except Exception as e:
+            log_message(f"Error refilling Tenor pool for '{key}': {e}")
+            self.pool.refill_failed(key)
+
+class AsyncTenorService:
+    """asyncio variant of TenorService"""
+
+    def __init__(self, pool=None):
+        self.api_key = os.getenv("TENOR_API_KEY")
+        self.base_url = BASE_URL
+        self.pool = pool if pool is not None else create_result_pool()
+        self.session = None
+        self.refills = set()
+
+    async def search_gif(self, keywords):
+        try:
+            key = keywords_key(keywords)
+            gif_url, needs_refill, cursor = self.pool.pick(key)
+            if gif_url:
+                if needs_refill:
+                    task = asyncio.create_task(self._refill(keywords, cursor))
+                    self.refills.add(task)
+                    task.add_done_callback(self.refills.discard)
+                return gif_url
+
+            urls, cursor = await self._fetch_page(keywords)
+            if not urls:
+                return None
+            self.pool.store(key, urls, cursor)
+            return self.pool.pick(key)[0]
         except Exception as e:
             log_message(f"Error fetching Tenor GIF: {e}")
-            return None 
\ No newline at end of file
+            return None
+
+    async def _fetch_page(self, keywords, pos=None):
+        # Only calls the breaker lets through spend budget
+        breaker = get_breaker("tenor")
+        if not breaker.allow():
+            return [], None
+        if not acquire_rate_limit("tenor_api", block=False):
+            breaker.cancel()
+            log_message("Tenor budget used up, skipping search")
+            return [], None
+        params = build_search_params(keywords, self.api_key, pos)
+
+        started = time.time()
+        try:
+            data = await self._search(params)
+        except Exception:
+            breaker.record_failure(time.time() - started)
+            raise
+        breaker.record(data is not None, time.time() - started)
+        if data is not None:
+            return extract_gif_urls(data)
+        return [], None
+
+    @timed("search_gif")
+    async def _search(self, params):
+        """One search request; the response JSON, or None on an error status"""
+        if self.session is None:
+            self.session = create_async_session()
+        async with self.session.get(f"{self.base_url}/search", params=params) as response:
+            return await response.json() if response.status == 200 else None
+
+    async def _refill(self, keywords, cursor):
+        key = keywords_key(keywords)
+        try:
+            urls, next_cursor = await self._fetch_page(keywords, cursor)
+            if urls:
+                self.pool.store(key, urls, next_cursor)
+            else:
+                self.pool.refill_failed(key)
+        except Exception as e:
+            log_message(f"Error refilling Tenor pool for '{key}': {e}")
+            self.pool.refill_failed(key)
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
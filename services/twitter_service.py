@@ -1,38 +1,76 @@
 import tweepy
+from tweepy.asynchronous import AsyncClient
+import aiohttp
+import asyncio
 import os
-from utils.logging_utils import log_message
-from config.settings import LAST_MENTION_FILE
-import json
+from functools import partial
+from utils.logging_utils import log_message, log_debug
+from utils.metrics import timed
+from config.settings import (
+    LAST_MENTION_FILE, PROCESSED_MENTIONS_FILE, RATE_LIMIT_FILE, MENTION_RETENTION, MENTION_COMPACT_EVERY,
+    MENTIONS_PAGE_SIZE, MENTIONS_BACKLOG_PAGE_SIZE, MENTIONS_MAX_PAGES, REPLY_ENDPOINT_ORDER, REPLY_REPROBE_INTERVAL
+)
+from services.meme_service import describe_meme
+from utils.mention_store import MentionStore
+from services.reply_router import ReplyRouter
+from utils.rate_limiting import (
+    rate_limit_hook, rate_limit_hook_for, api_name_for_request, update_rate_limits, acquire_rate_limit,
+    create_account_rate_limiter
+)
 import datetime
-import time
+
+REPLY_TEXT = "Here's your meme! 🎭"
 
 class TwitterService:
-    def __init__(self):
+    def __init__(self, account=None):
+        """account (services.accounts.Account) gives the credentials and the
+        directory for this identity's state files in multi-account mode;
+        without one the .env credentials and top-level state files are used.
+        """
+        self.account = account
         self.client = None
         self.api = None
         self.bot_id = None
         self.bot_username = None
         self.last_mention_id = None
-        self.processed_mentions = set()
+        # Backlog walk a poll stopped partway through: next page request and newest id seen
+        self.mention_walk = None
+        self.mention_store = MentionStore(self.state_path(PROCESSED_MENTIONS_FILE), MENTION_RETENTION, MENTION_COMPACT_EVERY)
+        # None means the shared budgets in utils.rate_limiting
+        self.rate_limiter = create_account_rate_limiter(self.state_path(RATE_LIMIT_FILE)) if account else None
+        self.reply_router = ReplyRouter(REPLY_ENDPOINT_ORDER, REPLY_REPROBE_INTERVAL,
+                                        scope=account.name if account else None)
         self.initialize_twitter()
         self.load_last_mention_id()
 
+    def credential(self, key):
+        return self.account.credential(key) if self.account else os.getenv(key)
+
+    def state_path(self, filename):
+        return self.account.state_path(filename) if self.account else filename
+
     def initialize_twitter(self):
         try:
-            twitter_auth = tweepy.OAuthHandler(os.getenv("API_KEY"), os.getenv("API_SECRET"))
-            twitter_auth.set_access_token(os.getenv("ACCESS_TOKEN"), os.getenv("ACCESS_SECRET"))
+            twitter_auth = tweepy.OAuthHandler(self.credential("API_KEY"), self.credential("API_SECRET"))
+            twitter_auth.set_access_token(self.credential("ACCESS_TOKEN"), self.credential("ACCESS_SECRET"))
             
             self.client = tweepy.Client(
-                bearer_token=os.getenv("BEARER_TOKEN"),
-                consumer_key=os.getenv("API_KEY"),
-                consumer_secret=os.getenv("API_SECRET"),
-                access_token=os.getenv("ACCESS_TOKEN"),
-                access_token_secret=os.getenv("ACCESS_SECRET"),
-                wait_on_rate_limit=True
+                bearer_token=self.credential("BEARER_TOKEN"),
+                consumer_key=self.credential("API_KEY"),
+                consumer_secret=self.credential("API_SECRET"),
+                access_token=self.credential("ACCESS_TOKEN"),
+                access_token_secret=self.credential("ACCESS_SECRET"),
+                # Rate limits are handled by the poll scheduler, not by sleeping here
+                wait_on_rate_limit=False
             )
             
             self.api = tweepy.API(twitter_auth, wait_on_rate_limit=True)
             
+            # Record x-rate-limit-* headers from every response
+            hook = rate_limit_hook_for(self.rate_limiter) if self.rate_limiter else rate_limit_hook
+            self.client.session.hooks["response"].append(hook)
+            self.api.session.hooks["response"].append(hook)
+            
             user = self.api.verify_credentials()
             self.bot_id = user.id
             self.bot_username = user.screen_name
@@ -43,58 +81,38 @@ class TwitterService:
             self.bot_id = None
 
     def load_last_mention_id(self):
-        """Load the last processed mention ID from file"""
+        """Recover the since_id cursor and processed mentions from the mention log"""
         try:
-            if os.path.exists(LAST_MENTION_FILE):
-                with open(LAST_MENTION_FILE, 'r') as f:
-                    data = json.load(f)
-                    self.last_mention_id = data.get('last_id')
-                    
-                    # Load processed mentions
-                    processed = data.get('processed_mentions', [])
-                    for mention in processed:
-                        self.processed_mentions.add(mention['id'])
-                    
-                    log_message(f"Loaded {len(self.processed_mentions)} processed mentions")
+            count = self.mention_store.load(legacy_path=self.state_path(LAST_MENTION_FILE))
+            self.last_mention_id = self.mention_store.last_id
+            if count or self.last_mention_id:
+                log_message(f"Loaded {count} processed mentions")
             else:
                 log_message("No previous mention data found, starting fresh")
-                self.last_mention_id = None
-                self.processed_mentions = set()
         except Exception as e:
             log_message(f"Error loading last mention data: {e}")
             self.last_mention_id = None
-            self.processed_mentions = set()
 
     def save_last_mention_id(self, mention_id):
-        """Save the last processed mention ID to file"""
+        """Append the since_id cursor to the mention log"""
         try:
-            current_time = datetime.datetime.now().isoformat()
-            processed_mentions = [
-                {'id': mid, 'timestamp': current_time}
-                for mid in self.processed_mentions
-            ]
-            
-            data = {
-                'last_id': str(mention_id),
-                'timestamp': current_time,
-                'processed_mentions': processed_mentions
-            }
-            
-            with open(LAST_MENTION_FILE, 'w') as f:
-                json.dump(data, f)
+            self.mention_store.set_last_id(mention_id)
             log_message(f"Updated last mention ID to: {mention_id}")
         except Exception as e:
             log_message(f"Error saving last mention data: {e}")
 
     def is_mention_processed(self, mention_id):
         """Check if a mention has already been processed"""
-        return str(mention_id) in self.processed_mentions
+        return mention_id in self.mention_store
 
     def mark_mention_processed(self, mention_id):
         """Mark a mention as processed"""
-        self.processed_mentions.add(str(mention_id))
-        self.save_last_mention_id(self.last_mention_id)
+        try:
+            self.mention_store.mark(mention_id)
+        except Exception as e:
+            log_message(f"Error saving processed mention {mention_id}: {e}")
 
+    @timed("get_mentions")
     def get_mentions(self):
         """Get mentions using v2 API with rate limit handling"""
         try:
@@ -106,50 +124,28 @@ class TwitterService:
             log_message(f"[{current_time}] Checking for mentions...")
             
             try:
-                # Use v2 API's user mentions endpoint
-                mentions = self.client.get_users_mentions(
-                    id=self.bot_id,
-                    max_results=10,
-                    tweet_fields=["text", "created_at", "author_id"]
-                )
+                # Use v2 API's user mentions endpoint, paging until caught up
+                mentions_list = []
+                pages = 0
+                params = self._mention_request()
+                while params and pages < MENTIONS_MAX_PAGES:
+                    if not acquire_rate_limit("mentions_api", block=False, limiter=self.rate_limiter):
+                        log_message(f"[{current_time}] Mentions budget used up, skipping poll")
+                        break
+                    response = self.client.get_users_mentions(**params)
+                    pages += 1
+                    if response and response.data:
+                        mentions_list.extend(response.data)
+                    params = self._next_mention_request(params, response)
                 
-                if mentions and hasattr(mentions, 'data'):
-                    mentions_list = mentions.data if isinstance(mentions.data, list) else [mentions.data]
-                    log_message(f"[{current_time}] Found {len(mentions_list)} mentions")
-                    
-                    # Filter out already processed mentions
-                    new_mentions = [
-                        mention for mention in mentions_list
-                        if not self.is_mention_processed(mention.id)
-                    ]
-                    
-                    if new_mentions:
-                        log_message(f"[{current_time}] Found {len(new_mentions)} new mentions to process")
-                        
-                        # Update last mention ID
-                        newest_id = str(max(int(mention.id) for mention in mentions_list))
-                        self.last_mention_id = newest_id
-                        self.save_last_mention_id(newest_id)
-                        
-                        return new_mentions
-                    else:
-                        log_message(f"[{current_time}] All mentions have already been processed")
-                        return []
-                else:
-                    log_message(f"[{current_time}] No mentions found")
-                    return []
+                if pages > 1:
+                    log_message(f"[{current_time}] Fetched {len(mentions_list)} backlog mentions over {pages} pages")
+                self._advance_mention_cursor(params, mentions_list)
+                return self._filter_new_mentions(mentions_list, current_time)
                 
             except tweepy.errors.TweepyException as api_error:
-                if "Rate limit exceeded" in str(api_error):
-                    log_message(f"[{current_time}] Rate limit hit! Waiting for reset...")
-                    # Wait for 15 minutes before trying again
-                    time.sleep(900)  # 15 minutes
-                elif "401" in str(api_error):
-                    log_message(f"[{current_time}] Authentication error - please check your API credentials")
-                elif "403" in str(api_error):
-                    log_message(f"[{current_time}] Access denied - you may have hit your API tier limits")
-                else:
-                    log_message(f"[{current_time}] Twitter API error: {api_error}")
+                # On a rate limit the scheduler waits for the reset from the headers
+                self._mention_api_error(api_error, current_time)
                 return []
             
             except Exception as api_error:
@@ -160,39 +156,122 @@ class TwitterService:
             log_message(f"[{current_time}] Error fetching mentions: {e}")
             return []
 
+    def _mention_request(self):
+        """Parameters for the first mentions page of a poll, continuing an unfinished backlog walk"""
+        if self.mention_walk:
+            return self.mention_walk["params"]
+        params = {
+            "id": self.bot_id,
+            "max_results": MENTIONS_PAGE_SIZE,
+            "tweet_fields": ["text", "created_at", "author_id"]
+        }
+        if self.last_mention_id:
+            # Only tweets newer than the persisted cursor
+            params["since_id"] = self.last_mention_id
+        return params
+
+    def _next_mention_request(self, params, response):
+        """Parameters for the next mentions page, or None once caught up"""
+        meta = getattr(response, 'meta', None) or {}
+        next_token = meta.get("next_token")
+        # Without a since_id there is no bound, so don't walk the whole history
+        if not next_token or "since_id" not in params:
+            return None
+        # More mentions arrived than fit in a page: fetch the rest in big pages
+        return dict(params, max_results=MENTIONS_BACKLOG_PAGE_SIZE, pagination_token=next_token)
+
+    def _advance_mention_cursor(self, next_params, mentions_list):
+        """Move the since_id cursor once a poll has walked back to it.
+
+        Pages run newest first, so a walk cut short by the mentions budget or
+        MENTIONS_MAX_PAGES has not reached the cursor yet. The cursor then
+        stays put and the next poll continues from next_params; moving it to
+        the newest id would skip the older pages for good.
+        """
+        newest_ids = [int(mention.id) for mention in mentions_list]
+        if self.mention_walk and self.mention_walk["newest_id"]:
+            newest_ids.append(int(self.mention_walk["newest_id"]))
+        newest_id = str(max(newest_ids)) if newest_ids else None
+
+        if next_params:
+            log_message("Mention backlog not caught up yet, continuing from the next page on the next poll")
+            self.mention_walk = {"params": next_params, "newest_id": newest_id}
+            return
+        self.mention_walk = None
+        if newest_id and (not self.last_mention_id or int(newest_id) > int(self.last_mention_id)):
+            self.last_mention_id = newest_id
+            self.save_last_mention_id(newest_id)
+
+    def rewind_mention_cursor(self, mention_id):
+        """Move the since_id cursor back below mention_id so the next poll
+        fetches it again, e.g. after it could not be queued. Mentions marked
+        processed in the meantime are filtered out of that poll as usual."""
+        rewound = str(int(mention_id) - 1)
+        # An unfinished walk would move the cursor past mention_id again
+        self.mention_walk = None
+        if not self.last_mention_id or int(rewound) < int(self.last_mention_id):
+            self.last_mention_id = rewound
+            self.save_last_mention_id(rewound)
+
+    def _mention_api_error(self, api_error, current_time):
+        """_log_api_error for a mentions poll. Other errors than a rate limit
+        may mean the saved page token is no longer valid, so an unfinished
+        walk restarts from the cursor."""
+        if not self._log_api_error(api_error, current_time):
+            self.mention_walk = None
+
+    def _filter_new_mentions(self, mentions_list, current_time):
+        """Drop already processed mentions, oldest first"""
+        if mentions_list:
+            log_message(f"[{current_time}] Found {len(mentions_list)} mentions")
+            
+            # Filter out already processed mentions
+            new_mentions = sorted(
+                (mention for mention in mentions_list if not self.is_mention_processed(mention.id)),
+                key=lambda mention: int(mention.id)
+            )
+            
+            if new_mentions:
+                log_message(f"[{current_time}] Found {len(new_mentions)} new mentions to process")
+                return new_mentions
+            else:
+                log_message(f"[{current_time}] All mentions have already been processed")
+                return []
+        else:
+            log_message(f"[{current_time}] No mentions found")
+            return []
+
+    def _log_api_error(self, api_error, current_time):
+        """Log a Twitter API error; returns True if it was a rate limit"""
+        if isinstance(api_error, tweepy.errors.TooManyRequests) or "Rate limit exceeded" in str(api_error):
+            log_message(f"[{current_time}] Rate limit hit! Waiting for reset...")
+            return True
+        elif "401" in str(api_error):
+            log_message(f"[{current_time}] Authentication error - please check your API credentials")
+        elif "403" in str(api_error):
+            log_message(f"[{current_time}] Access denied - you may have hit your API tier limits")
+        else:
+            log_message(f"[{current_time}] Twitter API error: {api_error}")
+        return False
+
+    def reply_calls(self, tweet_id, media_id):
+        """Reply call per API version, for ReplyRouter.send"""
+        return {
+            "v2": partial(self.client.create_tweet, text=REPLY_TEXT, media_ids=[media_id],
+                          in_reply_to_tweet_id=tweet_id),
+            "v1.1": partial(self.api.update_status, status=REPLY_TEXT, in_reply_to_status_id=tweet_id,
+                            media_ids=[media_id], auto_populate_reply_metadata=True)
+        }
+
+    @timed("reply_to_tweet")
     def reply_to_tweet(self, tweet_id, media_id):
-        """Reply to a tweet with media"""
+        """Reply to a tweet with media through whichever API version works for us"""
         try:
             log_message(f"Attempting to reply to tweet {tweet_id} with media {media_id}")
-            
-            # Try v2 API first
-            try:
-                response = self.client.create_tweet(
-                    text="Here's your meme! 🎭",
-                    media_ids=[media_id],
-                    in_reply_to_tweet_id=tweet_id
-                )
-                
-                log_message(f"Successfully replied to tweet {tweet_id} using v2 API")
-                return response
-                
-            except Exception as v2_error:
-                log_message(f"V2 API reply error: {v2_error}")
-                
-                # Try v1.1 API as fallback
-                try:
-                    response = self.api.update_status(
-                        status="Here's your meme! 🎭",
-                        in_reply_to_status_id=tweet_id,
-                        media_ids=[media_id],
-                        auto_populate_reply_metadata=True
-                    )
-                    
-                    log_message(f"Successfully replied to tweet {tweet_id} using v1.1 API")
-                    return response
-                except Exception as v1_error:
-                    log_message(f"V1.1 API reply error: {v1_error}")
-                    return None
+            endpoint, response = self.reply_router.send(self.reply_calls(tweet_id, media_id))
+            if endpoint:
+                log_message(f"Successfully replied to tweet {tweet_id} using {endpoint} API")
+            return response
                 
         except Exception as e:
             log_message(f"Error replying to tweet: {e}")
@@ -209,8 +288,8 @@ class TwitterService:
             log_message(f"Error finding tweet {tweet_id}: {e}")
             return None
 
-    def process_specific_mention(self, tweet_id, meme_service):
-        """Process a specific mention by ID"""
+    def process_specific_mention(self, tweet_id, meme_service, job_queue=None):
+        """Process a specific mention by ID, or queue it on job_queue when one is given"""
         try:
             log_message(f"🔍 Directly checking tweet {tweet_id}...")
             
@@ -232,47 +311,31 @@ class TwitterService:
                     tweet_text = mention.text
                     log_message(f"Found tweet to process: {tweet_text}")
                     
+                    # Hand the tweet to the pipeline workers instead of processing it here
+                    if job_queue is not None:
+                        job_queue.enqueue(tweet_id, tweet_text)
+                        self.mark_mention_processed(tweet_id)
+                        log_message(f"Queued tweet {tweet_id} for processing")
+                        return True
+                    
                     # Process the mention
                     keywords = meme_service.analyze_tweet_with_groq(tweet_text)
-                    log_message(f"Extracted keywords: {keywords}")
+                    log_debug(f"Extracted keywords: {keywords}")
                     
                     meme_source, media_type = meme_service.get_meme_for_keywords(keywords, tweet_text)
-                    log_message(f"Got meme source: {meme_source}, type: {media_type}")
+                    log_message(f"Got meme source: {describe_meme(meme_source, media_type)}")
                     
                     if meme_source:
                         media_id = meme_service.download_and_upload_meme(meme_source, media_type)
                         log_message(f"Media upload returned ID: {media_id}")
                         
                         if media_id:
-                            # Force a reply using v1.1 API
-                            try:
-                                response = self.api.update_status(
-                                    status="Here's your meme! 🎭",
-                                    in_reply_to_status_id=tweet_id,
-                                    media_ids=[media_id],
-                                    auto_populate_reply_metadata=True
-                                )
-                                
+                            acquire_rate_limit("tweet_api", limiter=self.rate_limiter)
+                            if self.reply_to_tweet(tweet_id, media_id):
                                 log_message(f"✅ Successfully replied to tweet {tweet_id}")
                                 self.mark_mention_processed(tweet_id)
                                 return True
-                            except Exception as v1_error:
-                                log_message(f"V1.1 API reply error: {v1_error}")
-                                
-                                # Try with v2 API as fallback
-                                try:
-                                    response = self.client.create_tweet(
-                                        text="Here's your meme! 🎭", 
-                                        media_ids=[media_id],
-                                        in_reply_to_tweet_id=tweet_id
-                                    )
-                                    
-                                    log_message(f"✅ Successfully replied to tweet {tweet_id} using v2 API")
-                                    self.mark_mention_processed(tweet_id)
-                                    return True
-                                except Exception as v2_error:
-                                    log_message(f"V2 API reply error: {v2_error}")
-                                    return False
+                            return False
                         else:
                             log_message("Failed to upload media")
                             return False
@@ -296,8 +359,107 @@ class TwitterService:
         try:
             log_message("Resetting mention tracking")
             self.last_mention_id = None
-            self.processed_mentions = set()
-            if os.path.exists(LAST_MENTION_FILE):
-                os.remove(LAST_MENTION_FILE)
+            self.mention_walk = None
+            self.mention_store.clear()
+            legacy_path = self.state_path(LAST_MENTION_FILE)
+            if os.path.exists(legacy_path):
+                os.remove(legacy_path)
+        except Exception as e:
+            log_message(f"Error resetting mention tracking: {e}")
+
+class AsyncTwitterService:
+    """asyncio variant of TwitterService.
+
+    Network calls go through tweepy's AsyncClient; mention tracking state and
+    the v1.1 API (used for media uploads and the reply fallback) are shared
+    with the wrapped TwitterService.
+    """
+
+    def __init__(self, twitter_service):
+        self.twitter_service = twitter_service
+        self.client = AsyncClient(
+            bearer_token=twitter_service.credential("BEARER_TOKEN"),
+            consumer_key=twitter_service.credential("API_KEY"),
+            consumer_secret=twitter_service.credential("API_SECRET"),
+            access_token=twitter_service.credential("ACCESS_TOKEN"),
+            access_token_secret=twitter_service.credential("ACCESS_SECRET"),
+            wait_on_rate_limit=False
+        )
+
+    def _ensure_session(self):
+        """Give the client a session that records rate-limit headers.
+
+        aiohttp sessions have to be created inside the running event loop.
+        """
+        if self.client.session is None:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_request_end.append(self._on_request_end)
+            self.client.session = aiohttp.ClientSession(trace_configs=[trace_config])
+
+    async def _on_request_end(self, session, context, params):
+        api_name = api_name_for_request(params.method, str(params.url))
+        if api_name:
+            update_rate_limits(api_name, params.response, self.twitter_service.rate_limiter)
+
+    async def close(self):
+        if self.client.session:
+            await self.client.session.close()
+
+    @property
+    def bot_id(self):
+        return self.twitter_service.bot_id
+
+    @timed("get_mentions")
+    async def get_mentions(self):
+        """Get mentions using the async v2 client"""
+        current_time = datetime.datetime.now().strftime("%H:%M:%S")
+        try:
+            if not self.bot_id:
+                log_message("Bot ID not available. Cannot fetch mentions.")
+                return []
+
+            log_message(f"[{current_time}] Checking for mentions...")
+            self._ensure_session()
+            mentions_list = []
+            pages = 0
+            params = self.twitter_service._mention_request()
+            while params and pages < MENTIONS_MAX_PAGES:
+                if not acquire_rate_limit("mentions_api", block=False, limiter=self.twitter_service.rate_limiter):
+                    log_message(f"[{current_time}] Mentions budget used up, skipping poll")
+                    break
+                response = await self.client.get_users_mentions(**params)
+                pages += 1
+                if response and response.data:
+                    mentions_list.extend(response.data)
+                params = self.twitter_service._next_mention_request(params, response)
+            self.twitter_service._advance_mention_cursor(params, mentions_list)
+            return self.twitter_service._filter_new_mentions(mentions_list, current_time)
+
+        except tweepy.errors.TweepyException as api_error:
+            self.twitter_service._mention_api_error(api_error, current_time)
+            return []
+
         except Exception as e:
-            log_message(f"Error resetting mention tracking: {e}") 
\ No newline at end of file
+            log_message(f"[{current_time}] Error fetching mentions: {e}")
+            return []
+
+    @timed("reply_to_tweet")
+    async def reply_to_tweet(self, tweet_id, media_id):
+        """Reply to a tweet with media, sharing the sync service's ReplyRouter"""
+        try:
+            log_message(f"Attempting to reply to tweet {tweet_id} with media {media_id}")
+            self._ensure_session()
+            sync_calls = self.twitter_service.reply_calls(tweet_id, media_id)
+            endpoint, response = await self.twitter_service.reply_router.send_async({
+                "v2": partial(self.client.create_tweet, text=REPLY_TEXT, media_ids=[media_id],
+                              in_reply_to_tweet_id=tweet_id),
+                # v1.1 has no async client, run it off the event loop
+                "v1.1": partial(asyncio.to_thread, sync_calls["v1.1"])
+            })
+            if endpoint:
+                log_message(f"Successfully replied to tweet {tweet_id} using {endpoint} API")
+            return response
+
+        except Exception as e:
+            log_message(f"Error replying to tweet: {e}")
+            return None
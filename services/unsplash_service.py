@@ -1,34 +1,176 @@
-import requests
 from utils.logging_utils import log_message
+from utils.metrics import timed
+from utils.http import http_get, create_async_session
+from utils.cache import ResultPool, keywords_key
+from utils.rate_limiting import acquire_rate_limit
+from utils.circuit_breaker import get_breaker
+from config.settings import SEARCH_POOL_TTL, SEARCH_POOL_REFILL_THRESHOLD, SEARCH_POOL_SIZE
+import asyncio
 import os
-import random
+import time
+import threading
+
+BASE_URL = "https://api.unsplash.com"
+
+def build_search_request(keywords, api_key, page=1):
+    """Headers and params for a photo search"""
+    headers = {
+        "Authorization": f"Client-ID {api_key}"
+    }
+    params = {
+        "query": " ".join(keywords),
+        "per_page": 10,
+        "page": page,
+        "orientation": "landscape"
+    }
+    return headers, params
+
+def extract_image_urls(data, page):
+    """Image URLs and the next page number (wrapping to 1) of a search response"""
+    urls = [image["urls"]["regular"] for image in data["results"]]
+    next_page = page + 1 if page < data.get("total_pages", 1) else 1
+    return urls, next_page
+
+def create_result_pool():
+    return ResultPool(SEARCH_POOL_TTL, SEARCH_POOL_REFILL_THRESHOLD, SEARCH_POOL_SIZE)
 
 class UnsplashService:
-    def __init__(self):
+    def __init__(self, pool=None):
         self.api_key = os.getenv("UNSPLASH_ACCESS_KEY")
-        self.base_url = "https://api.unsplash.com"
+        self.base_url = BASE_URL
+        self.pool = pool if pool is not None else create_result_pool()
 
     def search_image(self, keywords):
         try:
-            query = " ".join(keywords)
-            url = f"{self.base_url}/search/photos"
-            headers = {
-                "Authorization": f"Client-ID {self.api_key}"
-            }
-            params = {
-                "query": query,
-                "per_page": 10,
-                "orientation": "landscape"
-            }
-            
-            response = requests.get(url, headers=headers, params=params)
-            if response.status_code == 200:
-                results = response.json()["results"]
-                if results:
-                    # Randomly select one image from results
-                    image = random.choice(results)
-                    return image["urls"]["regular"]
+            key = keywords_key(keywords)
+            image_url, needs_refill, next_page = self.pool.pick(key)
+            if image_url:
+                if needs_refill:
+                    threading.Thread(target=self._refill, args=(keywords, next_page), daemon=True).start()
+                return image_url
+
+            urls, next_page = self._fetch_page(keywords)
+            if not urls:
+                return None
+            self.pool.store(key, urls, next_page)
+            return self.pool.pick(key)[0]
+        except Exception as e:
+            log_message(f"Error fetching Unsplash image: {e}")
             return None
+
+    def _fetch_page(self, keywords, page=1):
+        # Only calls the breaker lets through spend budget
+        breaker = get_breaker("unsplash")
+        if not breaker.allow():
+            return [], None
+        if not acquire_rate_limit("unsplash_api", block=False):
+            breaker.cancel()
+            log_message("Unsplash budget used up, skipping search")
+            return [], None
+        headers, params = build_search_request(keywords, self.api_key, page)
+
+        started = time.time()
+        try:
+            data = self._search(headers, params)
+        except Exception:
+            breaker.record_failure(time.time() - started)
+            raise
+        breaker.record(data is not None, time.time() - started)
+        if data is not None:
+            return extract_image_urls(data, page)
+        return [], None
+
+    # Timed here rather than on search_image, which mostly answers from the pool
+    @timed("search_image")
+    def _search(self, headers, params):
+        """One search request; the response JSON, or None on an error status"""
+        response = http_get(f"{self.base_url}/search/photos", headers=headers, params=params)
+        return response.json() if response.status_code == 200 else None
+
+    def _refill(self, keywords, page):
+        key = keywords_key(keywords)
+        try:
+            urls, next_page = self._fetch_page(keywords, page or 1)
+            if urls:
+                self.pool.store(key, urls, next_page)
+            else:
+                self.pool.refill_failed(key)
+        except Exception as e:
+            log_message(f"Error refilling Unsplash pool for '{key}': {e}")
+            self.pool.refill_failed(key)
+
+class AsyncUnsplashService:
+    """asyncio variant of UnsplashService"""
+
+    def __init__(self, pool=None):
+        self.api_key = os.getenv("UNSPLASH_ACCESS_KEY")
+        self.base_url = BASE_URL
+        self.pool = pool if pool is not None else create_result_pool()
+        self.session = None
+        self.refills = set()
+
+    async def search_image(self, keywords):
+        try:
+            key = keywords_key(keywords)
+            image_url, needs_refill, next_page = self.pool.pick(key)
+            if image_url:
+                if needs_refill:
+                    task = asyncio.create_task(self._refill(keywords, next_page))
+                    self.refills.add(task)
+                    task.add_done_callback(self.refills.discard)
+                return image_url
+
+            urls, next_page = await self._fetch_page(keywords)
+            if not urls:
+                return None
+            self.pool.store(key, urls, next_page)
+            return self.pool.pick(key)[0]
         except Exception as e:
             log_message(f"Error fetching Unsplash image: {e}")
-            return None 
\ No newline at end of file
+            return None
+
+    async def _fetch_page(self, keywords, page=1):
+        # Only calls the breaker lets through spend budget
+        breaker = get_breaker("unsplash")
+        if not breaker.allow():
+            return [], None
+        if not acquire_rate_limit("unsplash_api", block=False):
+            breaker.cancel()
+            log_message("Unsplash budget used up, skipping search")
+            return [], None
+        headers, params = build_search_request(keywords, self.api_key, page)
+
+        started = time.time()
+        try:
+            data = await self._search(headers, params)
+        except Exception:
+            breaker.record_failure(time.time() - started)
+            raise
+        breaker.record(data is not None, time.time() - started)
+        if data is not None:
+            return extract_image_urls(data, page)
+        return [], None
+
+    @timed("search_image")
+    async def _search(self, headers, params):
+        """One search request; the response JSON, or None on an error status"""
+        if self.session is None:
+            self.session = create_async_session()
+        async with self.session.get(f"{self.base_url}/search/photos", headers=headers, params=params) as response:
+            return await response.json() if response.status == 200 else None
+
+    async def _refill(self, keywords, page):
+        key = keywords_key(keywords)
+        try:
+            urls, next_page = await self._fetch_page(keywords, page or 1)
+            if urls:
+                self.pool.store(key, urls, next_page)
+            else:
+                self.pool.refill_failed(key)
+        except Exception as e:
+            log_message(f"Error refilling Unsplash pool for '{key}': {e}")
+            self.pool.refill_failed(key)
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
@@ -0,0 +1,159 @@
+import random
+import threading
+import time
+from collections import deque
+from utils.logging_utils import log_message
+
+STYLES = ["reaction", "relatable", "sarcastic", "funny"]
+SENTIMENTS = ["positive", "negative", "neutral"]
+
+# Search terms combined per bucket, e.g. sarcastic x negative -> "eye roll ugh"
+STYLE_KEYWORDS = {
+    "reaction": ["reaction", "shocked"],
+    "relatable": ["relatable", "mood"],
+    "sarcastic": ["eye roll", "sarcastic"],
+    "funny": ["funny", "lol"]
+}
+SENTIMENT_KEYWORDS = {
+    "positive": ["happy", "celebrate"],
+    "negative": ["ugh", "facepalm"],
+    "neutral": ["shrug", "whatever"]
+}
+
+
+def bucket_for(analysis):
+    """Map a Groq analysis onto a (style, sentiment) bucket"""
+    styles = [s.lower() for s in analysis.get('style', [])]
+    style = next((s for s in STYLES if any(s in entry for entry in styles)), "reaction")
+    sentiment_text = str(analysis.get('sentiment', '')).lower()
+    sentiment = next((s for s in SENTIMENTS if s in sentiment_text), "neutral")
+    return style, sentiment
+
+
+def bucket_analysis(style, sentiment):
+    """Stand-in analysis used to source and caption prefetched memes"""
+    keywords = STYLE_KEYWORDS[style] + SENTIMENT_KEYWORDS[sentiment]
+    return {
+        'keywords': keywords,
+        'sentiment': sentiment,
+        'context': f"{style} {sentiment}",
+        'style': [style],
+        'emojis': ['😂', '💀']
+    }
+
+
+class WarmPool:
+    """Ready-to-upload memes prefetched per style x sentiment bucket.
+
+    A background thread keeps each bucket at per_bucket entries: GIFs are
+    downloaded into the asset cache and images are rendered with a caption
+    for the bucket. Buckets are only refilled while idle_check() says the bot
+    has nothing else to do, so prefetching never spends search budget that
+    live replies need. Each entry is handed out once, and entries older than
+    max_age are discarded.
+    """
+
+    def __init__(self, meme_service, per_bucket=3, refill_interval=5, max_age=None):
+        self.meme_service = meme_service
+        self.per_bucket = per_bucket
+        self.refill_interval = refill_interval
+        self.max_age = max_age
+        self.buckets = {(style, sentiment): deque() for style in STYLES for sentiment in SENTIMENTS}
+        self.lock = threading.Lock()
+        self.idle_check = None
+        self.thread = None
+        self.served = 0
+        self.misses = 0
+        self.produced = 0
+
+    def start(self, idle_check=None):
+        if self.thread:
+            return
+        self.idle_check = idle_check
+        self.thread = threading.Thread(target=self._refill_loop, name="warm-pool", daemon=True)
+        self.thread.start()
+
+    def _expire(self):
+        # Called with self.lock held
+        if not self.max_age:
+            return
+        cutoff = time.time() - self.max_age
+        for entries in self.buckets.values():
+            while entries and entries[0][2] < cutoff:
+                entries.popleft()
+
+    def take(self, analysis):
+        """Return (meme_source, media_type) for the closest bucket, or None"""
+        style, sentiment = bucket_for(analysis)
+        with self.lock:
+            self._expire()
+            # Exact bucket first, then the same sentiment, then anything
+            candidates = [(style, sentiment)]
+            candidates += [(s, sentiment) for s in STYLES if s != style]
+            candidates += [key for key in self.buckets if key[1] != sentiment]
+            for key in candidates:
+                if self.buckets[key]:
+                    meme_source, media_type, _ = self.buckets[key].popleft()
+                    self.served += 1
+                    log_message(f"Serving prefetched {media_type} from {key[0]}/{key[1]} bucket")
+                    return meme_source, media_type
+            self.misses += 1
+        return None
+
+    def has_entries(self):
+        with self.lock:
+            return any(self.buckets.values())
+
+    def _next_bucket(self):
+        """Emptiest bucket below target, or None when full"""
+        with self.lock:
+            self._expire()
+            key, entries = min(self.buckets.items(), key=lambda item: len(item[1]))
+            if len(entries) >= self.per_bucket:
+                return None
+            return key
+
+    def _produce(self, style, sentiment):
+        analysis = bucket_analysis(style, sentiment)
+        service = self.meme_service
+        if random.random() < service._gif_probability(analysis['style']):
+            gif_url = service.tenor_service.search_gif(analysis['keywords'])
+            # Download now so the upload only reads from disk
+            if gif_url and service.asset_cache.fetch(gif_url):
+                return gif_url, "gif"
+        image_url = service.unsplash_service.search_image(analysis['keywords'])
+        if image_url:
+            meme_bytes = service.render_meme(image_url, analysis, "")
+            if meme_bytes:
+                return meme_bytes, "image"
+        return None
+
+    def _refill_loop(self):
+        while True:
+            try:
+                key = self._next_bucket()
+                busy = self.idle_check is not None and not self.idle_check()
+                if key is None or busy:
+                    time.sleep(self.refill_interval)
+                    continue
+
+                started = time.time()
+                entry = self._produce(*key)
+                if entry is None:
+                    # Search budget or upstream trouble; try again later
+                    time.sleep(self.refill_interval)
+                    continue
+                with self.lock:
+                    self.buckets[key].append((entry[0], entry[1], time.time()))
+                    self.produced += 1
+                log_message(f"Prefetched {entry[1]} for {key[0]}/{key[1]} in {time.time() - started:.2f}s")
+            except Exception as e:
+                log_message(f"Error refilling warm pool: {e}")
+                time.sleep(self.refill_interval)
+
+    def summary(self):
+        with self.lock:
+            filled = sum(len(entries) for entries in self.buckets.values())
+            empty = sum(1 for entries in self.buckets.values() if not entries)
+            return (f"{filled}/{self.per_bucket * len(self.buckets)} ready, {empty} empty buckets, "
+                    f"served={self.served} misses={self.misses} produced={self.produced}")
@@ -0,0 +1,57 @@
+import json
+import os
+import pytest
+import utils.asset_cache as asset_cache_module
+from utils.asset_cache import AssetCache, INDEX_FILE
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.status_code = 200
+        self.headers = {"Content-Type": "image/jpeg"}
+        self.body = body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_content(self, chunk_size):
+        yield self.body
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(asset_cache_module, "http_get", lambda url, **kwargs: FakeResponse(b"x" * 100))
+    return AssetCache(str(tmp_path / "assets"), max_bytes=250)
+
+
+def test_file_in_use_is_not_evicted(cache):
+    with cache.use("http://a") as path:
+        cache.fetch("http://b")
+        cache.fetch("http://c")
+        cache.fetch("http://d")
+        # The oldest entry, but pinned: the others went instead
+        assert os.path.exists(path)
+    cache.fetch("http://e")
+    assert not os.path.exists(path)
+    assert cache.total_bytes <= 250
+
+
+def test_index_is_written_when_saved_not_per_download(cache):
+    cache.fetch("http://a")
+    index_path = os.path.join(cache.directory, INDEX_FILE)
+    assert not os.path.exists(index_path)
+    cache.save_index()
+    with open(index_path) as f:
+        assert len(json.load(f)) == 1
+
+
+def test_unindexed_files_are_removed_on_start(cache):
+    cache.fetch("http://a")
+    cache.save_index()
+    orphan = cache.fetch("http://b")
+    reloaded = AssetCache(cache.directory, max_bytes=250)
+    assert len(reloaded.entries) == 1
+    assert not os.path.exists(orphan)
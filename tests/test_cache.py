@@ -0,0 +1,30 @@
+import time
+from utils.cache import AnalysisCache, DiskCache
+
+
+def test_disk_cache_keeps_newest_rows(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.db"), maxsize=3, prune_every=5)
+    for i in range(10):
+        cache.set(f"key{i}", i)
+        time.sleep(0.001)
+    cache.prune()
+    assert [cache.get(f"key{i}") is not None for i in range(10)] == [False] * 7 + [True] * 3
+
+
+def test_average_latency_counts_stored_analyses_only():
+    cache = AnalysisCache(maxsize=10)
+    for text in ("a", "b", "c"):
+        assert cache.get(text) is None
+    cache.set("a", {"keywords": ["a"]}, latency=2.0)
+    assert cache.avg_miss_latency == 2.0
+    cache.get("a")
+    assert cache.saved_seconds == 2.0
+
+
+def test_batch_fallback_counts_each_miss_once(monkeypatch):
+    from services.groq_service import GroqService
+    service = GroqService.__new__(GroqService)
+    service.client = None
+    service.cache = AnalysisCache(maxsize=10)
+    service.analyze_batch(["only one uncached tweet"])
+    assert service.cache.misses == 1
@@ -0,0 +1,35 @@
+import time
+import utils.rate_limiting as rate_limiting
+from utils.circuit_breaker import CircuitBreaker, breakers, OPEN, HALF_OPEN
+from utils.rate_limiting import RateLimiter
+from services.tenor_service import TenorService
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.min_calls):
+        breaker.record_failure()
+    assert breaker.state == OPEN
+
+
+def test_cancel_hands_back_a_half_open_probe():
+    breaker = CircuitBreaker("test", min_calls=2, open_duration=60)
+    open_breaker(breaker)
+    breaker.opened_at -= 60  # open_duration has passed
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    breaker.opened_at = time.time()  # the probe is still out
+    assert not breaker.allow()
+    breaker.cancel()
+    assert breaker.allow()
+
+
+def test_open_breaker_does_not_spend_search_budget(tmp_path, monkeypatch):
+    limiter = RateLimiter({"tenor_api": (5, 60)}, str(tmp_path / "limits.json"))
+    monkeypatch.setattr(rate_limiting, "rate_limiter", limiter)
+    breaker = CircuitBreaker("tenor", min_calls=2, open_duration=60)
+    monkeypatch.setitem(breakers, "tenor", breaker)
+    open_breaker(breaker)
+
+    for _ in range(10):
+        assert TenorService()._fetch_page(["cat"]) == ([], None)
+    assert limiter.bucket("tenor_api").tokens == 5
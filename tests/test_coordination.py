@@ -0,0 +1,115 @@
+import time
+import pytest
+from utils.coordination import SqliteCoordination, LeaderLease, PENDING, IN_PROGRESS, DONE, FAILED
+from utils.job_queue import SharedJobQueue
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = SqliteCoordination(str(tmp_path / "coordination.db"))
+    yield backend
+    backend.close()
+
+
+def expire_leases(backend):
+    with backend._transaction() as conn:
+        conn.execute("UPDATE mentions SET lease_expires = ?", (time.time() - 1,))
+
+
+def test_leadership_is_exclusive_until_it_expires(backend):
+    assert backend.acquire_leadership("poller", "a", ttl=60)
+    assert not backend.acquire_leadership("poller", "b", ttl=60)
+    assert backend.acquire_leadership("poller", "a", ttl=60)
+
+    backend.release_leadership("poller", "b")
+    assert not backend.acquire_leadership("poller", "b", ttl=60)
+    backend.release_leadership("poller", "a")
+    assert backend.acquire_leadership("poller", "b", ttl=0.05)
+    time.sleep(0.1)
+    assert backend.acquire_leadership("poller", "a", ttl=60)
+
+
+def test_leader_lease_renews_in_the_background(backend):
+    elected = []
+    lease = LeaderLease(backend, "poller", "a", ttl=0.3, on_elected=lambda: elected.append("a"))
+    rival = LeaderLease(backend, "poller", "b", ttl=0.3)
+    assert lease.is_leader()
+    lease.start()
+    time.sleep(1)
+    assert not rival.is_leader()
+    assert lease.is_leader()
+    assert elected == ["a"]
+
+    lease.release()
+    assert not lease.is_leader()
+    rival.checked_at = 0
+    assert rival.is_leader()
+
+
+def test_claims_are_leased_to_one_holder(backend):
+    assert backend.enqueue("alice", "1", "hello")
+    assert not backend.enqueue("alice", "1", "hello")
+    backend.enqueue("bob", "1", "other account")
+
+    [lease] = backend.claim("alice", "a", limit=10, lease_ttl=60)
+    assert lease == {"key": "1", "payload": "hello", "attempts": 0}
+    assert backend.claim("alice", "b", limit=10, lease_ttl=60) == []
+    assert not backend.renew("alice", "1", "b", 60)
+    assert backend.renew("alice", "1", "a", 60)
+    assert backend.counts("alice")[IN_PROGRESS] == 1
+    assert backend.counts("bob")[PENDING] == 1
+
+
+def test_expired_lease_moves_to_the_next_holder(backend):
+    backend.enqueue("alice", "1", "hello")
+    backend.claim("alice", "a", limit=1, lease_ttl=60)
+    expire_leases(backend)
+    assert len(backend.claim("alice", "b", limit=1, lease_ttl=60)) == 1
+
+    assert not backend.complete("alice", "1", "a")
+    assert backend.fail("alice", "1", "a", "stale", 3, 0, 0) is None
+    assert backend.complete("alice", "1", "b")
+    assert backend.counts("alice")[DONE] == 1
+
+
+def test_fail_backs_off_then_dead_letters(backend):
+    backend.enqueue("alice", "1", "hello")
+    backend.claim("alice", "a", limit=1, lease_ttl=60)
+    assert backend.fail("alice", "1", "a", "boom", max_attempts=2, backoff_base=60, backoff_max=60) == 1
+    assert backend.claim("alice", "a", limit=1, lease_ttl=60) == []
+
+    with backend._transaction() as conn:
+        conn.execute("UPDATE mentions SET next_attempt_at = ?", (time.time() - 1,))
+    backend.claim("alice", "a", limit=1, lease_ttl=60)
+    assert backend.fail("alice", "1", "a", "boom again", max_attempts=2, backoff_base=60, backoff_max=60) == 2
+    assert backend.counts("alice")[FAILED] == 1
+    assert backend.dead_letters("alice")[0]["last_error"] == "boom again"
+    assert backend.retry_dead_letters("alice") == 1
+    assert backend.claim("alice", "a", limit=1, lease_ttl=60)[0]["attempts"] == 0
+
+
+def test_take_tokens_shares_one_bucket(tmp_path, backend):
+    other = SqliteCoordination(str(tmp_path / "coordination.db"))
+    assert backend.take_tokens("tweet_api", capacity=2, window=60) == 0
+    assert other.take_tokens("tweet_api", capacity=2, window=60) == 0
+    wait = backend.take_tokens("tweet_api", capacity=2, window=60)
+    assert 0 < wait <= 30
+
+    other.sync_budget("tweet_api", capacity=2, remaining=0, reset_at=time.time() + 120)
+    assert backend.take_tokens("tweet_api", capacity=2, window=60) > 60
+    other.sync_budget("tweet_api", capacity=2, remaining=1, reset_at=time.time() + 120)
+    assert backend.take_tokens("tweet_api", capacity=2, window=60) == 0
+    other.close()
+
+
+def test_shared_job_queue_claims_are_distinct_within_one_worker(backend):
+    job_queue = SharedJobQueue(backend, "alice", "worker", lease_timeout=60)
+    job_queue.enqueue(1, "hello")
+    [stale] = job_queue.claim(1)
+    expire_leases(backend)
+    [fresh] = job_queue.claim(1)
+    assert stale["claim_id"] != fresh["claim_id"]
+    assert not job_queue.renew(stale["tweet_id"], stale["claim_id"])
+    assert job_queue.renew(fresh["tweet_id"], fresh["claim_id"])
+    job_queue.complete(fresh["tweet_id"], fresh["claim_id"])
+    assert job_queue.counts()[DONE] == 1
@@ -0,0 +1,84 @@
+import time
+import pytest
+from utils.job_queue import JobQueue, PENDING, IN_PROGRESS, DONE, FAILED
+
+
+@pytest.fixture
+def job_queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), max_attempts=2, backoff_base=0, lease_timeout=60)
+    yield queue
+    queue.close()
+
+
+def expire_leases(job_queue):
+    with job_queue.lock:
+        job_queue.conn.execute("UPDATE jobs SET claimed_at = ?", (time.time() - job_queue.lease_timeout - 1,))
+        job_queue.conn.commit()
+
+
+def test_enqueue_is_idempotent(job_queue):
+    assert job_queue.enqueue(1, "hello")
+    assert not job_queue.enqueue(1, "hello")
+    assert job_queue.counts()[PENDING] == 1
+
+
+def test_claim_hands_out_each_job_once(job_queue):
+    job_queue.enqueue(1, "a")
+    job_queue.enqueue(2, "b")
+    jobs = job_queue.claim(10)
+    assert sorted(job["tweet_id"] for job in jobs) == ["1", "2"]
+    assert all(job["claim_id"] for job in jobs)
+    assert job_queue.claim(10) == []
+    assert job_queue.counts()[IN_PROGRESS] == 2
+
+
+def test_recover_only_requeues_expired_leases(job_queue):
+    job_queue.enqueue(1, "a")
+    job_queue.claim(1)
+    assert job_queue.recover(expired_only=True) == 0
+    expire_leases(job_queue)
+    assert job_queue.recover(expired_only=True) == 1
+    assert job_queue.counts()[PENDING] == 1
+
+
+def test_only_newest_claim_can_renew_or_complete(job_queue):
+    job_queue.enqueue(1, "a")
+    [stale] = job_queue.claim(1)
+    expire_leases(job_queue)
+    job_queue.recover(expired_only=True)
+    [fresh] = job_queue.claim(1)
+    assert fresh["claim_id"] != stale["claim_id"]
+
+    assert not job_queue.renew(stale["tweet_id"], stale["claim_id"])
+    assert job_queue.renew(fresh["tweet_id"], fresh["claim_id"])
+
+    job_queue.complete(stale["tweet_id"], stale["claim_id"])
+    job_queue.fail(stale["tweet_id"], "stale copy", stale["claim_id"])
+    assert job_queue.counts()[IN_PROGRESS] == 1
+
+    job_queue.complete(fresh["tweet_id"], fresh["claim_id"])
+    assert job_queue.counts()[DONE] == 1
+    assert not job_queue.renew(fresh["tweet_id"], fresh["claim_id"])
+
+
+def test_fail_retries_then_dead_letters(job_queue):
+    job_queue.enqueue(1, "a")
+    [job] = job_queue.claim(1)
+    job_queue.fail(job["tweet_id"], "boom", job["claim_id"])
+    assert job_queue.counts()[PENDING] == 1
+
+    [job] = job_queue.claim(1)
+    assert job["attempts"] == 1
+    job_queue.fail(job["tweet_id"], "boom again", job["claim_id"])
+    assert job_queue.counts()[FAILED] == 1
+    assert job_queue.dead_letters()[0]["last_error"] == "boom again"
+
+    assert job_queue.retry_dead_letters() == 1
+    assert job_queue.claim(1)[0]["attempts"] == 0
+
+
+def test_startup_recover_requeues_everything(job_queue):
+    job_queue.enqueue(1, "a")
+    job_queue.claim(1)
+    assert job_queue.recover() == 1
+    assert job_queue.counts()[PENDING] == 1
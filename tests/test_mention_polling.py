@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+import pytest
+from services.twitter_service import TwitterService
+from utils.mention_store import MentionStore
+from utils.rate_limiting import RateLimiter
+
+
+class FakeMentionsClient:
+    """get_users_mentions over tweet ids 101..100+count, newest first like the v2 API"""
+
+    def __init__(self, count):
+        self.ids = list(range(100 + count, 100, -1))
+        self.calls = 0
+
+    def get_users_mentions(self, id, max_results, tweet_fields, since_id=None, pagination_token=None):
+        self.calls += 1
+        ids = [i for i in self.ids if since_id is None or i > int(since_id)]
+        start = int(pagination_token or 0)
+        page = ids[start:start + max_results]
+        next_token = str(start + max_results) if start + max_results < len(ids) else None
+        return SimpleNamespace(data=[SimpleNamespace(id=i, text=f"@bot {i}") for i in page],
+                               meta={"next_token": next_token} if next_token else {})
+
+
+@pytest.fixture
+def make_service(tmp_path):
+    def make(client, mentions_budget, last_mention_id="100"):
+        service = TwitterService.__new__(TwitterService)
+        service.account = None
+        service.client = client
+        service.bot_id = "1"
+        service.last_mention_id = last_mention_id
+        service.mention_walk = None
+        service.mention_store = MentionStore(str(tmp_path / "mentions.log"))
+        service.mention_store.load()
+        service.rate_limiter = RateLimiter({"mentions_api": (mentions_budget, 900)}, str(tmp_path / "limits.json"))
+        return service
+    return make
+
+
+def poll(service):
+    mentions = service.get_mentions()
+    for mention in mentions:
+        service.mark_mention_processed(mention.id)
+    return [mention.id for mention in mentions]
+
+
+def test_cursor_stays_put_until_backlog_is_fetched(make_service):
+    # 30 new mentions: a 10 mention first page, then 100 mention pages
+    service = make_service(FakeMentionsClient(30), mentions_budget=1)
+    assert poll(service) == list(range(121, 131))
+    assert service.last_mention_id == "100"
+
+    service.rate_limiter.bucket("mentions_api").tokens = 1
+    assert poll(service) == list(range(101, 121))
+    assert service.last_mention_id == "130"
+    assert service.mention_walk is None
+
+
+def test_page_cap_continues_on_next_poll(make_service, monkeypatch):
+    monkeypatch.setattr("services.twitter_service.MENTIONS_MAX_PAGES", 1)
+    monkeypatch.setattr("services.twitter_service.MENTIONS_BACKLOG_PAGE_SIZE", 10)
+    service = make_service(FakeMentionsClient(25), mentions_budget=10)
+    seen = []
+    for _ in range(3):
+        seen += poll(service)
+    assert sorted(seen) == list(range(101, 126))
+    assert service.last_mention_id == "125"
+
+
+def test_caught_up_poll_moves_cursor(make_service):
+    service = make_service(FakeMentionsClient(5), mentions_budget=10)
+    assert poll(service) == list(range(101, 106))
+    assert service.last_mention_id == "105"
+    assert poll(service) == []
+
+
+def test_mention_that_fails_to_queue_is_fetched_again(make_service):
+    from main import queue_mentions
+
+    class FlakyQueue:
+        def __init__(self):
+            self.jobs = []
+            self.failed = set()
+
+        def enqueue(self, tweet_id, tweet_text):
+            if tweet_id == 103 and 103 not in self.failed:
+                self.failed.add(103)
+                raise RuntimeError("database is locked")
+            self.jobs.append(tweet_id)
+
+    service = make_service(FakeMentionsClient(5), mentions_budget=10)
+    job_queue = FlakyQueue()
+    assert queue_mentions(service, job_queue, service.get_mentions(), "test") == 4
+    assert service.last_mention_id == "102"
+
+    assert queue_mentions(service, job_queue, service.get_mentions(), "test") == 1
+    assert sorted(job_queue.jobs) == list(range(101, 106))
+    assert service.last_mention_id == "105"
@@ -0,0 +1,71 @@
+import threading
+import time
+from utils.pipeline import Pipeline
+
+
+def run_pipeline(pipeline, jobs, timeout=5):
+    pipeline.start()
+    for job in jobs:
+        pipeline.submit(job)
+    deadline = time.time() + timeout
+    while not pipeline.is_idle() and time.time() < deadline:
+        time.sleep(0.01)
+    pipeline.stop()
+
+
+def test_jobs_flow_through_stages():
+    completed = []
+    pipeline = Pipeline("test", on_complete=completed.append)
+    pipeline.add_stage("double", lambda job: dict(job, value=job["value"] * 2))
+    pipeline.add_stage("add", lambda job: dict(job, value=job["value"] + 1), workers=2)
+    run_pipeline(pipeline, [{"tweet_id": i, "value": i} for i in range(5)])
+    assert sorted(job["value"] for job in completed) == [1, 3, 5, 7, 9]
+
+
+def test_short_batch_result_fails_missing_jobs():
+    completed, failed = [], []
+    pipeline = Pipeline("test", on_complete=completed.append,
+                        on_failure=lambda job, reason: failed.append((job["tweet_id"], reason)))
+    pipeline.add_stage("batch", lambda jobs: jobs[:1], batch_size=3, batch_wait=0.5)
+    run_pipeline(pipeline, [{"tweet_id": i} for i in range(3)])
+    assert len(completed) == 1
+    assert sorted(tweet_id for tweet_id, _ in failed) == sorted({0, 1, 2} - {completed[0]["tweet_id"]})
+    assert all(reason == "no result from batch stage" for _, reason in failed)
+
+
+def test_is_idle_counts_jobs_being_worked_on():
+    release = threading.Event()
+    pipeline = Pipeline("test")
+    pipeline.add_stage("slow", lambda job: release.wait(5) and job)
+    pipeline.start()
+    pipeline.submit({"tweet_id": 1})
+    deadline = time.time() + 5
+    while not pipeline.stages[0].queue.empty() and time.time() < deadline:
+        time.sleep(0.01)
+    assert not pipeline.is_idle()
+    release.set()
+    deadline = time.time() + 5
+    while not pipeline.is_idle() and time.time() < deadline:
+        time.sleep(0.01)
+    assert pipeline.is_idle()
+    pipeline.stop()
+
+
+def test_blocked_partition_does_not_hold_up_others():
+    blocked = threading.Event()
+    completed = []
+    pipeline = Pipeline("test", queue_size=2, on_complete=completed.append)
+    pipeline.add_stage("prepare", lambda job: job)
+    pipeline.add_stage("reply", lambda job: job if job["account"] == "b" else blocked.wait(5) and job,
+                       partition_by=lambda job: job["account"], partitions=["a", "b"])
+    pipeline.start()
+    for i in range(2):
+        pipeline.submit({"tweet_id": f"a{i}", "account": "a"})
+    for i in range(4):
+        pipeline.submit({"tweet_id": f"b{i}", "account": "b"})
+    deadline = time.time() + 5
+    while len(completed) < 4 and time.time() < deadline:
+        time.sleep(0.01)
+    assert sorted(job["tweet_id"] for job in completed) == ["b0", "b1", "b2", "b3"]
+    blocked.set()
+    pipeline.stop()
@@ -0,0 +1,40 @@
+import asyncio
+import threading
+import time
+from utils.coordination import SqliteCoordination
+from utils.rate_limiting import RateLimiter, acquire_rate_limit_async
+
+
+def test_async_acquire_waits_for_refill(tmp_path):
+    limiter = RateLimiter({"groq_api": (1, 0.2)}, str(tmp_path / "limits.json"))
+    assert limiter.acquire("groq_api", block=False)
+    started = time.time()
+    assert asyncio.run(acquire_rate_limit_async("groq_api", timeout=2, limiter=limiter))
+    assert time.time() - started >= 0.1
+
+
+def test_async_acquire_gives_up_after_timeout(tmp_path):
+    limiter = RateLimiter({"groq_api": (1, 60)}, str(tmp_path / "limits.json"))
+    assert limiter.acquire("groq_api", block=False)
+    started = time.time()
+    assert not asyncio.run(acquire_rate_limit_async("groq_api", timeout=0.2, limiter=limiter))
+    assert time.time() - started < 1
+
+
+def test_async_acquire_takes_shared_budget_off_the_event_loop(tmp_path):
+    backend = SqliteCoordination(str(tmp_path / "coordination.db"))
+    limiter = RateLimiter({"groq_api": (1, 60)}, str(tmp_path / "limits.json"))
+    limiter.share(backend, ["groq_api"])
+    threads = []
+    take_tokens = backend.take_tokens
+
+    def recording_take_tokens(*args, **kwargs):
+        threads.append(threading.current_thread())
+        return take_tokens(*args, **kwargs)
+
+    backend.take_tokens = recording_take_tokens
+    try:
+        assert asyncio.run(acquire_rate_limit_async("groq_api", timeout=1, limiter=limiter))
+    finally:
+        backend.close()
+    assert threads and threading.main_thread() not in threads
@@ -0,0 +1,244 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from utils.logging_utils import log_message
+from utils.http import http_get
+
+CHUNK_SIZE = 64 * 1024
+INDEX_FILE = "index.json"
+
+
+class AssetCache:
+    """Bounded on-disk cache of downloaded images and GIFs, keyed by source URL.
+
+    Downloads are streamed to disk in chunks so large GIFs never sit in memory
+    whole. Entries are evicted least-recently-used once the cache grows past
+    max_bytes, and revalidated with ETag/Last-Modified after revalidate_after
+    seconds. Callers that read a cached file do so inside use(), which keeps
+    the entry from being evicted until they are done.
+
+    The JSON index is written by start_persistence() when it changed, not on
+    every download; files left out of the index by a crash are deleted at the
+    next start.
+    """
+
+    def __init__(self, directory, max_bytes, revalidate_after=3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.pins = Counter()  # key -> callers reading the file right now
+        self.total_bytes = 0
+        self.dirty = False
+        self.persister = None
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _index_path(self):
+        return os.path.join(self.directory, INDEX_FILE)
+
+    def _load_index(self):
+        try:
+            if os.path.exists(self._index_path()):
+                with open(self._index_path(), "r") as f:
+                    entries = json.load(f)
+                for key, entry in entries:
+                    if os.path.exists(entry["path"]):
+                        self.entries[key] = entry
+                        self.total_bytes += entry["size"]
+                log_message(f"Asset cache loaded {len(self.entries)} entries ({self.total_bytes // 1024} KB)")
+        except Exception as e:
+            log_message(f"Error loading asset cache index: {e}. Starting empty.")
+            self.entries = OrderedDict()
+            self.total_bytes = 0
+        self._remove_orphans()
+
+    def _remove_orphans(self):
+        """Delete files the index doesn't know, e.g. downloads made after the last index save"""
+        known = {os.path.abspath(entry["path"]) for entry in self.entries.values()}
+        known.add(os.path.abspath(self._index_path()))
+        for name in os.listdir(self.directory):
+            path = os.path.abspath(os.path.join(self.directory, name))
+            if path not in known and os.path.isfile(path):
+                try:
+                    os.unlink(path)
+                except OSError as e:
+                    log_message(f"Error removing orphaned asset {path}: {e}")
+
+    def save_index(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            snapshot = list(self.entries.items())
+            self.dirty = False
+        tmp_path = self._index_path() + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self._index_path())
+
+    def start_persistence(self, interval):
+        """Write the index every interval seconds when something changed, and at exit"""
+        if self.persister:
+            return
+        def save():
+            try:
+                self.save_index()
+            except Exception as e:
+                log_message(f"Error saving asset cache index: {e}")
+
+        def persist():
+            while True:
+                time.sleep(interval)
+                save()
+
+        atexit.register(save)
+
+        self.persister = threading.Thread(target=persist, name="asset-cache-persister", daemon=True)
+        self.persister.start()
+
+    def fetch(self, url):
+        """Return a local path for url, downloading or revalidating as needed.
+
+        The file may be evicted once this returns; use use() to read it.
+        """
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        path = self._fetch(key, url)
+        if path:
+            self._unpin(key)
+        return path
+
+    @contextmanager
+    def use(self, url):
+        """fetch() whose file can't be evicted until the with block ends; yields the path or None"""
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        path = self._fetch(key, url)
+        try:
+            yield path
+        finally:
+            if path:
+                self._unpin(key)
+
+    def _pin(self, key):
+        # Called with self.lock held; the path of a still-cached entry, pinned
+        entry = self.entries.get(key)
+        if not entry:
+            return None
+        self.pins[key] += 1
+        return entry["path"]
+
+    def _unpin(self, key):
+        with self.lock:
+            self.pins[key] -= 1
+            if self.pins[key] <= 0:
+                del self.pins[key]
+            self._evict()
+
+    def _fetch(self, key, url):
+        """Path for url with its entry pinned, or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry:
+                self.entries.move_to_end(key)
+                if time.time() - entry["checked_at"] < self.revalidate_after:
+                    self.hits += 1
+                    return self._pin(key)
+
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            with http_get(url, headers=headers, stream=True) as response:
+                if response.status_code == 304 and entry:
+                    with self.lock:
+                        entry["checked_at"] = time.time()
+                        self.revalidated += 1
+                        self.dirty = True
+                        return self._pin(key)
+
+                if response.status_code != 200:
+                    log_message(f"Failed to download {url}: {response.status_code}")
+                    # A stale copy beats no copy
+                    with self.lock:
+                        return self._pin(key)
+
+                path = os.path.join(self.directory, key + self._extension(response))
+                tmp_path = f"{path}.{threading.get_ident()}.part"
+                size = 0
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+                        size += len(chunk)
+                os.replace(tmp_path, path)
+
+                new_entry = {
+                    "url": url,
+                    "path": path,
+                    "size": size,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "checked_at": time.time()
+                }
+        except Exception as e:
+            log_message(f"Error downloading {url}: {e}")
+            try:
+                if 'tmp_path' in locals() and os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+            except OSError:
+                pass
+            with self.lock:
+                return self._pin(key)
+
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old:
+                self.total_bytes -= old["size"]
+            self.entries[key] = new_entry
+            self.total_bytes += size
+            self.misses += 1
+            self.dirty = True
+            path = self._pin(key)
+            self._evict()
+        return path
+
+    def _extension(self, response):
+        content_type = response.headers.get("Content-Type", "")
+        if "gif" in content_type:
+            return ".gif"
+        if "png" in content_type:
+            return ".png"
+        if "webp" in content_type:
+            return ".webp"
+        return ".jpg"
+
+    def _evict(self):
+        # Called with self.lock held; always keeps the newest entry. Oldest
+        # unpinned entries go first, and pinned ones wait for their last _unpin
+        for key in list(self.entries)[:-1]:
+            if self.total_bytes <= self.max_bytes:
+                break
+            if self.pins[key]:
+                continue
+            entry = self.entries.pop(key)
+            self.total_bytes -= entry["size"]
+            self.dirty = True
+            try:
+                os.unlink(entry["path"])
+            except OSError as e:
+                log_message(f"Error evicting cached asset {entry['path']}: {e}")
+
+    def summary(self):
+        return (f"entries={len(self.entries)} size={self.total_bytes // 1024}KB "
+                f"hits={self.hits} misses={self.misses} revalidated={self.revalidated}")
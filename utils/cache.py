@@ -0,0 +1,260 @@
+import copy
+import hashlib
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from utils.logging_utils import log_message, log_debug
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with an optional per-entry TTL"""
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if self.ttl and time.time() - stored_at > self.ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, stored_at=None):
+        with self.lock:
+            self.entries[key] = (value, stored_at or time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class DiskCache:
+    """JSON values in a SQLite table, kept across restarts.
+
+    Every prune_every writes, expired rows and the oldest rows beyond
+    maxsize are deleted, so a long-running bot doesn't grow the file without
+    limit.
+    """
+
+    def __init__(self, path, ttl=None, maxsize=None, prune_every=100):
+        self.path = path
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.prune_every = prune_every
+        self.writes = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, stored_at REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS cache_age ON cache (stored_at)")
+        self.conn.commit()
+
+    def get(self, key):
+        """Return (value, stored_at) or None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, stored_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        if self.ttl and time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time())
+            )
+            self.conn.commit()
+            self.writes += 1
+            due = self.writes % self.prune_every == 0
+        if due:
+            self.prune()
+
+    def prune(self):
+        """Delete expired rows, then the oldest rows beyond maxsize"""
+        with self.lock:
+            if self.ttl:
+                self.conn.execute("DELETE FROM cache WHERE stored_at < ?", (time.time() - self.ttl,))
+            if self.maxsize:
+                self.conn.execute(
+                    "DELETE FROM cache WHERE key IN "
+                    "(SELECT key FROM cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                    (self.maxsize,)
+                )
+            self.conn.commit()
+
+
+def normalize_tweet_text(text):
+    """Strip mentions, URLs and extra whitespace so near-duplicate tweets share a key"""
+    text = re.sub(r"@\w+", " ", text)
+    text = re.sub(r"https?://\S+", " ", text)
+    text = re.sub(r"^\s*RT\b:?", " ", text)
+    return " ".join(text.lower().split())
+
+
+class AnalysisCache:
+    """Content-addressed cache of Groq analysis results.
+
+    Keys are hashes of the normalized tweet text. Lookups check the in-memory
+    LRU first and then the optional SQLite tier (capped at disk_maxsize rows),
+    promoting disk hits to memory.
+    """
+
+    def __init__(self, maxsize=1000, ttl=None, path=None, disk_maxsize=None):
+        self.memory = LRUCache(maxsize, ttl)
+        self.disk = None
+        if path:
+            try:
+                self.disk = DiskCache(path, ttl, disk_maxsize)
+                self.disk.prune()
+            except Exception as e:
+                log_message(f"Error opening analysis cache at {path}: {e}. Using memory only.")
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.saved_seconds = 0.0
+        self.avg_miss_latency = 0.0
+
+    def key(self, text):
+        return hashlib.sha256(normalize_tweet_text(text).encode("utf-8")).hexdigest()
+
+    def get(self, text):
+        key = self.key(text)
+        value = self.memory.get(key)
+        tier = "memory"
+        if value is None and self.disk:
+            try:
+                entry = self.disk.get(key)
+            except Exception as e:
+                log_message(f"Error reading analysis cache: {e}")
+                entry = None
+            if entry:
+                value, stored_at = entry
+                self.memory.set(key, value, stored_at)
+                tier = "disk"
+
+        with self.lock:
+            if value is None:
+                self.misses += 1
+                return None
+            if tier == "memory":
+                self.memory_hits += 1
+            else:
+                self.disk_hits += 1
+            self.saved_seconds += self.avg_miss_latency
+
+        log_debug(f"Analysis cache hit ({tier}) for {key[:12]}")
+        return copy.deepcopy(value)
+
+    def set(self, text, analysis, latency):
+        """Store a fresh analysis along with how long the LLM call took"""
+        key = self.key(text)
+        self.memory.set(key, copy.deepcopy(analysis))
+        if self.disk:
+            try:
+                self.disk.set(key, analysis)
+            except Exception as e:
+                log_message(f"Error writing analysis cache: {e}")
+        with self.lock:
+            # Running average of LLM call latency estimates what each hit saves. Misses that
+            # fell back to keyword extraction never reach set(), so they don't count here.
+            self.stores += 1
+            self.avg_miss_latency += (latency - self.avg_miss_latency) / self.stores
+
+    def summary(self):
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        rate = hits / lookups * 100 if lookups else 0.0
+        return (f"hits={hits} (memory={self.memory_hits}, disk={self.disk_hits}) "
+                f"misses={self.misses} hit_rate={rate:.1f}% saved={self.saved_seconds:.1f}s")
+
+    def log_stats(self):
+        log_message(f"[analysis-cache] {self.summary()}")
+
+
+def keywords_key(keywords):
+    """Order- and case-insensitive key for a keyword search"""
+    return " ".join(sorted(k.strip().lower() for k in keywords if k.strip()))
+
+
+class ResultPool:
+    """Keyword-keyed pools of search results, served without a network call.
+
+    Each pool keeps a whole result page for ttl seconds and hands items out in
+    random order without repeats. When fewer than refill_threshold unseen items
+    are left, pick() asks the caller to fetch the next page in the background.
+    The item served last is never served again straight away.
+    """
+
+    def __init__(self, ttl=1800, refill_threshold=3, maxsize=500):
+        self.pools = LRUCache(maxsize, ttl)
+        self.refill_threshold = refill_threshold
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def pick(self, key):
+        """Return (item, needs_refill, cursor); item is None on a miss"""
+        with self.lock:
+            entry = self.pools.get(key)
+            if not entry or not entry["results"]:
+                self.misses += 1
+                return None, False, None
+
+            if not entry["unseen"]:
+                entry["unseen"] = [r for r in entry["results"] if r != entry["last"]] or list(entry["results"])
+            item = entry["unseen"].pop(random.randrange(len(entry["unseen"])))
+            entry["last"] = item
+            self.hits += 1
+
+            needs_refill = len(entry["unseen"]) < self.refill_threshold and not entry["refilling"]
+            if needs_refill:
+                entry["refilling"] = True
+            return item, needs_refill, entry["cursor"]
+
+    def store(self, key, results, cursor=None):
+        """Add a page of results; unseen items from an existing pool are kept"""
+        with self.lock:
+            entry = self.pools.get(key)
+            last = entry["last"] if entry else None
+            unseen = list(entry["unseen"]) if entry else []
+            unseen += [r for r in results if r not in unseen and r != last]
+            self.pools.set(key, {
+                "results": list(results) or (entry["results"] if entry else []),
+                "unseen": unseen,
+                "last": last,
+                "cursor": cursor,
+                "refilling": False
+            })
+
+    def refill_failed(self, key):
+        with self.lock:
+            entry = self.pools.get(key)
+            if entry:
+                entry["refilling"] = False
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0.0
+        return f"pools={len(self.pools)} hits={self.hits} misses={self.misses} hit_rate={rate:.1f}%"
@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import deque
+from utils.logging_utils import log_message
+from config.settings import CIRCUIT_BREAKER_DEFAULTS, CIRCUIT_BREAKERS
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker for one external provider.
+
+    Outcomes of the last `window` seconds are kept. Once at least min_calls
+    have been seen, the breaker opens when the error rate reaches
+    error_threshold or the share of calls slower than slow_call_duration
+    reaches slow_threshold. While open, allow() returns False so callers take
+    their fallback path without waiting on the provider. After open_duration
+    up to half_open_calls probes are let through: a success closes the
+    breaker, a failure opens it again.
+    """
+
+    def __init__(self, name, window=60, min_calls=5, error_threshold=0.5,
+                 slow_call_duration=10, slow_threshold=0.8, open_duration=30, half_open_calls=1):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.slow_call_duration = slow_call_duration
+        self.slow_threshold = slow_threshold
+        self.open_duration = open_duration
+        self.half_open_calls = half_open_calls
+        self.lock = threading.Lock()
+        self.calls = deque()  # (finished_at, ok, latency)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probes = 0
+        self.rejected = 0
+
+    def _set_state(self, state, reason=""):
+        # Called with self.lock held
+        if state == self.state:
+            return
+        log_message(f"[breaker:{self.name}] {self.state} -> {state}{': ' + reason if reason else ''}")
+        self.state = state
+        if state in (OPEN, HALF_OPEN):
+            self.opened_at = time.time()
+        if state != HALF_OPEN:
+            self.probes = 0
+        if state == CLOSED:
+            self.calls.clear()
+
+    def _trim(self, now):
+        while self.calls and self.calls[0][0] < now - self.window:
+            self.calls.popleft()
+
+    def allow(self):
+        """Whether a call may go to the provider now; every allowed call must be recorded"""
+        with self.lock:
+            if self.state == OPEN:
+                if time.time() - self.opened_at < self.open_duration:
+                    self.rejected += 1
+                    return False
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self.probes >= self.half_open_calls:
+                    # A probe that never reported back doesn't hold the breaker forever
+                    if time.time() - self.opened_at < self.open_duration:
+                        self.rejected += 1
+                        return False
+                    self.probes = 0
+                    self.opened_at = time.time()
+                self.probes += 1
+            return True
+
+    def record(self, ok, latency=0.0):
+        now = time.time()
+        with self.lock:
+            if self.state == HALF_OPEN:
+                slow = latency > self.slow_call_duration
+                if ok and not slow:
+                    self._set_state(CLOSED, f"probe succeeded in {latency:.2f}s")
+                else:
+                    self._set_state(OPEN, "probe failed" if not ok else f"probe took {latency:.2f}s")
+                return
+
+            self.calls.append((now, ok, latency))
+            self._trim(now)
+            if self.state != CLOSED or len(self.calls) < self.min_calls:
+                return
+            count = len(self.calls)
+            error_rate = sum(1 for _, call_ok, _ in self.calls if not call_ok) / count
+            slow_rate = sum(1 for _, _, call_latency in self.calls if call_latency > self.slow_call_duration) / count
+            if error_rate >= self.error_threshold:
+                self._set_state(OPEN, f"error rate {error_rate:.0%} over {count} calls")
+            elif slow_rate >= self.slow_threshold:
+                self._set_state(OPEN, f"{slow_rate:.0%} of {count} calls slower than {self.slow_call_duration}s")
+
+    def cancel(self):
+        """Hand back an allow() whose call was never made, e.g. for lack of rate budget"""
+        with self.lock:
+            if self.state == HALF_OPEN and self.probes > 0:
+                self.probes -= 1
+
+    def record_success(self, latency=0.0):
+        self.record(True, latency)
+
+    def record_failure(self, latency=0.0):
+        self.record(False, latency)
+
+    def summary(self):
+        with self.lock:
+            self._trim(time.time())
+            count = len(self.calls)
+            errors = sum(1 for _, ok, _ in self.calls if not ok)
+            avg = sum(latency for _, _, latency in self.calls) / count if count else 0.0
+            return (f"{self.state}, {count} calls in {self.window}s window, "
+                    f"errors={errors} avg={avg:.2f}s rejected={self.rejected}")
+
+
+breakers = {}
+breakers_lock = threading.Lock()
+
+def get_breaker(name):
+    """Shared breaker for a provider, configured from CIRCUIT_BREAKERS.
+
+    Names may carry a scope after a colon ("twitter_v2_reply:alice") for one
+    breaker per account; the part before the colon selects the settings.
+    """
+    with breakers_lock:
+        if name not in breakers:
+            overrides = CIRCUIT_BREAKERS.get(name.split(":")[0], {})
+            breakers[name] = CircuitBreaker(name, **dict(CIRCUIT_BREAKER_DEFAULTS, **overrides))
+        return breakers[name]
+
+def log_breakers():
+    with breakers_lock:
+        current = list(breakers.values())
+    for breaker in current:
+        log_message(f"[breaker:{breaker.name}] {breaker.summary()}")
@@ -0,0 +1,654 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from utils.logging_utils import log_message
+
+PENDING = "pending"
+IN_PROGRESS = "in_progress"
+DONE = "done"
+FAILED = "failed"
+
+
+def new_worker_id():
+    """Identity of this process in leases: host, pid and a random suffix"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+WORKER_ID = new_worker_id()
+
+
+class CoordinationBackend(ABC):
+    """State shared by bot processes working the same accounts.
+
+    Covers three things:
+    - leader election, so only one process polls mentions for an account
+    - a mention queue with per-mention leases, so each mention is worked on
+      by one process at a time and replied to once
+    - rate budgets that every process draws from
+
+    Mentions are grouped by scope (the account name). They move pending ->
+    in_progress -> done like in JobQueue. A claim leases the mention to one
+    holder until lease_expires. Only that holder can renew, complete or fail
+    it, and an expired lease returns it to pending for another process.
+    """
+
+    # Leader election
+
+    @abstractmethod
+    def acquire_leadership(self, role, holder, ttl):
+        """Take or renew role for ttl seconds; False while someone else holds it"""
+
+    @abstractmethod
+    def release_leadership(self, role, holder):
+        pass
+
+    # Mention queue
+
+    @abstractmethod
+    def enqueue(self, scope, key, payload):
+        """Add a mention; False if it is already known (in any state)"""
+
+    @abstractmethod
+    def claim(self, scope, holder, limit, lease_ttl):
+        """Lease up to limit due mentions; returns [{"key", "payload", "attempts"}]"""
+
+    @abstractmethod
+    def renew(self, scope, key, holder, lease_ttl):
+        """Extend holder's lease; False if the lease was lost"""
+
+    @abstractmethod
+    def complete(self, scope, key, holder):
+        pass
+
+    @abstractmethod
+    def fail(self, scope, key, holder, error, max_attempts, backoff_base, backoff_max):
+        """Schedule a retry with exponential backoff, or dead-letter; returns attempts or None"""
+
+    @abstractmethod
+    def recover(self, scope):
+        """Return mentions whose lease expired to pending; returns how many"""
+
+    @abstractmethod
+    def retry_dead_letters(self, scope):
+        pass
+
+    @abstractmethod
+    def dead_letters(self, scope, limit=50):
+        pass
+
+    @abstractmethod
+    def purge_done(self, scope, older_than):
+        pass
+
+    @abstractmethod
+    def counts(self, scope):
+        pass
+
+    # Rate budgets, same rules as utils.rate_limiting.TokenBucket
+
+    @abstractmethod
+    def take_tokens(self, name, capacity, window, tokens=1):
+        """Take tokens from a shared bucket; returns 0 on success or seconds to wait"""
+
+    @abstractmethod
+    def sync_budget(self, name, capacity, remaining, reset_at):
+        """Adopt the server's x-rate-limit view of a shared bucket"""
+
+    # Small shared values (mention cursors)
+
+    @abstractmethod
+    def get_value(self, key):
+        pass
+
+    @abstractmethod
+    def set_value(self, key, value):
+        pass
+
+    def close(self):
+        pass
+
+
+class SqliteCoordination(CoordinationBackend):
+    """Backend in a SQLite file, for processes on one machine.
+
+    Every operation runs in a BEGIN IMMEDIATE transaction. SQLite's file lock
+    therefore serializes read-modify-write steps such as claims and token
+    takes across processes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        # Transactions are managed explicitly; timeout covers waiting on other processes
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS mentions ("
+                "scope TEXT, key TEXT, payload TEXT, state TEXT, holder TEXT, attempts INTEGER DEFAULT 0, "
+                "next_attempt_at REAL, lease_expires REAL, last_error TEXT, updated_at REAL, "
+                "PRIMARY KEY (scope, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS mentions_ready ON mentions (scope, state, next_attempt_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS leaders (role TEXT PRIMARY KEY, holder TEXT, expires_at REAL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS budgets ("
+                "name TEXT PRIMARY KEY, tokens REAL, updated REAL, reset_at REAL)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS shared_values (key TEXT PRIMARY KEY, value TEXT)")
+
+    @contextmanager
+    def _transaction(self):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def acquire_leadership(self, role, holder, ttl):
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT holder, expires_at FROM leaders WHERE role = ?", (role,)).fetchone()
+            if row and row[0] != holder and row[1] > now:
+                return False
+            conn.execute("INSERT OR REPLACE INTO leaders (role, holder, expires_at) VALUES (?, ?, ?)",
+                         (role, holder, now + ttl))
+            return True
+
+    def release_leadership(self, role, holder):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM leaders WHERE role = ? AND holder = ?", (role, holder))
+
+    def enqueue(self, scope, key, payload):
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO mentions (scope, key, payload, state, next_attempt_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (scope, str(key), payload, PENDING, now, now)
+            )
+            return cursor.rowcount == 1
+
+    def claim(self, scope, holder, limit, lease_ttl):
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT key, payload, attempts FROM mentions WHERE scope = ? AND "
+                "((state = ? AND next_attempt_at <= ?) OR (state = ? AND lease_expires < ?)) "
+                "ORDER BY next_attempt_at LIMIT ?",
+                (scope, PENDING, now, IN_PROGRESS, now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE mentions SET state = ?, holder = ?, lease_expires = ?, updated_at = ? "
+                "WHERE scope = ? AND key = ?",
+                [(IN_PROGRESS, holder, now + lease_ttl, now, scope, row[0]) for row in rows]
+            )
+        return [{"key": row[0], "payload": row[1], "attempts": row[2]} for row in rows]
+
+    def _held(self, conn, scope, key, holder):
+        row = conn.execute(
+            "SELECT attempts FROM mentions WHERE scope = ? AND key = ? AND state = ? AND holder = ?",
+            (scope, str(key), IN_PROGRESS, holder)
+        ).fetchone()
+        return row
+
+    def renew(self, scope, key, holder, lease_ttl):
+        now = time.time()
+        with self._transaction() as conn:
+            if not self._held(conn, scope, key, holder):
+                return False
+            conn.execute("UPDATE mentions SET lease_expires = ?, updated_at = ? WHERE scope = ? AND key = ?",
+                         (now + lease_ttl, now, scope, str(key)))
+            return True
+
+    def complete(self, scope, key, holder):
+        with self._transaction() as conn:
+            if not self._held(conn, scope, key, holder):
+                return False
+            conn.execute(
+                "UPDATE mentions SET state = ?, holder = NULL, last_error = NULL, updated_at = ? "
+                "WHERE scope = ? AND key = ?",
+                (DONE, time.time(), scope, str(key))
+            )
+            return True
+
+    def fail(self, scope, key, holder, error, max_attempts, backoff_base, backoff_max):
+        now = time.time()
+        with self._transaction() as conn:
+            row = self._held(conn, scope, key, holder)
+            if row is None:
+                return None
+            attempts = row[0] + 1
+            if attempts >= max_attempts:
+                state, next_attempt_at = FAILED, None
+            else:
+                state = PENDING
+                next_attempt_at = now + min(backoff_max, backoff_base * 2 ** (attempts - 1))
+            conn.execute(
+                "UPDATE mentions SET state = ?, holder = NULL, attempts = ?, next_attempt_at = ?, "
+                "last_error = ?, updated_at = ? WHERE scope = ? AND key = ?",
+                (state, attempts, next_attempt_at, str(error), now, scope, str(key))
+            )
+            return attempts
+
+    def recover(self, scope):
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE mentions SET state = ?, holder = NULL, updated_at = ? "
+                "WHERE scope = ? AND state = ? AND lease_expires < ?",
+                (PENDING, now, scope, IN_PROGRESS, now)
+            )
+            return cursor.rowcount
+
+    def retry_dead_letters(self, scope):
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE mentions SET state = ?, attempts = 0, next_attempt_at = ?, updated_at = ? "
+                "WHERE scope = ? AND state = ?",
+                (PENDING, now, now, scope, FAILED)
+            )
+            return cursor.rowcount
+
+    def dead_letters(self, scope, limit=50):
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT key, attempts, last_error, updated_at FROM mentions WHERE scope = ? AND state = ? "
+                "ORDER BY updated_at DESC LIMIT ?",
+                (scope, FAILED, limit)
+            ).fetchall()
+        return [{"tweet_id": r[0], "attempts": r[1], "last_error": r[2], "failed_at": r[3]} for r in rows]
+
+    def purge_done(self, scope, older_than):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM mentions WHERE scope = ? AND state = ? AND updated_at < ?",
+                         (scope, DONE, time.time() - older_than))
+
+    def counts(self, scope):
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT state, COUNT(*) FROM mentions WHERE scope = ? GROUP BY state",
+                                (scope,)).fetchall()
+        counts = {PENDING: 0, IN_PROGRESS: 0, DONE: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def take_tokens(self, name, capacity, window, tokens=1):
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT tokens, updated, reset_at FROM budgets WHERE name = ?", (name,)).fetchone()
+            available, updated, reset_at = row if row else (float(capacity), now, None)
+            if reset_at is not None:
+                if now >= reset_at:
+                    available, reset_at = float(capacity), None
+            else:
+                available = min(capacity, available + (now - updated) * capacity / window)
+
+            if available >= tokens:
+                available -= tokens
+                wait = 0.0
+            elif reset_at is not None:
+                wait = max(0.01, reset_at - now)
+            else:
+                wait = (tokens - available) * window / capacity
+            conn.execute("INSERT OR REPLACE INTO budgets (name, tokens, updated, reset_at) VALUES (?, ?, ?, ?)",
+                         (name, available, now, reset_at))
+        return wait
+
+    def sync_budget(self, name, capacity, remaining, reset_at):
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO budgets (name, tokens, updated, reset_at) VALUES (?, ?, ?, ?)",
+                         (name, float(min(capacity, remaining)), time.time(), reset_at))
+
+    def get_value(self, key):
+        with self._transaction() as conn:
+            row = conn.execute("SELECT value FROM shared_values WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_value(self, key, value):
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO shared_values (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+# Redis scripts. Each one runs atomically on the server; ARGV[1] is always
+# the client's clock so leases and buckets use one time base per call.
+
+CLAIM_SCRIPT = """
+local now, limit, ttl, holder, prefix = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), ARGV[4], ARGV[5]
+for _, key in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', '(' .. now)) do
+  redis.call('ZREM', KEYS[2], key)
+  redis.call('ZADD', KEYS[1], now, key)
+  redis.call('HSET', prefix .. key, 'state', 'pending', 'holder', '')
+end
+local claimed = {}
+for _, key in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, limit)) do
+  redis.call('ZREM', KEYS[1], key)
+  redis.call('ZADD', KEYS[2], now + ttl, key)
+  redis.call('HSET', prefix .. key, 'state', 'in_progress', 'holder', holder, 'updated_at', now)
+  local fields = redis.call('HMGET', prefix .. key, 'payload', 'attempts')
+  table.insert(claimed, key)
+  table.insert(claimed, fields[1])
+  table.insert(claimed, fields[2] or '0')
+end
+return claimed
+"""
+
+# KEYS: job hash, leased zset, target zset; ARGV: now, holder, key, action, ...
+FINISH_SCRIPT = """
+local now, holder, key, action = tonumber(ARGV[1]), ARGV[2], ARGV[3], ARGV[4]
+if redis.call('HGET', KEYS[1], 'state') ~= 'in_progress' or redis.call('HGET', KEYS[1], 'holder') ~= holder then
+  return -1
+end
+if action == 'renew' then
+  redis.call('ZADD', KEYS[2], now + tonumber(ARGV[5]), key)
+  return 0
+end
+redis.call('ZREM', KEYS[2], key)
+if action == 'complete' then
+  redis.call('HSET', KEYS[1], 'state', 'done', 'holder', '', 'last_error', '', 'updated_at', now)
+  redis.call('ZADD', KEYS[3], now, key)
+  return 0
+end
+local attempts = tonumber(redis.call('HGET', KEYS[1], 'attempts') or '0') + 1
+local max_attempts, base, cap = tonumber(ARGV[6]), tonumber(ARGV[7]), tonumber(ARGV[8])
+redis.call('HSET', KEYS[1], 'holder', '', 'attempts', attempts, 'last_error', ARGV[5], 'updated_at', now)
+if attempts >= max_attempts then
+  redis.call('HSET', KEYS[1], 'state', 'failed')
+  redis.call('ZADD', KEYS[4], now, key)
+else
+  redis.call('HSET', KEYS[1], 'state', 'pending')
+  redis.call('ZADD', KEYS[3], now + math.min(cap, base * 2 ^ (attempts - 1)), key)
+end
+return attempts
+"""
+
+ENQUEUE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+  return 0
+end
+redis.call('HSET', KEYS[1], 'payload', ARGV[3], 'state', 'pending', 'holder', '', 'attempts', 0, 'updated_at', ARGV[1])
+redis.call('ZADD', KEYS[2], ARGV[1], ARGV[2])
+return 1
+"""
+
+# KEYS: source zset, target zset; moves members scored up to ARGV[1] and resets their hashes
+MOVE_SCRIPT = """
+local now, prefix, state, reset_attempts = tonumber(ARGV[1]), ARGV[2], ARGV[3], ARGV[4]
+local moved = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[5])
+for _, key in ipairs(moved) do
+  redis.call('ZREM', KEYS[1], key)
+  if state == 'deleted' then
+    redis.call('DEL', prefix .. key)
+  else
+    redis.call('ZADD', KEYS[2], now, key)
+    redis.call('HSET', prefix .. key, 'state', state, 'holder', '', 'updated_at', now)
+    if reset_attempts == '1' then
+      redis.call('HSET', prefix .. key, 'attempts', 0)
+    end
+  end
+end
+return #moved
+"""
+
+LEADER_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+  return 1
+end
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  redis.call('PEXPIRE', KEYS[1], ARGV[2])
+  return 1
+end
+return 0
+"""
+
+RELEASE_LEADER_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+TAKE_SCRIPT = """
+local now, capacity, window, tokens = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated', 'reset_at')
+local available = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+local reset_at = tonumber(state[3])
+if reset_at then
+  if now >= reset_at then
+    available, reset_at = capacity, nil
+  end
+else
+  available = math.min(capacity, available + (now - updated) * capacity / window)
+end
+local wait = 0
+if available >= tokens then
+  available = available - tokens
+elseif reset_at then
+  wait = math.max(0.01, reset_at - now)
+else
+  wait = (tokens - available) * window / capacity
+end
+redis.call('HSET', KEYS[1], 'tokens', available, 'updated', now)
+if reset_at then
+  redis.call('HSET', KEYS[1], 'reset_at', reset_at)
+else
+  redis.call('HDEL', KEYS[1], 'reset_at')
+end
+return tostring(wait)
+"""
+
+
+class RedisCoordination(CoordinationBackend):
+    """Backend in Redis, for processes on several machines.
+
+    Needs the redis package (pip install redis). Multi-key steps run as Lua
+    scripts, so they are atomic on the server. Every key starts with prefix.
+    """
+
+    def __init__(self, url, prefix="bot:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The redis package is needed for a redis:// coordination URL (pip install redis)")
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.scripts = {
+            name: self.client.register_script(source) for name, source in [
+                ("claim", CLAIM_SCRIPT), ("finish", FINISH_SCRIPT), ("enqueue", ENQUEUE_SCRIPT),
+                ("move", MOVE_SCRIPT), ("leader", LEADER_SCRIPT), ("release_leader", RELEASE_LEADER_SCRIPT),
+                ("take", TAKE_SCRIPT)
+            ]
+        }
+
+    def _key(self, *parts):
+        return self.prefix + ":".join(str(part) for part in parts)
+
+    def _job_prefix(self, scope):
+        return self._key("mention", scope) + ":"
+
+    def acquire_leadership(self, role, holder, ttl):
+        return bool(self.scripts["leader"](keys=[self._key("leader", role)], args=[holder, int(ttl * 1000)]))
+
+    def release_leadership(self, role, holder):
+        self.scripts["release_leader"](keys=[self._key("leader", role)], args=[holder])
+
+    def enqueue(self, scope, key, payload):
+        return bool(self.scripts["enqueue"](
+            keys=[self._job_prefix(scope) + str(key), self._key(PENDING, scope)],
+            args=[time.time(), str(key), payload]
+        ))
+
+    def claim(self, scope, holder, limit, lease_ttl):
+        flat = self.scripts["claim"](
+            keys=[self._key(PENDING, scope), self._key(IN_PROGRESS, scope)],
+            args=[time.time(), limit, lease_ttl, holder, self._job_prefix(scope)]
+        )
+        return [{"key": flat[i], "payload": flat[i + 1], "attempts": int(flat[i + 2])}
+                for i in range(0, len(flat), 3)]
+
+    def _finish(self, scope, key, holder, action, *args, target=DONE):
+        return self.scripts["finish"](
+            keys=[self._job_prefix(scope) + str(key), self._key(IN_PROGRESS, scope),
+                  self._key(target, scope), self._key(FAILED, scope)],
+            args=[time.time(), holder, str(key), action, *args]
+        )
+
+    def renew(self, scope, key, holder, lease_ttl):
+        return self._finish(scope, key, holder, "renew", lease_ttl) >= 0
+
+    def complete(self, scope, key, holder):
+        return self._finish(scope, key, holder, "complete") >= 0
+
+    def fail(self, scope, key, holder, error, max_attempts, backoff_base, backoff_max):
+        attempts = self._finish(scope, key, holder, "fail", str(error), max_attempts, backoff_base, backoff_max,
+                                target=PENDING)
+        return attempts if attempts >= 0 else None
+
+    def _move(self, scope, source, target, state, up_to, reset_attempts=False):
+        return self.scripts["move"](
+            keys=[self._key(source, scope), self._key(target, scope)],
+            args=[time.time(), self._job_prefix(scope), state, "1" if reset_attempts else "0", up_to]
+        )
+
+    def recover(self, scope):
+        return self._move(scope, IN_PROGRESS, PENDING, PENDING, f"({time.time()}")
+
+    def retry_dead_letters(self, scope):
+        return self._move(scope, FAILED, PENDING, PENDING, "+inf", reset_attempts=True)
+
+    def dead_letters(self, scope, limit=50):
+        keys = self.client.zrevrange(self._key(FAILED, scope), 0, limit - 1)
+        letters = []
+        for key in keys:
+            attempts, last_error, updated_at = self.client.hmget(
+                self._job_prefix(scope) + key, "attempts", "last_error", "updated_at"
+            )
+            letters.append({"tweet_id": key, "attempts": int(attempts or 0), "last_error": last_error,
+                            "failed_at": float(updated_at or 0)})
+        return letters
+
+    def purge_done(self, scope, older_than):
+        self._move(scope, DONE, DONE, "deleted", time.time() - older_than)
+
+    def counts(self, scope):
+        return {state: self.client.zcard(self._key(state, scope)) for state in (PENDING, IN_PROGRESS, DONE, FAILED)}
+
+    def take_tokens(self, name, capacity, window, tokens=1):
+        return float(self.scripts["take"](keys=[self._key("budget", name)],
+                                          args=[time.time(), capacity, window, tokens]))
+
+    def sync_budget(self, name, capacity, remaining, reset_at):
+        key = self._key("budget", name)
+        mapping = {"tokens": min(capacity, remaining), "updated": time.time()}
+        if reset_at is not None:
+            mapping["reset_at"] = reset_at
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping=mapping)
+        if reset_at is None:
+            pipe.hdel(key, "reset_at")
+        pipe.execute()
+
+    def get_value(self, key):
+        return self.client.get(self._key("value", key))
+
+    def set_value(self, key, value):
+        self.client.set(self._key("value", key), str(value))
+
+    def close(self):
+        self.client.close()
+
+
+def create_coordination(url):
+    """Backend for url: redis://... or rediss://... for Redis, otherwise a SQLite
+    file path (optionally written sqlite:///path). None means run standalone."""
+    if not url:
+        return None
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCoordination(url)
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    return SqliteCoordination(url)
+
+
+class LeaderLease:
+    """Holds role for one worker, renewing it when it is a third of the way to expiry.
+
+    on_elected is called each time this worker takes over the role. Without
+    start() the lease is only renewed when is_leader() is called. A poll
+    loop that sleeps longer than ttl must therefore start() the background
+    renewer, or leadership lapses between polls.
+    """
+
+    def __init__(self, backend, role, holder, ttl, on_elected=None):
+        self.backend = backend
+        self.role = role
+        self.holder = holder
+        self.ttl = ttl
+        self.on_elected = on_elected
+        self.leader = False
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.renewer = None
+
+    def start(self):
+        """Renew (or try to take) the lease every ttl / 3 seconds from a background thread"""
+        if self.renewer is None:
+            self.renewer = threading.Thread(target=self._renew_loop, name=f"lease-{self.role}", daemon=True)
+            self.renewer.start()
+
+    def _renew_loop(self):
+        while not self.stopped.wait(self.ttl / 3):
+            self.is_leader()
+
+    def is_leader(self):
+        """Whether this worker holds role right now; logs changes of leadership"""
+        with self.lock:
+            if self.stopped.is_set():
+                return False
+            return self._refresh()
+
+    def _refresh(self):
+        now = time.time()
+        if now - self.checked_at < self.ttl / 3:
+            return self.leader
+        try:
+            leader = self.backend.acquire_leadership(self.role, self.holder, self.ttl)
+        except Exception as e:
+            log_message(f"Error renewing {self.role} leadership: {e}")
+            # Without a renewal the lease may expire; stop acting as leader
+            leader = False
+        self.checked_at = now
+        if leader != self.leader:
+            log_message(f"{'Became' if leader else 'No longer'} leader for {self.role} ({self.holder})")
+            if leader and self.on_elected:
+                try:
+                    self.on_elected()
+                except Exception as e:
+                    log_message(f"Error taking over {self.role}: {e}")
+        self.leader = leader
+        return leader
+
+    def release(self):
+        """Stop renewing and hand the role over straight away"""
+        self.stopped.set()
+        with self.lock:
+            if self.leader:
+                try:
+                    self.backend.release_leadership(self.role, self.holder)
+                except Exception as e:
+                    log_message(f"Error releasing {self.role} leadership: {e}")
+                self.leader = False
@@ -0,0 +1,80 @@
+import threading
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from utils.logging_utils import log_message
+from config.settings import (
+    HTTP_POOL_CONNECTIONS, HTTP_POOL_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT,
+    HTTP_MAX_RETRIES, HTTP_BACKOFF_FACTOR
+)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+class PooledSession(requests.Session):
+    """requests.Session that always applies the configured timeouts"""
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+        return super().request(method, url, **kwargs)
+
+def create_session():
+    retry = Retry(
+        total=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=["GET", "HEAD"],
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_SIZE,
+        max_retries=retry
+    )
+    session = PooledSession()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def get_session():
+    """Process-wide session shared by all outbound search and media traffic"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+def http_get(url, **kwargs):
+    return get_session().get(url, **kwargs)
+
+def create_async_session():
+    """aiohttp session with the same per-host pool size and timeouts"""
+    connector = aiohttp.TCPConnector(limit_per_host=HTTP_POOL_SIZE)
+    timeout = aiohttp.ClientTimeout(sock_connect=HTTP_CONNECT_TIMEOUT, sock_read=HTTP_READ_TIMEOUT)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+def get_connection_stats():
+    """Requests served vs connections opened for each host pool"""
+    stats = {}
+    for prefix in ("https://", "http://"):
+        pools = get_session().get_adapter(prefix).poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats[pool.host] = {
+                "requests": pool.num_requests,
+                "connections": pool.num_connections,
+                "reused": max(0, pool.num_requests - pool.num_connections)
+            }
+    return stats
+
+def log_connection_stats():
+    for host, stats in get_connection_stats().items():
+        log_message(f"[http] {host}: {stats['requests']} requests over "
+                    f"{stats['connections']} connections ({stats['reused']} reused)")
@@ -0,0 +1,253 @@
+import sqlite3
+import threading
+import time
+import uuid
+from utils.logging_utils import log_message
+
+PENDING = "pending"
+IN_PROGRESS = "in_progress"
+DONE = "done"
+FAILED = "failed"  # dead-lettered after max_attempts
+
+
+class JobQueue:
+    """Durable queue of mentions waiting for a reply, kept in SQLite.
+
+    A job is enqueued once per tweet and moves pending -> in_progress -> done.
+    A failed attempt puts it back to pending with an exponential backoff
+    delay until max_attempts is reached, after which it stays in the failed
+    (dead-letter) state. Jobs left in_progress by a crash, or held longer
+    than lease_timeout, are handed out again, so delivery is at-least-once.
+
+    Every claim gets a new claim_id, returned in the job dict. renew(),
+    complete() and fail() only apply to the latest claim, so a copy of a job
+    that was handed out again after its lease ran out can't reply or finish.
+    """
+
+    def __init__(self, path, max_attempts=5, backoff_base=30, backoff_max=3600, lease_timeout=900):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_timeout = lease_timeout
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "tweet_id TEXT PRIMARY KEY, tweet_text TEXT, state TEXT, attempts INTEGER DEFAULT 0, "
+            "next_attempt_at REAL, claimed_at REAL, claim_id TEXT, last_error TEXT, created_at REAL, updated_at REAL)"
+        )
+        # Queues created before claim ids existed
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        if "claim_id" not in columns:
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN claim_id TEXT")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (state, next_attempt_at)")
+        self.conn.commit()
+
+    def enqueue(self, tweet_id, tweet_text):
+        """Add a job; returns False if the tweet was already queued"""
+        now = time.time()
+        with self.lock:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO jobs (tweet_id, tweet_text, state, next_attempt_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (str(tweet_id), tweet_text, PENDING, now, now, now)
+            )
+            self.conn.commit()
+            return cursor.rowcount == 1
+
+    def claim(self, limit):
+        """Move up to limit due jobs to in_progress and return them as job dicts"""
+        now = time.time()
+        claim_id = uuid.uuid4().hex
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT tweet_id, tweet_text, attempts FROM jobs "
+                "WHERE state = ? AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                (PENDING, now, limit)
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE jobs SET state = ?, claimed_at = ?, claim_id = ?, updated_at = ? WHERE tweet_id = ?",
+                [(IN_PROGRESS, now, claim_id, now, row[0]) for row in rows]
+            )
+            self.conn.commit()
+        return [{"tweet_id": row[0], "tweet_text": row[1], "attempts": row[2], "claim_id": claim_id}
+                for row in rows]
+
+    def renew(self, tweet_id, claim_id):
+        """Restart the lease on an in-progress job; False if claim_id no longer holds it"""
+        now = time.time()
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET claimed_at = ?, updated_at = ? WHERE tweet_id = ? AND state = ? AND claim_id = ?",
+                (now, now, str(tweet_id), IN_PROGRESS, claim_id)
+            )
+            self.conn.commit()
+            return cursor.rowcount == 1
+
+    def complete(self, tweet_id, claim_id):
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET state = ?, last_error = NULL, updated_at = ? "
+                "WHERE tweet_id = ? AND state = ? AND claim_id = ?",
+                (DONE, time.time(), str(tweet_id), IN_PROGRESS, claim_id)
+            )
+            self.conn.commit()
+        if cursor.rowcount == 0:
+            log_message(f"Job for {tweet_id} was claimed again before this copy completed")
+
+    def fail(self, tweet_id, error, claim_id):
+        """Schedule a retry with exponential backoff, or dead-letter the job"""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT attempts FROM jobs WHERE tweet_id = ? AND state = ? AND claim_id = ?",
+                (str(tweet_id), IN_PROGRESS, claim_id)
+            ).fetchone()
+            if row is None:
+                log_message(f"Job for {tweet_id} was claimed again before this copy failed: {error}")
+                return
+            attempts = row[0] + 1
+            if attempts >= self.max_attempts:
+                state, next_attempt_at = FAILED, None
+                log_message(f"Job for {tweet_id} failed {attempts} times, moved to dead letters: {error}")
+            else:
+                state = PENDING
+                next_attempt_at = now + min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+            self.conn.execute(
+                "UPDATE jobs SET state = ?, attempts = ?, next_attempt_at = ?, last_error = ?, updated_at = ? "
+                "WHERE tweet_id = ?",
+                (state, attempts, next_attempt_at, str(error), now, str(tweet_id))
+            )
+            self.conn.commit()
+
+    def recover(self, expired_only=False):
+        """Return in_progress jobs to pending; at startup every one of them was interrupted"""
+        now = time.time()
+        query = "UPDATE jobs SET state = ?, updated_at = ? WHERE state = ?"
+        params = [PENDING, now, IN_PROGRESS]
+        if expired_only:
+            query += " AND claimed_at < ?"
+            params.append(now - self.lease_timeout)
+        with self.lock:
+            cursor = self.conn.execute(query, params)
+            self.conn.commit()
+        if cursor.rowcount:
+            log_message(f"Requeued {cursor.rowcount} interrupted jobs")
+        return cursor.rowcount
+
+    def retry_dead_letters(self):
+        """Give dead-lettered jobs a fresh set of attempts"""
+        now = time.time()
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET state = ?, attempts = 0, next_attempt_at = ?, updated_at = ? WHERE state = ?",
+                (PENDING, now, now, FAILED)
+            )
+            self.conn.commit()
+        return cursor.rowcount
+
+    def dead_letters(self, limit=50):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT tweet_id, attempts, last_error, updated_at FROM jobs WHERE state = ? "
+                "ORDER BY updated_at DESC LIMIT ?",
+                (FAILED, limit)
+            ).fetchall()
+        return [{"tweet_id": r[0], "attempts": r[1], "last_error": r[2], "failed_at": r[3]} for r in rows]
+
+    def purge_done(self, older_than):
+        with self.lock:
+            self.conn.execute(
+                "DELETE FROM jobs WHERE state = ? AND updated_at < ?", (DONE, time.time() - older_than)
+            )
+            self.conn.commit()
+
+    def counts(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        counts = {PENDING: 0, IN_PROGRESS: 0, DONE: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def backlog(self):
+        counts = self.counts()
+        return counts[PENDING] + counts[IN_PROGRESS]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class SharedJobQueue:
+    """JobQueue over a CoordinationBackend, for several processes sharing an account.
+
+    Jobs are the backend's mention leases in scope (the account name), and
+    holder identifies this process. Each claim leases its mentions under
+    holder plus a fresh suffix, which is the job's claim_id, so renew(),
+    complete() and fail() only apply while that claim still holds the lease:
+    once it expires the mention belongs to whichever claim took it next, in
+    this process or another. The backend is owned by the caller, so close()
+    leaves it open.
+    """
+
+    def __init__(self, backend, scope, holder, max_attempts=5, backoff_base=30, backoff_max=3600, lease_timeout=900):
+        self.backend = backend
+        self.scope = scope
+        self.holder = holder
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_timeout = lease_timeout
+
+    def enqueue(self, tweet_id, tweet_text):
+        return self.backend.enqueue(self.scope, str(tweet_id), tweet_text)
+
+    def claim(self, limit):
+        claim_id = f"{self.holder}:{uuid.uuid4().hex[:8]}"
+        leases = self.backend.claim(self.scope, claim_id, limit, self.lease_timeout)
+        return [{"tweet_id": lease["key"], "tweet_text": lease["payload"], "attempts": lease["attempts"],
+                 "claim_id": claim_id} for lease in leases]
+
+    def renew(self, tweet_id, claim_id):
+        return self.backend.renew(self.scope, str(tweet_id), claim_id, self.lease_timeout)
+
+    def complete(self, tweet_id, claim_id):
+        if not self.backend.complete(self.scope, str(tweet_id), claim_id):
+            log_message(f"Lease on {tweet_id} had passed to another claim before it completed")
+
+    def fail(self, tweet_id, error, claim_id):
+        attempts = self.backend.fail(self.scope, str(tweet_id), claim_id, error,
+                                     self.max_attempts, self.backoff_base, self.backoff_max)
+        if attempts is None:
+            log_message(f"Lease on {tweet_id} had passed to another claim before it failed: {error}")
+        elif attempts >= self.max_attempts:
+            log_message(f"Job for {tweet_id} failed {attempts} times, moved to dead letters: {error}")
+
+    def recover(self, expired_only=True):
+        """Requeue jobs whose lease expired. Unexpired ones may belong to live
+        processes, so they are never taken back, even at startup."""
+        count = self.backend.recover(self.scope)
+        if count:
+            log_message(f"Requeued {count} interrupted jobs")
+        return count
+
+    def retry_dead_letters(self):
+        return self.backend.retry_dead_letters(self.scope)
+
+    def dead_letters(self, limit=50):
+        return self.backend.dead_letters(self.scope, limit)
+
+    def purge_done(self, older_than):
+        self.backend.purge_done(self.scope, older_than)
+
+    def counts(self):
+        return self.backend.counts(self.scope)
+
+    def backlog(self):
+        counts = self.counts()
+        return counts[PENDING] + counts[IN_PROGRESS]
+
+    def close(self):
+        pass
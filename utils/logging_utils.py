@@ -1,8 +1,107 @@
+import atexit
+import json
 import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from config.settings import LOG_FILE, LOG_LEVEL, LOG_FORMAT, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_QUEUE_SIZE
 
-# Logging setup
-logging.basicConfig(filename='bot.log', level=logging.INFO, format='%(asctime)s - %(message)s')
+logger = logging.getLogger("bot")
+logger.propagate = False
+listener = None
 
-def log_message(message):
-    print(message)
-    logging.info(message) 
\ No newline at end of file
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # Format the message on the calling thread but skip the rest of the
+        # default work; the listener's handlers do the formatting
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_text = None
+        return record
+
+
+def configure_logging(level=None, fmt=None):
+    """(Re)start the background log writer.
+
+    Records are queued by log_message and written to stdout and a size-rotated
+    log file by a listener thread, so callers never wait on the console or
+    disk. level and fmt default to the LOG_LEVEL / LOG_FORMAT environment
+    variables, then the settings.
+    """
+    global listener
+    if listener:
+        listener.stop()
+
+    level = level or os.getenv("LOG_LEVEL", LOG_LEVEL)
+    fmt = fmt or os.getenv("LOG_FORMAT", LOG_FORMAT)
+
+    if fmt == "json":
+        console_formatter = file_formatter = JsonFormatter()
+    else:
+        console_formatter = logging.Formatter("%(message)s")
+        file_formatter = logging.Formatter("%(asctime)s - %(message)s")
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(console_formatter)
+    log_file = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+                                   encoding="utf-8", delay=True)
+    log_file.setFormatter(file_formatter)
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(DroppingQueueHandler(log_queue))
+    logger.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+
+    listener = QueueListener(log_queue, console, log_file, respect_handler_level=True)
+    listener.start()
+
+def flush_logging():
+    """Write out everything queued so far and stop the writer thread"""
+    global listener
+    if listener:
+        listener.stop()
+        listener = None
+
+def dropped_log_records():
+    return sum(getattr(handler, "dropped", 0) for handler in logger.handlers)
+
+def log_message(message, level=logging.INFO):
+    logger.log(level, message)
+
+def log_debug(message):
+    """Verbose payload dumps (Groq responses, analysis dicts), off unless LOG_LEVEL=DEBUG"""
+    logger.debug(message)
+
+
+configure_logging()
+atexit.register(flush_logging)
@@ -0,0 +1,147 @@
+import json
+import os
+import threading
+import time
+from utils.logging_utils import log_message
+
+
+class MentionStore:
+    """Append-only log of processed mention IDs and the since_id cursor.
+
+    Each mark or cursor update appends one JSON line, so recording a mention
+    costs the same however many are already stored. The log is rewritten
+    (compacted) once compact_every records have been appended since the last
+    rewrite, dropping entries older than the retention window. Compaction
+    writes a temporary file and swaps it in with os.replace, so a crash leaves
+    either the old or the new log; a torn last line from a crash mid-append
+    is skipped when the log is loaded.
+    """
+
+    def __init__(self, path, retention=None, compact_every=1000):
+        self.path = path
+        self.retention = retention
+        self.compact_every = compact_every
+        self.lock = threading.Lock()
+        self.processed = {}  # mention id -> time it was marked
+        self.last_id = None
+        self.appended = 0
+        self.file = None
+
+    def __contains__(self, mention_id):
+        return str(mention_id) in self.processed
+
+    def __len__(self):
+        return len(self.processed)
+
+    def load(self, legacy_path=None):
+        """Recover state from the log (or a legacy JSON file) and compact it"""
+        with self.lock:
+            self.processed = {}
+            self.last_id = None
+            # A leftover temp file means a compaction never got to os.replace
+            if os.path.exists(self.path + ".tmp"):
+                os.remove(self.path + ".tmp")
+
+            if os.path.exists(self.path):
+                self._read_log()
+            elif legacy_path and os.path.exists(legacy_path):
+                self._read_legacy(legacy_path)
+
+            self._prune()
+            self._rewrite()
+        return len(self.processed)
+
+    def _read_log(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    log_message(f"Skipping unreadable line {number} in {self.path}")
+                    continue
+                if "id" in record:
+                    self.processed[record["id"]] = record.get("t", time.time())
+                if "last_id" in record:
+                    self.last_id = record["last_id"]
+
+    def _read_legacy(self, legacy_path):
+        """Import the old last_mention.json format"""
+        with open(legacy_path, "r") as f:
+            data = json.load(f)
+        self.last_id = data.get("last_id")
+        now = time.time()
+        for mention in data.get("processed_mentions", []):
+            self.processed[str(mention["id"])] = now
+        log_message(f"Imported {len(self.processed)} processed mentions from {legacy_path}")
+
+    def _prune(self):
+        if not self.retention:
+            return
+        cutoff = time.time() - self.retention
+        self.processed = {mid: marked for mid, marked in self.processed.items() if marked >= cutoff}
+
+    def _rewrite(self):
+        # Called with self.lock held
+        if self.file:
+            self.file.close()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            if self.last_id:
+                f.write(json.dumps({"last_id": self.last_id}) + "\n")
+            for mid, marked in self.processed.items():
+                f.write(json.dumps({"id": mid, "t": marked}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.appended = 0
+
+    def _append(self, record):
+        # Called with self.lock held
+        if self.file is None:
+            self.file = open(self.path, "a", encoding="utf-8")
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        self.appended += 1
+        if self.appended >= self.compact_every:
+            self._prune()
+            self._rewrite()
+
+    def mark(self, mention_id):
+        mention_id = str(mention_id)
+        with self.lock:
+            if mention_id in self.processed:
+                return
+            marked = time.time()
+            self.processed[mention_id] = marked
+            self._append({"id": mention_id, "t": marked})
+
+    def set_last_id(self, last_id):
+        last_id = str(last_id)
+        with self.lock:
+            if last_id == self.last_id:
+                return
+            self.last_id = last_id
+            self._append({"last_id": last_id})
+
+    def compact(self):
+        with self.lock:
+            self._prune()
+            self._rewrite()
+
+    def clear(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+            self.processed = {}
+            self.last_id = None
+            self.appended = 0
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
@@ -0,0 +1,183 @@
+import bisect
+import functools
+import inspect
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.logging_utils import log_message
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Recent samples kept per operation for p50/p95/p99
+RESERVOIR_SIZE = 1024
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Cumulative bucket counts plus a window of recent samples for percentiles"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bucket_counts = [0] * (len(BUCKETS) + 1)  # last one is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=RESERVOIR_SIZE)
+        self.outcomes = {}
+
+    def observe(self, seconds, outcome="ok"):
+        with self.lock:
+            self.bucket_counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+            self.recent.append(seconds)
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    def quantiles(self):
+        with self.lock:
+            samples = sorted(self.recent)
+        if not samples:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: samples[min(len(samples) - 1, int(q * len(samples)))] for q in QUANTILES}
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.bucket_counts), self.count, self.total, dict(self.outcomes)
+
+
+histograms = {}
+histograms_lock = threading.Lock()
+
+def get_histogram(name):
+    with histograms_lock:
+        if name not in histograms:
+            histograms[name] = Histogram()
+        return histograms[name]
+
+def observe(name, seconds, outcome="ok"):
+    get_histogram(name).observe(seconds, outcome)
+
+def _outcome(result):
+    # Most service methods log and return None instead of raising
+    return "none" if result is None else "ok"
+
+def timed(name):
+    """Record the wrapped function's latency and outcome under name.
+
+    Works for plain and async functions. Outcomes are "ok", "none" (the
+    function returned None, which is how most services report failure) and
+    "error" (it raised).
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception:
+                    observe(name, time.perf_counter() - started, "error")
+                    raise
+                observe(name, time.perf_counter() - started, _outcome(result))
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                observe(name, time.perf_counter() - started, "error")
+                raise
+            observe(name, time.perf_counter() - started, _outcome(result))
+            return result
+        return wrapper
+    return decorator
+
+def render_prometheus():
+    """All histograms in the Prometheus text exposition format"""
+    with histograms_lock:
+        current = sorted(histograms.items())
+    lines = [
+        "# HELP bot_call_duration_seconds Latency of calls to external services and slow steps",
+        "# TYPE bot_call_duration_seconds histogram"
+    ]
+    for name, histogram in current:
+        bucket_counts, count, total, _ = histogram.snapshot()
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS + ("+Inf",), bucket_counts):
+            cumulative += bucket_count
+            lines.append(f'bot_call_duration_seconds_bucket{{op="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'bot_call_duration_seconds_sum{{op="{name}"}} {total}')
+        lines.append(f'bot_call_duration_seconds_count{{op="{name}"}} {count}')
+
+    lines += [
+        "# HELP bot_call_latency_quantile_seconds Percentiles over the most recent calls",
+        "# TYPE bot_call_latency_quantile_seconds gauge"
+    ]
+    for name, histogram in current:
+        for q, value in histogram.quantiles().items():
+            lines.append(f'bot_call_latency_quantile_seconds{{op="{name}",quantile="{q}"}} {value}')
+
+    lines += [
+        "# HELP bot_calls_total Calls by outcome",
+        "# TYPE bot_calls_total counter"
+    ]
+    for name, histogram in current:
+        for outcome, value in sorted(histogram.snapshot()[3].items()):
+            lines.append(f'bot_calls_total{{op="{name}",outcome="{outcome}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+def log_metrics_summary():
+    with histograms_lock:
+        current = sorted(histograms.items())
+    for name, histogram in current:
+        _, count, _, outcomes = histogram.snapshot()
+        q = histogram.quantiles()
+        outcome_text = " ".join(f"{k}={v}" for k, v in sorted(outcomes.items()))
+        log_message(f"[metrics] {name}: n={count} p50={q[0.5]:.3f}s p95={q[0.95]:.3f}s "
+                    f"p99={q[0.99]:.3f}s {outcome_text}")
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes would otherwise print a line to stderr every few seconds
+        pass
+
+def start_metrics_server(host, port):
+    """Serve /metrics from a daemon thread; returns the server or None"""
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        log_message(f"Could not start metrics endpoint on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    log_message(f"Metrics available at http://{host}:{port}/metrics")
+    return server
+
+def start_metrics_reporter(interval):
+    """Log a summary line per operation every interval seconds"""
+    def report():
+        while True:
+            time.sleep(interval)
+            try:
+                log_metrics_summary()
+            except Exception as e:
+                log_message(f"Error logging metrics summary: {e}")
+
+    thread = threading.Thread(target=report, name="metrics-reporter", daemon=True)
+    thread.start()
+    return thread
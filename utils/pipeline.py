@@ -0,0 +1,250 @@
+import queue
+import threading
+import time
+from utils.logging_utils import log_message
+
+
+class StageStats:
+    """Latency and throughput counters for a single pipeline stage"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.last_latency = 0.0
+
+    def record(self, latency, outcome="processed"):
+        with self.lock:
+            if outcome == "failed":
+                self.failed += 1
+            elif outcome == "dropped":
+                self.dropped += 1
+            else:
+                self.processed += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            self.last_latency = latency
+
+    def snapshot(self):
+        with self.lock:
+            count = self.processed + self.failed + self.dropped
+            return {
+                "processed": self.processed,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "avg_latency": self.total_latency / count if count else 0.0,
+                "max_latency": self.max_latency,
+                "last_latency": self.last_latency
+            }
+
+
+class Stage:
+    def __init__(self, name, func, workers=1, queue_size=20, pacer=None, batch_size=1, batch_wait=0.25,
+                 partition_by=None, partitions=None):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.pacer = pacer
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.partition_by = partition_by
+        # One queue per partition key, or a single queue under None
+        self.queues = {key: queue.Queue(maxsize=queue_size) for key in (partitions if partition_by else [None])}
+        self.queue = None if partition_by else self.queues[None]
+        self.stats = StageStats()
+        self.next_stage = None
+
+    def queue_for(self, job):
+        return self.queues[self.partition_by(job)] if self.partition_by else self.queue
+
+    def depth(self):
+        return sum(stage_queue.qsize() for stage_queue in self.queues.values())
+
+
+class Pipeline:
+    """Staged worker pipeline with bounded queues between stages.
+
+    Each stage function takes a job dict and returns it (possibly updated) to
+    pass it on, or None to drop it. Batched stages (batch_size > 1) get a list
+    of jobs and return a list, with None for jobs to drop. Queues are bounded
+    so a slow stage pushes back on the stages feeding it instead of buffering
+    without limit.
+
+    on_complete(job) is called when a job leaves the last stage, and
+    on_failure(job, reason) when a stage raises or drops it.
+    """
+
+    def __init__(self, name, queue_size=20, on_complete=None, on_failure=None):
+        self.name = name
+        self.queue_size = queue_size
+        self.on_complete = on_complete
+        self.on_failure = on_failure
+        self.stages = []
+        self.external_stats = {}
+        self.threads = []
+        self.running = False
+
+    def add_stage(self, name, func, workers=1, pacer=None, batch_size=1, batch_wait=0.25,
+                  partition_by=None, partitions=None):
+        """Append a stage; pacer is called before each job and blocks until it may run.
+
+        With batch_size > 1 a worker collects up to batch_size jobs, waiting at
+        most batch_wait seconds after the first one, and hands them over together.
+
+        With partition_by, the stage has a queue and workers workers for each
+        key in partitions, and a job goes to the queue for partition_by(job).
+        A partition whose workers are blocked then only holds up its own jobs.
+        """
+        stage = Stage(name, func, workers, self.queue_size, pacer, batch_size, batch_wait, partition_by, partitions)
+        if self.stages:
+            self.stages[-1].next_stage = stage
+        self.stages.append(stage)
+        return stage
+
+    def record(self, name, latency, outcome="processed"):
+        """Record latency for work done outside the pipeline (e.g. the fetch loop)"""
+        if name not in self.external_stats:
+            self.external_stats[name] = StageStats()
+        self.external_stats[name].record(latency, outcome)
+
+    def start(self):
+        self.running = True
+        for stage in self.stages:
+            for key, stage_queue in stage.queues.items():
+                for i in range(stage.workers):
+                    label = f"{stage.name}-{key}" if key is not None else stage.name
+                    thread = threading.Thread(target=self._worker, args=(stage, stage_queue),
+                                              name=f"{self.name}-{label}-{i}")
+                    thread.daemon = True
+                    thread.start()
+                    self.threads.append(thread)
+        log_message(f"Pipeline '{self.name}' started: " +
+                    ", ".join(f"{s.name}x{s.workers * len(s.queues)}" for s in self.stages))
+
+    def stop(self):
+        self.running = False
+
+    def submit(self, job, timeout=None):
+        """Put a job on the first stage queue, blocking while it is full"""
+        job.setdefault("submitted_at", time.time())
+        self.stages[0].queue_for(job).put(job, timeout=timeout)
+
+    def is_idle(self):
+        """No job queued or being worked on in any stage"""
+        # unfinished_tasks drops only at task_done(), after a worker has forwarded or finished the job
+        return all(stage_queue.unfinished_tasks == 0
+                   for stage in self.stages for stage_queue in stage.queues.values())
+
+    def _worker(self, stage, stage_queue):
+        if stage.batch_size > 1:
+            self._batch_worker(stage, stage_queue)
+            return
+
+        while self.running:
+            try:
+                job = stage_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            try:
+                if stage.pacer:
+                    stage.pacer()
+
+                started = time.time()
+                try:
+                    result = stage.func(job)
+                except Exception as e:
+                    stage.stats.record(time.time() - started, "failed")
+                    log_message(f"Error in {stage.name} stage for {job.get('tweet_id')}: {e}")
+                    self._notify_failure(job, f"{stage.name} stage error: {e}")
+                    continue
+
+                if result is None:
+                    stage.stats.record(time.time() - started, "dropped")
+                    self._notify_failure(job, f"dropped in {stage.name} stage")
+                    continue
+
+                stage.stats.record(time.time() - started)
+                self._forward(stage, result)
+            finally:
+                stage_queue.task_done()
+
+    def _batch_worker(self, stage, stage_queue):
+        while self.running:
+            try:
+                jobs = [stage_queue.get(timeout=1)]
+            except queue.Empty:
+                continue
+
+            deadline = time.time() + stage.batch_wait
+            while len(jobs) < stage.batch_size:
+                try:
+                    jobs.append(stage_queue.get(timeout=max(0, deadline - time.time())))
+                except queue.Empty:
+                    break
+
+            try:
+                started = time.time()
+                try:
+                    results = stage.func(jobs)
+                except Exception as e:
+                    for job in jobs:
+                        stage.stats.record(time.time() - started, "failed")
+                        self._notify_failure(job, f"{stage.name} stage error: {e}")
+                    log_message(f"Error in {stage.name} stage for batch of {len(jobs)}: {e}")
+                    continue
+
+                latency = time.time() - started
+                results = list(results or [])
+                if len(results) != len(jobs):
+                    log_message(f"{stage.name} stage returned {len(results)} results for {len(jobs)} jobs")
+                    # Jobs without a result fail now instead of waiting out their lease
+                    for job in jobs[len(results):]:
+                        stage.stats.record(latency, "failed")
+                        self._notify_failure(job, f"no result from {stage.name} stage")
+                for job, result in zip(jobs, results):
+                    if result is None:
+                        stage.stats.record(latency, "dropped")
+                        self._notify_failure(job, f"dropped in {stage.name} stage")
+                        continue
+                    stage.stats.record(latency)
+                    self._forward(stage, result)
+            finally:
+                for job in jobs:
+                    stage_queue.task_done()
+
+    def _forward(self, stage, job):
+        if stage.next_stage:
+            stage.next_stage.queue_for(job).put(job)
+        elif self.on_complete:
+            try:
+                self.on_complete(job)
+            except Exception as e:
+                log_message(f"Error in {self.name} completion callback for {job.get('tweet_id')}: {e}")
+
+    def _notify_failure(self, job, reason):
+        if self.on_failure:
+            try:
+                self.on_failure(job, reason)
+            except Exception as e:
+                log_message(f"Error in {self.name} failure callback for {job.get('tweet_id')}: {e}")
+
+    def stats(self):
+        """Per-stage queue depth and latency counters"""
+        result = {}
+        for name, stats in self.external_stats.items():
+            result[name] = dict(stats.snapshot(), queue_depth=0)
+        for stage in self.stages:
+            result[stage.name] = dict(stage.stats.snapshot(), queue_depth=stage.depth())
+        return result
+
+    def log_stats(self):
+        for name, stats in self.stats().items():
+            log_message(
+                f"[pipeline:{self.name}] {name}: depth={stats['queue_depth']} "
+                f"ok={stats['processed']} dropped={stats['dropped']} failed={stats['failed']} "
+                f"avg={stats['avg_latency']:.2f}s max={stats['max_latency']:.2f}s"
+            )
@@ -1,52 +1,353 @@
+import asyncio
 import json
 import datetime
+import threading
 import time
 import os
 from utils.logging_utils import log_message
-from config.settings import RATE_LIMIT_FILE
-
-def reset_rate_limits():
-    default_limits = {
-        "mentions_api": {"calls_remaining": 150, "reset_time": None},
-        "dm_api": {"calls_remaining": 15, "reset_time": None}
-    }
-    save_rate_limits(default_limits)
-    log_message("Rate limits have been reset to defaults")
-    return default_limits
-
-def load_rate_limits():
+from config.settings import RATE_LIMIT_FILE, RATE_LIMIT_PERSIST_INTERVAL
+
+# Calls allowed per window (seconds) for each endpoint we call
+DEFAULT_LIMITS = {
+    "mentions_api": (150, 900),
+    "dm_api": (15, 900),
+    "tweet_api": (200, 900),
+    "media_api": (500, 900),
+    "groq_api": (30, 60),
+    "tenor_api": (60, 60),
+    "unsplash_api": (50, 3600)
+}
+
+# Budgets that belong to a Twitter account rather than to the whole bot
+ACCOUNT_APIS = ("mentions_api", "dm_api", "tweet_api", "media_api")
+
+# (method, URL fragment) -> budget the response's headers belong to
+ENDPOINTS = [
+    ("GET", "/mentions", "mentions_api"),
+    ("POST", "/2/tweets", "tweet_api"),
+    ("POST", "/statuses/update.json", "tweet_api"),
+    ("POST", "upload.twitter.com", "media_api"),
+]
+
+
+class TokenBucket:
+    """Thread-safe token bucket for one endpoint.
+
+    Without server information tokens refill continuously at capacity/window
+    per second. Once x-rate-limit headers have been seen the bucket follows
+    the server instead: tokens are the reported remaining calls and refill in
+    full at the reported reset time.
+    """
+
+    def __init__(self, capacity, window):
+        self.capacity = capacity
+        self.window = window
+        self.tokens = float(capacity)
+        self.reset_at = None  # epoch seconds reported by the server
+        self.updated = time.time()
+        self.condition = threading.Condition()
+
+    def _refill(self):
+        # Called with self.condition held
+        now = time.time()
+        if self.reset_at is not None:
+            if now >= self.reset_at:
+                self.tokens = float(self.capacity)
+                self.reset_at = None
+        else:
+            elapsed = now - self.updated
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.capacity / self.window)
+        self.updated = now
+
+    def _wait_time(self, tokens):
+        # Called with self.condition held, after _refill
+        if self.tokens >= tokens:
+            return 0.0
+        if self.reset_at is not None:
+            return max(0.0, self.reset_at - time.time())
+        return (tokens - self.tokens) * self.window / self.capacity
+
+    def acquire(self, tokens=1, block=True, timeout=None):
+        """Take tokens; blocks until available unless block is False.
+
+        Returns False if the tokens could not be taken without blocking, or
+        within timeout seconds.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self.condition:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return True
+                wait = self._wait_time(tokens)
+                if not block:
+                    return False
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0 or wait > remaining:
+                        return False
+                    wait = min(wait, remaining)
+                self.condition.wait(max(wait, 0.01))
+
+    def wait_time(self, tokens=1):
+        with self.condition:
+            self._refill()
+            return self._wait_time(tokens)
+
+    def sync(self, remaining, reset_at):
+        """Adopt the server's view of the current window"""
+        with self.condition:
+            self.tokens = float(remaining)
+            self.reset_at = reset_at
+            self.updated = time.time()
+            self.condition.notify_all()
+
+    def snapshot(self):
+        with self.condition:
+            self._refill()
+            return {
+                "calls_remaining": int(self.tokens),
+                "reset_time": datetime.datetime.fromtimestamp(self.reset_at).isoformat() if self.reset_at else None
+            }
+
+    def restore(self, snapshot):
+        with self.condition:
+            reset_time = snapshot.get("reset_time")
+            self.reset_at = datetime.datetime.fromisoformat(reset_time).timestamp() if reset_time else None
+            self.tokens = float(min(self.capacity, snapshot.get("calls_remaining", self.capacity)))
+            self.updated = time.time()
+            self._refill()
+
+
+class RateLimiter:
+    """Per-endpoint token buckets, snapshotted to disk by a background thread.
+
+    After share(), the named budgets are drawn from a coordination backend
+    instead, so every bot process spends from one bucket. The local bucket is
+    used again if the backend can't be reached.
+    """
+
+    def __init__(self, limits, path):
+        self.limits = limits
+        self.path = path
+        self.buckets = {name: TokenBucket(*limit) for name, limit in limits.items()}
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.persister = None
+        self.coordination = None
+        self.shared_names = set()
+        self.shared_prefix = ""
+        self.shared_waits = {}  # last wait the backend reported per shared budget
+
+    def share(self, coordination, names, scope=None):
+        """Draw the budgets in names from coordination, keyed under scope (an account)"""
+        self.coordination = coordination
+        self.shared_names = set(names)
+        self.shared_prefix = f"{scope}:" if scope else ""
+
+    def _shared(self, api_name):
+        return self.coordination is not None and api_name in self.shared_names
+
+    def bucket(self, api_name):
+        with self.lock:
+            if api_name not in self.buckets:
+                self.buckets[api_name] = TokenBucket(*self.limits.get(api_name, (100, 900)))
+            return self.buckets[api_name]
+
+    def acquire(self, api_name, block=True, timeout=None):
+        if self._shared(api_name):
+            return self._acquire_shared(api_name, block, timeout)
+        acquired = self.bucket(api_name).acquire(block=block, timeout=timeout)
+        if acquired:
+            self.dirty = True
+        return acquired
+
+    def _acquire_shared(self, api_name, block, timeout):
+        capacity, window = self.limits.get(api_name, (100, 900))
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            try:
+                wait = self.coordination.take_tokens(self.shared_prefix + api_name, capacity, window)
+            except Exception as e:
+                log_message(f"Shared {api_name} budget unavailable, using the local one: {e}")
+                remaining = None if deadline is None else max(0.0, deadline - time.time())
+                return self.bucket(api_name).acquire(block=block, timeout=remaining)
+            self.shared_waits[api_name] = wait
+            if wait <= 0:
+                return True
+            if not block:
+                return False
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0 or wait > remaining:
+                    return False
+            # Another process may sync the bucket from fresh headers, so look again within a few seconds
+            time.sleep(min(wait, 5))
+
+    def wait_time(self, api_name):
+        """Seconds until a call from api_name's budget should be available"""
+        if self._shared(api_name):
+            return self.shared_waits.get(api_name, 0.0)
+        return self.bucket(api_name).wait_time()
+
+    def update_from_headers(self, api_name, headers):
+        if "x-rate-limit-remaining" not in headers:
+            return
+        remaining = int(headers["x-rate-limit-remaining"])
+        reset_at = int(headers["x-rate-limit-reset"]) if "x-rate-limit-reset" in headers else None
+        self.bucket(api_name).sync(remaining, reset_at)
+        self.dirty = True
+        if self._shared(api_name):
+            capacity = self.limits.get(api_name, (100, 900))[0]
+            self.coordination.sync_budget(self.shared_prefix + api_name, capacity, remaining, reset_at)
+
+    def snapshot(self):
+        with self.lock:
+            buckets = dict(self.buckets)
+        return {name: bucket.snapshot() for name, bucket in buckets.items()}
+
+    def reset(self):
+        with self.lock:
+            self.buckets = {name: TokenBucket(*limit) for name, limit in self.limits.items()}
+        self.dirty = True
+
+    def load(self):
+        """Restore bucket state from the last snapshot on disk"""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "r") as f:
+            snapshot = json.load(f)
+        for name, state in snapshot.items():
+            self.bucket(name).restore(state)
+        return True
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def start_persistence(self, interval):
+        """Write a snapshot every interval seconds when something changed"""
+        if self.persister:
+            return
+
+        def persist():
+            while True:
+                time.sleep(interval)
+                if self.dirty:
+                    try:
+                        self.save()
+                    except Exception as e:
+                        log_message(f"Error saving rate limit snapshot: {e}")
+
+        self.persister = threading.Thread(target=persist, name="rate-limit-persister", daemon=True)
+        self.persister.start()
+
+
+rate_limiter = RateLimiter(DEFAULT_LIMITS, RATE_LIMIT_FILE)
+
+def create_account_rate_limiter(path):
+    """Twitter budgets for one account in multi-account mode, persisted to path.
+
+    Groq, Tenor and Unsplash budgets stay in the shared rate_limiter.
+    """
+    return RateLimiter({name: DEFAULT_LIMITS[name] for name in ACCOUNT_APIS}, path)
+
+# The functions below use the shared rate_limiter unless given an account's limiter
+
+def reset_rate_limits(limiter=None):
+    limiter = limiter or rate_limiter
+    limiter.reset()
+    log_message(f"Rate limits in {limiter.path} have been reset to defaults")
+    return limiter.snapshot()
+
+def load_rate_limits(limiter=None):
+    """Restore the persisted snapshot, falling back to defaults"""
+    limiter = limiter or rate_limiter
     try:
-        if os.path.exists(RATE_LIMIT_FILE):
-            with open(RATE_LIMIT_FILE, "r") as f:
-                rate_limits = json.load(f)
-                # Validation logic here...
-                return rate_limits
-        return reset_rate_limits()
+        if not limiter.load():
+            return reset_rate_limits(limiter)
+        return limiter.snapshot()
     except Exception as e:
         log_message(f"Error loading rate limits: {e}. Resetting to defaults.")
-        return reset_rate_limits()
+        return reset_rate_limits(limiter)
+
+def share_rate_limits(coordination, names, scope=None, limiter=None):
+    """Draw the budgets in names from a coordination backend shared with other processes"""
+    (limiter or rate_limiter).share(coordination, names, scope)
+    log_message(f"Sharing rate budgets {', '.join(sorted(names))}"
+                f"{f' for {scope}' if scope else ''} with other workers")
 
-def save_rate_limits(rate_limits):
-    with open(RATE_LIMIT_FILE, "w") as f:
-        json.dump(rate_limits, f)
+def save_rate_limits(limiter=None):
+    (limiter or rate_limiter).save()
 
-def log_rate_limits():
+def start_rate_limit_persistence(limiter=None):
+    (limiter or rate_limiter).start_persistence(RATE_LIMIT_PERSIST_INTERVAL)
+
+def log_rate_limits(limiter=None):
     """Log current rate limits"""
-    rate_limits = load_rate_limits()
-    for api, limits in rate_limits.items():
+    for api, limits in (limiter or rate_limiter).snapshot().items():
         log_message(f"{api}: {limits['calls_remaining']} remaining, resets at {limits['reset_time']}")
 
-def update_rate_limits(api_name, response):
+def acquire_rate_limit(api_name, block=True, timeout=None, limiter=None):
+    """Take one call from api_name's budget; see TokenBucket.acquire"""
+    return (limiter or rate_limiter).acquire(api_name, block, timeout)
+
+async def acquire_rate_limit_async(api_name, timeout=None, limiter=None):
+    """Wait for a call from api_name's budget without blocking the event loop.
+
+    Returns False if none was free within timeout seconds.
+    """
+    limiter = limiter or rate_limiter
+
+    async def try_take():
+        if limiter._shared(api_name):
+            # Shared budgets are a sqlite/Redis round trip; keep it off the event loop
+            return await asyncio.to_thread(limiter.acquire, api_name, False)
+        return limiter.acquire(api_name, block=False)
+
+    async def take():
+        while not await try_take():
+            await asyncio.sleep(max(0.05, limiter.wait_time(api_name)))
+
+    try:
+        await asyncio.wait_for(take(), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+def update_rate_limits(api_name, response, limiter=None):
     try:
-        rate_limits = load_rate_limits()
         if hasattr(response, "headers") and response.headers:
-            if "x-rate-limit-remaining" in response.headers:
-                rate_limits[api_name]["calls_remaining"] = int(response.headers["x-rate-limit-remaining"])
-            if "x-rate-limit-reset" in response.headers:
-                reset_time = int(response.headers["x-rate-limit-reset"])
-                rate_limits[api_name]["reset_time"] = datetime.datetime.fromtimestamp(reset_time).isoformat()
-            save_rate_limits(rate_limits)
+            (limiter or rate_limiter).update_from_headers(api_name, response.headers)
     except Exception as e:
         log_message(f"Error updating rate limits: {e}")
 
-# Rest of your rate limiting functions... 
\ No newline at end of file
+def api_name_for_request(method, url):
+    for endpoint_method, fragment, api_name in ENDPOINTS:
+        if method == endpoint_method and fragment in url:
+            return api_name
+    return None
+
+def rate_limit_hook(response, *args, **kwargs):
+    """requests response hook that records x-rate-limit-* headers of Twitter calls"""
+    api_name = api_name_for_request(response.request.method, response.url)
+    if api_name:
+        update_rate_limits(api_name, response)
+
+def rate_limit_hook_for(limiter):
+    """rate_limit_hook recording into an account's limiter"""
+    def hook(response, *args, **kwargs):
+        api_name = api_name_for_request(response.request.method, response.url)
+        if api_name:
+            update_rate_limits(api_name, response, limiter)
+    return hook
+
+def get_rate_limit(api_name, limiter=None):
+    """Return (calls_remaining, reset datetime or None) for api_name"""
+    limits = (limiter or rate_limiter).bucket(api_name).snapshot()
+    reset_time = limits["reset_time"]
+    return limits["calls_remaining"], datetime.datetime.fromisoformat(reset_time) if reset_time else None
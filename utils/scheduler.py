@@ -0,0 +1,50 @@
+import datetime
+from utils.logging_utils import log_message
+from utils.rate_limiting import get_rate_limit
+
+
+class PollScheduler:
+    """Decides how long to wait before the next poll of a rate-limited endpoint.
+
+    The remaining budget is spread evenly over what is left of the window, so
+    polling slows down smoothly as the budget runs low. Polls that find work
+    reset the interval to min_interval; idle polls stretch it by idle_backoff
+    up to max_interval. With no budget left the scheduler sleeps until the
+    reported reset time.
+    """
+
+    def __init__(self, api_name, min_interval=2, max_interval=60, idle_backoff=1.5, limiter=None):
+        self.api_name = api_name
+        self.limiter = limiter  # an account's RateLimiter, or None for the shared one
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.idle_backoff = idle_backoff
+        self.traffic_interval = min_interval
+
+    def record_poll(self, found):
+        """Tell the scheduler how many items the last poll returned"""
+        if found:
+            self.traffic_interval = self.min_interval
+        else:
+            self.traffic_interval = min(self.max_interval, self.traffic_interval * self.idle_backoff)
+
+    def next_delay(self):
+        """Seconds to sleep before the next poll"""
+        try:
+            remaining, reset_at = get_rate_limit(self.api_name, self.limiter)
+            if not reset_at:
+                return self.traffic_interval
+
+            seconds_left = (reset_at - datetime.datetime.now()).total_seconds()
+            if seconds_left <= 0:
+                # The window has already reset
+                return self.traffic_interval
+            if remaining <= 0:
+                log_message(f"{self.api_name} budget exhausted, sleeping {seconds_left:.0f}s until reset")
+                return seconds_left + 1
+
+            budget_interval = seconds_left / remaining
+            return max(self.traffic_interval, budget_interval)
+        except Exception as e:
+            log_message(f"Error computing poll delay for {self.api_name}: {e}")
+            return self.max_interval